@@ -0,0 +1,307 @@
+""" Benchmarks for the stages of a BVH to DeepMimic conversion.
+
+Times BVH parsing, per-frame and batched forward kinematics, key frame
+generation and serialization on the test clip and on synthetic clips of
+increasing frame count and skeleton size. Throughput (frames/s), or the
+seconds of a single run for setup benchmarks, and peak traced memory of
+every benchmark are written to a json results file, which can be compared
+against the results of another commit:
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --output new.json --compare results.json
+
+The script also runs on commits before the batched converter, so they can
+serve as the baseline. Clips are synthesized from the BVH text and stages
+that need APIs missing there are skipped, or use the per-frame API.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bvhtodeepmimic.bvh_extended import BvhExtended
+from bvhtodeepmimic.bvh_joint import BvhJoint
+from bvhtodeepmimic.bvh_joint_handler import BvhJointHandler
+from bvhtomimic import BvhConverter
+
+# Not available on older commits
+try:
+    from bvhtodeepmimic import __version__
+except ImportError:
+    __version__ = None
+try:
+    from bvhtodeepmimic.deepmimic_writer import DeepMimicWriter
+except ImportError:
+    DeepMimicWriter = None
+
+TEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bvhtodeepmimic", "tests")
+BVH_PATH = os.path.join(TEST_DIR, "0005_Walking001.bvh")
+SETTINGS_PATH = os.path.join(TEST_DIR, "0005_Walking001.json")
+
+# Frames evaluated by the per-frame benchmarks, which are too slow for long clips.
+PER_FRAME_SAMPLE = 200
+
+
+_FRAME_TIME_PATTERN = re.compile(r"Frame\s+Time:\s*(\S+)[^\n]*\n")
+
+
+def splitBvh(data: str):
+    """ Hierarchy text, frame time and (nframes, nchannels) motion of the
+    text of a BVH file.
+    """
+    motionStart = data.index("MOTION")
+    frameTime = _FRAME_TIME_PATTERN.search(data, motionStart)
+    motion = np.loadtxt(io.StringIO(data[frameTime.end():]), ndmin=2)
+    return data[:motionStart], float(frameTime.group(1)), motion
+
+
+def chainText(prefix: str, length: int, indent: str) -> List[str]:
+    """ Lines of a chain of length joints with 3 rotation channels each.
+    """
+    lines = []
+    for depth in range(length):
+        inner = indent + "\t" * depth
+        lines += [
+            "{}JOINT {}_{}".format(inner, prefix, depth + 1), inner + "{",
+            inner + "\tOFFSET 0.00000 0.00000 1.00000",
+            inner + "\tCHANNELS 3 Zrotation Xrotation Yrotation",
+        ]
+    inner = indent + "\t" * length
+    lines += [inner + "End Site", inner + "{", inner + "\tOFFSET 0.00000 0.00000 1.00000", inner + "}"]
+    lines += [indent + "\t" * depth + "}" for depth in reversed(range(length))]
+    return lines
+
+
+def synthesizeClip(baseData: str, nframes: int, extraChains=0, chainLength=3) -> str:
+    """ BVH text repeating the motion of baseData for nframes frames. With
+    extraChains, every end site is replaced by that many chains of
+    chainLength joints (fingers) that get small random rotations.
+    """
+    hierarchy, frameTime, baseMotion = splitBvh(baseData)
+    lines = hierarchy.rstrip("\n").split("\n")
+    # Column of the base motion, or -1 for a random value, per channel.
+    columns = []
+    output = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        if stripped.startswith("CHANNELS"):
+            count = int(stripped.split()[1])
+            nbase = sum(column >= 0 for column in columns)
+            columns += range(nbase, nbase + count)
+        elif stripped == "End Site" and extraChains > 0:
+            indent = line[:len(line) - len(line.lstrip())]
+            for chain in range(extraChains):
+                output += chainText("Extra{}_{}".format(i, chain), chainLength, indent)
+            columns += [-1] * (extraChains * chainLength * 3)
+            # Skip the end site block: "{", OFFSET and "}".
+            i += 4
+            continue
+        output.append(line)
+        i += 1
+
+    repeats = -(-nframes // len(baseMotion))
+    base = np.tile(baseMotion, (repeats, 1))[:nframes]
+    columns = np.array(columns)
+    motion = np.random.RandomState(0).uniform(-10, 10, size=(nframes, len(columns)))
+    motion[:, columns >= 0] = base[:, columns[columns >= 0]]
+
+    text = io.StringIO()
+    text.write("\n".join(output) + "\n")
+    text.write("MOTION\nFrames: {}\nFrame Time: {}\n".format(nframes, frameTime))
+    np.savetxt(text, motion, fmt="%.4f")
+    return text.getvalue()
+
+
+def measure(function, frames: int = None, repeat: int = 1) -> dict:
+    """ Best wall time of repeat runs and peak traced memory of one run.
+    Throughput is only reported for benchmarks processing frames.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "seconds": best,
+        "frames": frames,
+        "framesPerSecond": frames / best if frames and best > 0 else None,
+        "peakMemoryBytes": peak,
+    }
+
+
+def benchmarkClip(name: str, data: str, repeat: int) -> dict:
+    results = {}
+    mocap = BvhExtended(data)
+    nframes = mocap.nframes
+    hierarchy, _, motion = splitBvh(data)
+    sample = min(nframes, PER_FRAME_SAMPLE)
+    with open(SETTINGS_PATH) as settingsFile:
+        settings = json.load(settingsFile)
+
+    results["parse"] = measure(lambda: BvhExtended(data), nframes, repeat)
+
+    root = BvhJoint(mocap, "Hips", settings["positionChannelNames"],
+                    settings["rotationChannelNames"])
+
+    def updatePerFrame():
+        for frame in range(sample):
+            root.update(frame)
+    results["fk_per_frame"] = measure(updatePerFrame, sample, repeat)
+    if hasattr(root, "updateFrames"):
+        results["fk_batched"] = measure(root.updateFrames, nframes, repeat)
+
+    handler = BvhJointHandler(mocap, settingsPath=SETTINGS_PATH)
+
+    def generatePerFrame():
+        for frame in range(sample):
+            handler.generateKeyFrame(frame)
+    results["keyframes_per_frame"] = measure(generatePerFrame, sample, repeat)
+    results["keyframes_batched"] = measure(handler.generateKeyFrames, nframes, repeat)
+    results["handler_setup"] = measure(
+        lambda: BvhJointHandler(mocap, settingsPath=SETTINGS_PATH), repeat=repeat
+    )
+
+    frames = handler.generateKeyFrames()
+
+    def serialize():
+        if DeepMimicWriter is None:
+            # Serialization of older commits
+            json.dumps({"Loop": "none", "Frames": frames}, indent=4)
+            return
+        with DeepMimicWriter(io.StringIO()) as writer:
+            writer.writeFrames(frames)
+    results["serialize_json"] = measure(serialize, nframes, repeat)
+
+    directory = tempfile.mkdtemp()
+    try:
+        bvhPath = os.path.join(directory, name + ".bvh")
+        with open(bvhPath, "w") as bvhFile:
+            bvhFile.write(data)
+        converter = BvhConverter(SETTINGS_PATH)
+        results["convert_file"] = measure(
+            lambda: converter.convertBvhFile(bvhPath), nframes, repeat
+        )
+    finally:
+        for fileName in os.listdir(directory):
+            os.remove(os.path.join(directory, fileName))
+        os.rmdir(directory)
+
+    return {
+        "frames": nframes,
+        "joints": len(re.findall(r"^\s*(?:ROOT|JOINT)\s", hierarchy, re.MULTILINE)),
+        "channels": motion.shape[1],
+        "bytes": len(data),
+        "stages": results,
+    }
+
+
+def gitCommit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict):
+    """ Print the throughput, or the seconds of setup benchmarks, of both
+    runs and the speedup over the baseline.
+    """
+    print("\n{:<40} {:>14} {:>14} {:>8}".format("benchmark", "baseline", "new", "speedup"))
+    for clip, clipResults in results["clips"].items():
+        baseClip = baseline.get("clips", {}).get(clip)
+        if baseClip is None:
+            continue
+        for stage, stageResults in clipResults["stages"].items():
+            baseStage = baseClip["stages"].get(stage)
+            if baseStage is None:
+                continue
+            if stageResults["framesPerSecond"] and baseStage["framesPerSecond"]:
+                base, new = baseStage["framesPerSecond"], stageResults["framesPerSecond"]
+                speedup, unit = new / base, "fps"
+            else:
+                base, new = baseStage["seconds"], stageResults["seconds"]
+                speedup, unit = base / new if new > 0 else float("inf"), "s"
+            print("{:<40} {:>10.4g} {:<3} {:>10.4g} {:<3} {:>8.2f}".format(
+                clip + "/" + stage, base, unit, new, unit, speedup
+            ))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="json file the results are written to")
+    parser.add_argument("--compare", help="results file of an earlier run")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per benchmark, the best time is kept")
+    parser.add_argument("--frames", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="frame counts of the synthetic clips")
+    parser.add_argument("--extra-chains", type=int, nargs="+", default=[0, 2, 5],
+                        help="extra joint chains per end site of the synthetic clips")
+    args = parser.parse_args(argv)
+
+    with open(BVH_PATH) as bvhFile:
+        baseData = bvhFile.read()
+
+    clips = [("0005_Walking001", baseData)]
+    for nframes in args.frames:
+        clips.append(("frames_{}".format(nframes), synthesizeClip(baseData, nframes)))
+    for extraChains in args.extra_chains:
+        if extraChains > 0:
+            clips.append((
+                "joints_extra_{}".format(extraChains),
+                synthesizeClip(baseData, args.frames[0], extraChains)
+            ))
+
+    results = {
+        "version": __version__,
+        "commit": gitCommit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "timestamp": time.time(),
+        "clips": {},
+    }
+    for name, data in clips:
+        print("Benchmarking {}".format(name))
+        results["clips"][name] = benchmarkClip(name, data, args.repeat)
+        for stage, stageResults in results["clips"][name]["stages"].items():
+            if stageResults["framesPerSecond"] is None:
+                speed = "{:>12.4f} s       ".format(stageResults["seconds"])
+            else:
+                speed = "{:>12.1f} frames/s".format(stageResults["framesPerSecond"])
+            print("    {:<22} {} {:>10.1f} MiB".format(
+                stage, speed, stageResults["peakMemoryBytes"] / 2 ** 20
+            ))
+
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=4)
+
+    if args.compare:
+        with open(args.compare) as baselineFile:
+            compare(results, json.load(baselineFile))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+""" Append-only journal of the files converted by a batch, so an
+interrupted batch can be resumed.
+
+Every converted or failed file adds one json line with the hash of the
+input, the output path, the duration and the status. Lines are flushed to
+disk as soon as a file is done, so a crash loses at most the files that
+were being converted. A rerun skips files whose last entry is done, whose
+input did not change and whose outputs still exist.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+DONE = "done"
+FAILED = "failed"
+
+
+def hashFile(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as inputFile:
+        for chunk in iter(lambda: inputFile.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class JournalEntry:
+    def __init__(self, inputPath: str, outputPath: str, inputHash: Optional[str],
+                 duration: float, status: str, error: str = None, finished: float = None):
+        self.inputPath = inputPath
+        self.outputPath = outputPath
+        # None when the input could not be hashed, e.g. a worker died first.
+        self.inputHash = inputHash
+        # Seconds spent converting the file.
+        self.duration = duration
+        self.status = status
+        self.error = error
+        # Time the entry was written, in seconds since the epoch.
+        self.finished = time.time() if finished is None else finished
+
+    def toDict(self) -> dict:
+        return dict(vars(self))
+
+    @classmethod
+    def fromDict(cls, data: dict) -> "JournalEntry":
+        return cls(**data)
+
+
+class BatchJournal:
+    """ Journal stored as json lines in path. The last entry of an
+    (inputPath, outputPath) pair is its current state.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[tuple, JournalEntry] = {}
+        # Whether the journal ends in a line cut off by a crash.
+        self._truncated = False
+        if os.path.exists(path):
+            with open(path) as journalFile:
+                for line in journalFile:
+                    self._truncated = not line.endswith("\n")
+                    try:
+                        entry = JournalEntry.fromDict(json.loads(line))
+                    except (ValueError, TypeError):
+                        # Last line cut off by a crash.
+                        continue
+                    self.entries[(entry.inputPath, entry.outputPath)] = entry
+
+    def lookup(self, inputPath: str, outputPath: str) -> Optional[JournalEntry]:
+        return self.entries.get((inputPath, outputPath))
+
+    def isDone(self, inputPath: str, outputPath: str, outputFiles: List[str]) -> bool:
+        """ Whether inputPath was converted to outputFiles, from the input
+        as it is now. Only hashes inputs that have a done entry.
+        """
+        entry = self.lookup(inputPath, outputPath)
+        if entry is None or entry.status != DONE:
+            return False
+        if not all(os.path.exists(path) for path in outputFiles):
+            return False
+        try:
+            return entry.inputHash == hashFile(inputPath)
+        except OSError:
+            # Input deleted or unreadable, converting it reports the error.
+            return False
+
+    def record(self, entry: JournalEntry):
+        """ Append entry and flush it to disk.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a") as journalFile:
+            if self._truncated:
+                journalFile.write("\n")
+                self._truncated = False
+            journalFile.write(json.dumps(entry.toDict()) + "\n")
+            journalFile.flush()
+            os.fsync(journalFile.fileno())
+        self.entries[(entry.inputPath, entry.outputPath)] = entry
@@ -1,27 +1,42 @@
-from bvh import Bvh
+import numpy as np
+from .bvh_header import BvhHeader
 
-class BvhExtended(Bvh):
-    """Class extending the bvh-python class "Bvh", so that a joint's
-    children can be looked up.
+
+class BvhExtended(BvhHeader):
+    """Parser for BVH files that stores the HIERARCHY as a flat joint table
+    and the MOTION section as a contiguous (nframes, nchannels) float64 array.
+
+    Offers the lookups of the bvh-python "Bvh" class that are used by this
+    package, together with the possibility to look up a joint's children.
     """
-    def __init__(self, data):
+    def __init__(self, data: str):
         super().__init__(data)
+        self.frames = self._parseMotion(data, self._dataStart)
+        # Optional ConversionStats counting calls of hot methods.
+        self.stats = None
 
-    def getDirectChildrenNames(self, name):
-        joint = super().get_joint(name)
-        return [child.name for child in joint.filter('JOINT')]
+    def _parseMotion(self, data: str, dataStart: int) -> np.ndarray:
+        values = np.fromstring(data[dataStart:], dtype=np.float64, sep=" ")
+        if self.nchannels == 0 or values.size % self.nchannels != 0:
+            raise ValueError(
+                "Motion data does not match the {} channels of the hierarchy."
+                .format(self.nchannels)
+            )
+        return values.reshape(-1, self.nchannels)
 
-    def joint_has_end_site(self, joint):
-        return any(True for _ in joint.filter('End'))
+    def frame_joint_channel(self, frame_index, joint, channel):
+        if self.stats is not None:
+            self.stats.count("frame_joint_channel")
+        return float(self.frames[frame_index, self.channel_column(joint, channel)])
 
-    def joint_name_has_end_site(self, name):
-        joint = super().get_joint(name)
-        return self.joint_has_end_site(joint)
+    def frame_joint_channels(self, frame_index, joint, channels):
+        return [
+            self.frame_joint_channel(frame_index, joint, channel)
+            for channel in channels
+        ]
 
-    def joint_get_end_site_offset(self, name):
-        joint = super().get_joint(name)
-        if self.joint_has_end_site(joint):
-            end_site = next(joint.filter('End'))
-            offset = end_site['OFFSET']
-            return [float(offset[0]), float(offset[1]), float(offset[2])]
-        raise LookupError('No end site found.')
\ No newline at end of file
+    def getFrameRows(self, frames=slice(None)):
+        """Return the channel values of the selected frames as a float array
+        of shape (nframes, nchannels).
+        """
+        return self.frames[frames]
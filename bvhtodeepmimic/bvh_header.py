@@ -0,0 +1,197 @@
+import hashlib
+import json
+import re
+from typing import Dict, List
+import numpy as np
+
+_MOTION_PATTERN = re.compile(r"^\s*MOTION\b", re.MULTILINE)
+_FRAMES_PATTERN = re.compile(r"Frames:\s*(\d+)")
+_FRAME_TIME_PATTERN = re.compile(r"Frame\s+Time:\s*(\S+)")
+
+
+class BvhHeader:
+    """Parser for the HIERARCHY and the frame count and frame time of the
+    MOTION section of a BVH file, stored as a flat joint table.
+
+    Offers the skeleton lookups of the bvh-python "Bvh" class that are used by
+    this package, without reading the motion data itself.
+    """
+    def __init__(self, data: str):
+        motionStart = data.find("MOTION")
+        if motionStart < 0:
+            raise ValueError("No MOTION section found.")
+
+        # Flat joint table, parents always precede their children.
+        self.joint_names: List[str] = []
+        self.joint_parents: List[int] = []
+        self.joint_offsets: List[tuple] = []
+        self.joint_channel_names: List[List[str]] = []
+        self.joint_channel_starts: List[int] = []
+        self.joint_children: List[List[int]] = []
+        self.end_site_offsets: Dict[int, List[float]] = {}
+        self._joint_index: Dict[str, int] = {}
+        self.nchannels = 0
+        self._parseHierarchy(data[:motionStart])
+        # (joint, channel) -> column of the motion array
+        self.channel_columns: Dict[tuple, int] = {}
+        self._buildChannelIndex()
+
+        # _dataStart: position in data where the frame values start.
+        self._nframes, self._frame_time, self._dataStart = self._parseMotionHeader(
+            data, motionStart
+        )
+
+    @classmethod
+    def fromFile(cls, path: str) -> "BvhHeader":
+        """Read only the header of a BVH file, up to the frame time line.
+        """
+        return cls(BvhHeader.readHeaderText(path))
+
+    @staticmethod
+    def readHeaderText(path: str) -> str:
+        lines = []
+        motion = False
+        with open(path) as bvhFile:
+            for line in bvhFile:
+                lines.append(line)
+                if not motion:
+                    motion = _MOTION_PATTERN.search(line) is not None
+                elif _FRAME_TIME_PATTERN.search(line):
+                    break
+        return "".join(lines)
+
+    def _parseHierarchy(self, header: str):
+        tokens = header.split()
+        # Stack of the joints whose braces are open, None for end sites.
+        stack: List[int] = []
+        pending = None
+        current = None
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token in ("ROOT", "JOINT"):
+                name = tokens[i + 1]
+                parent = stack[-1] if stack else -1
+                index = len(self.joint_names)
+                self.joint_names.append(name)
+                self.joint_parents.append(parent)
+                self.joint_offsets.append((0.0, 0.0, 0.0))
+                self.joint_channel_names.append([])
+                self.joint_channel_starts.append(self.nchannels)
+                self.joint_children.append([])
+                self._joint_index[name] = index
+                if parent >= 0:
+                    self.joint_children[parent].append(index)
+                pending = index
+                i += 2
+            elif token == "End":
+                pending = None
+                i += 2
+            elif token == "{":
+                stack.append(pending)
+                current = pending
+                i += 1
+            elif token == "}":
+                stack.pop()
+                current = stack[-1] if stack else None
+                i += 1
+            elif token == "OFFSET":
+                offset = (float(tokens[i + 1]), float(tokens[i + 2]), float(tokens[i + 3]))
+                if current is None:
+                    # End site, belongs to the joint owning the enclosing braces.
+                    owner = stack[-2]
+                    self.end_site_offsets.setdefault(owner, list(offset))
+                else:
+                    self.joint_offsets[current] = offset
+                i += 4
+            elif token == "CHANNELS":
+                count = int(tokens[i + 1])
+                self.joint_channel_names[current] = tokens[i + 2:i + 2 + count]
+                self.nchannels += count
+                i += 2 + count
+            else:
+                i += 1
+
+        if not self.joint_names:
+            raise ValueError("No ROOT joint found.")
+
+    def _buildChannelIndex(self):
+        for name, start, channels in zip(self.joint_names,
+                                         self.joint_channel_starts,
+                                         self.joint_channel_names):
+            for offset, channel in enumerate(channels):
+                self.channel_columns[(name, channel)] = start + offset
+
+    @staticmethod
+    def _parseMotionHeader(data: str, motionStart: int):
+        frames = _FRAMES_PATTERN.search(data, motionStart)
+        if frames is None:
+            raise LookupError('number of frames not found')
+        frameTime = _FRAME_TIME_PATTERN.search(data, frames.end())
+        if frameTime is None:
+            raise LookupError('frame time not found')
+        return int(frames.group(1)), float(frameTime.group(1)), frameTime.end()
+
+    def hierarchySignature(self) -> str:
+        """Hash of the joint names, parents and channels. Files sharing a
+        signature share a rig, although joint offsets may differ.
+        """
+        layout = [self.joint_names, self.joint_parents, self.joint_channel_names]
+        return hashlib.sha1(json.dumps(layout).encode("utf-8")).hexdigest()
+
+    def get_joint_index(self, name: str) -> int:
+        try:
+            return self._joint_index[name]
+        except KeyError:
+            raise LookupError('joint not found')
+
+    def get_joints_names(self) -> List[str]:
+        return list(self.joint_names)
+
+    def joint_offset(self, name):
+        return self.joint_offsets[self.get_joint_index(name)]
+
+    def joint_channels(self, name):
+        return list(self.joint_channel_names[self.get_joint_index(name)])
+
+    def get_joint_channels_index(self, joint_name):
+        return self.joint_channel_starts[self.get_joint_index(joint_name)]
+
+    def joint_parent_index(self, name):
+        return self.joint_parents[self.get_joint_index(name)]
+
+    def channel_column(self, joint, channel) -> int:
+        try:
+            return self.channel_columns[(joint, channel)]
+        except KeyError:
+            raise LookupError('channel {} of joint {} not found'.format(channel, joint))
+
+    def joint_channel_columns(self, joint, channels) -> np.ndarray:
+        """Motion array columns of the given channels of a joint, in the order
+        of channels.
+        """
+        return np.array(
+            [self.channel_column(joint, channel) for channel in channels],
+            dtype=np.intp
+        )
+
+    @property
+    def nframes(self):
+        return self._nframes
+
+    @property
+    def frame_time(self):
+        return self._frame_time
+
+    def getDirectChildrenNames(self, name):
+        index = self.get_joint_index(name)
+        return [self.joint_names[child] for child in self.joint_children[index]]
+
+    def joint_name_has_end_site(self, name):
+        return self.get_joint_index(name) in self.end_site_offsets
+
+    def joint_get_end_site_offset(self, name):
+        index = self.get_joint_index(name)
+        if index in self.end_site_offsets:
+            return list(self.end_site_offsets[index])
+        raise LookupError('No end site found.')
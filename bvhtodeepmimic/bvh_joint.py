@@ -3,6 +3,8 @@ import numpy as np
 import math
 from .joint_info import JointInfo
 from .bvh_extended import BvhExtended
+from .forward_kinematics import ForwardKinematics, ForwardKinematicsResult
+from .joint_registry import JointRegistry
 
 class BvhJoint:
     def __init__(self, mocap: BvhExtended, name: str,
@@ -21,7 +23,23 @@ class BvhJoint:
         self.rotation_channels = list(
             filter(lambda x: x in self.rotationChannelNames, self.channels)
         )
+        # Motion columns of the X, Y, Z rotation and position channels.
+        self.rotationColumns = mocap.joint_channel_columns(
+            self.name, self.rotationChannelNames
+        )
+        # Only joints with more than 3 channels are translated.
+        self.positionColumns = None
+        if len(self.channels) > 3:
+            self.positionColumns = mocap.joint_channel_columns(
+                self.name, self.positionChannelNames
+            )
         self.children: List[BvhJoint] = self._createChildJoints()
+        # The joint tree is registered in a flat, topologically ordered
+        # registry, which assigns registry and index to every joint.
+        self.registry: JointRegistry = None
+        self.index = 0
+        if parent is None:
+            JointRegistry(self)
         # Rotation matrix of the joint.
         self.rotation_matrix = np.eye(3)
         self.translation_vector = np.zeros(3)
@@ -35,13 +53,30 @@ class BvhJoint:
         self.position: np.array = np.zeros(3)
 
     def update(self, frameNumber, parent_transform=np.eye(4)):
-        self._updateJointTranslation(frameNumber)
-        self._updateRotationMatrix(frameNumber)
-        self._updateTransformationMatrix(parent_transform)
-        self._updatePosition()
-
-        for child in self.children:
-            child.update(frameNumber, self.total_tf_matrix)
+        if self.mocap.stats is not None:
+            self.mocap.stats.count("update")
+        # Parents precede their children in the registry, so the subtree can
+        # be updated in a single pass.
+        joints = self.registry.joints
+        for index in self.registry.subtree(self.index):
+            joint = joints[index]
+            joint._updateJointTranslation(frameNumber)
+            joint._updateRotationMatrix(frameNumber)
+            if index == self.index:
+                joint._updateTransformationMatrix(parent_transform)
+            else:
+                joint._updateTransformationMatrix(joint.parent.total_tf_matrix)
+            joint._updatePosition()
+
+    def updateFrames(self, frameNumbers=slice(None),
+                     parent_transform=np.eye(4)) -> ForwardKinematicsResult:
+        """ Batched counterpart of update: computes the transformations of
+        this joint and all of its descendants for many frames at once.
+        """
+        kinematics = ForwardKinematics.fromJoint(self)
+        return kinematics.compute(
+            self.mocap.getFrameRows(frameNumbers), parent_transform
+        )
 
     def _createChildJoints(self):
         result = []
@@ -60,26 +95,15 @@ class BvhJoint:
 
     def _updateJointTranslation(self, frameNumber: int):
         # Only update translation when there are more than 3 rotation channels.
-        if len(self.channels) <= 3:
+        if self.positionColumns is None:
             return
 
-        result = []
-        for channel in self.positionChannelNames:
-            result.append(self.mocap.frame_joint_channel(
-                frameNumber, self.name, channel))
+        self.translation_vector = \
+            self.mocap.getFrameRows(frameNumber)[self.positionColumns]
 
-        self.translation_vector = np.array(result)
-
-    def _getXYZEulerAngles(self, frameNumber) -> List[float]:
+    def _getXYZEulerAngles(self, frameNumber) -> np.ndarray:
         # Get the X, Y, Z euler angles
-        eulerAngles = []
-        for channel in self.rotationChannelNames:
-            eulerAngles.append(
-                self.mocap.frame_joint_channel(
-                    frameNumber, self.name, channel)
-            )
-
-        return eulerAngles
+        return self.mocap.getFrameRows(frameNumber)[self.rotationColumns]
 
     def _updateRotationMatrix(self, frameNumber: int):
         angles = self._getXYZEulerAngles(frameNumber)
@@ -145,16 +169,14 @@ class BvhJoint:
         self.position = vector[:-1]
 
     def _search(self, name: str):
-        if self.name == name:
-            return self
-        else:
-            for child in self.children:
-                found = child._search(name)
-                if found is not None:
-                    return found
-        return
+        index = self.registry.jointIndex.get(name)
+        if index is None or index not in self.registry.subtree(self.index):
+            return None
+        return self.registry.joints[index]
 
     def searchJoint(self, name:str):
+        if self.mocap.stats is not None:
+            self.mocap.stats.count("searchJoint")
         found = self._search(name)
         if found is None:
             raise LookupError("Joint name not found.")
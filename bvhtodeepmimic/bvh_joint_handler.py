@@ -1,60 +1,93 @@
 import json
 import numpy as np
 import math
-from pyquaternion import Quaternion
-from typing import List
-from tqdm import tqdm
+from typing import TYPE_CHECKING, Callable, Iterator, List, Tuple
 from .bvh_extended import BvhExtended
 from .joint_info import JointInfo
 from .bvh_joint import BvhJoint
+from .forward_kinematics import ForwardKinematicsResult
+from .conversion_plan import (
+    ConversionPlan, ROTATION_ANGLE, ROTATION_ANKLE, ROTATION_FRAME
+)
+from .conversion_stats import ConversionStats, measureStage
+from .resampling import DECIMATE, Resampler, interpolateKeyFrames
+from . import rotations
+# pyquaternion is only used by the per frame conversion, it is imported on
+# first use so the batched conversion starts without it.
+if TYPE_CHECKING:
+    from pyquaternion import Quaternion
+
 
 class BvhJointHandler:
     """ Handles conversion of BVH files to DeepMimic format.
     """
 
-    def __init__(self, mocap: BvhExtended, settingsPath="./Settings/settings.json", posLocked=False):
+    def __init__(self, mocap: BvhExtended, settingsPath="./Settings/settings.json",
+                 posLocked=False, plan: ConversionPlan = None,
+                 stats: ConversionStats = None,
+                 progress: Callable[[int, int], None] = None,
+                 targetFrameTime: float = None, resampleMethod=DECIMATE):
         self.mocap = mocap
         self.posLocked = posLocked
-
-        # Get settings json
-        with open(settingsPath) as json_data:
-            self.settings = json.load(json_data)
-
-        self.scaleFactor = self.settings["scale"]
-        self.deepMimicHumanoidJoints = self.settings["joints"]
-        self.jointDimensions = self.settings["jointDimensions"]
-        self.rotVecDict = self.settings["zeroRotationVectors"]
-        self.rootUp = self.settings["rootRotJoints"]["root rot up"]
-        self.rootLeft = self.settings["rootRotJoints"]["root rot left"]
-        positionChannelNames = self.settings["positionChannelNames"]
-        rotationChannelNames = self.settings["rotationChannelNames"]
-
-        self.jointData = []
-        self.generateJointData()
-
-        # Joint tree starting at root
-        self.root = BvhJoint(
-                            self.mocap,
-                            self.settings["jointAssignments"][self.deepMimicHumanoidJoints[1]],
-                            positionChannelNames,
-                            rotationChannelNames,
-        )
+        # Optional ConversionStats, shared with mocap and the joint tree.
+        self.stats = stats
+        if stats is not None:
+            mocap.stats = stats
+        # Optional callback called with (frames done, total frames).
+        self.progress = progress
+        # Output frames, optionally resampled to targetFrameTime by
+        # decimation or interpolation (see resampling.py).
+        self.resampler = Resampler(mocap.nframes, mocap.frame_time,
+                                   targetFrameTime, resampleMethod)
+
+        if plan is None:
+            # Get settings json
+            with open(settingsPath) as json_data:
+                settings = json.load(json_data)
+            plan = ConversionPlan(settings, mocap)
+        # Compiled joint mappings and indices, shared by all files of a rig.
+        self.plan = plan
+        self.settings = plan.settings
+
+        self.scaleFactor = plan.scaleFactor
+        self.deepMimicHumanoidJoints = plan.deepMimicHumanoidJoints
+        self.jointDimensions = plan.jointDimensions
+        self.rotVecDict = plan.rotVecDict
+        self.rootUp = plan.rootUp
+        self.rootLeft = plan.rootLeft
+        self.jointData = plan.jointData
+
+        self.forwardKinematics = plan.createForwardKinematics(mocap)
+        self.endSiteOffsets = plan.endSiteOffsets(mocap)
+        self._root = None
+
+    @property
+    def root(self) -> BvhJoint:
+        """ Joint tree starting at root, only built when the per-frame
+        methods are used.
+        """
+        if self._root is None:
+            with measureStage(self.stats, "tree"):
+                self._root = BvhJoint(
+                    self.mocap,
+                    self.jointData[0].bvhName,
+                    self.plan.positionChannelNames,
+                    self.plan.rotationChannelNames,
+                )
+        return self._root
+
+    @property
+    def registry(self):
+        # Flat name -> joint lookup of the whole tree
+        return self.root.registry
 
     def generateJointData(self):
-        assert len(self.deepMimicHumanoidJoints) == len(self.jointDimensions)
-
-        for i in range(2, len(self.deepMimicHumanoidJoints)):
-            deepMimicBoneName = self.deepMimicHumanoidJoints[i]
-            bvhBoneName = self.bvhBoneName(deepMimicBoneName)
-            jointInfo = JointInfo(
-                deepMimicBoneName,
-                bvhBoneName,
-                self.jointDimensions[i],
-                self.rotVecDict[deepMimicBoneName],
-            )
-            self.jointData.append(jointInfo)
+        self.jointData = ConversionPlan.compileJointData(self.settings)
 
     def generateKeyFrame(self, frameNumber: int):
+        if self.stats is not None:
+            self.stats.count("generateKeyFrame")
+            self.stats.frames += 1
         result = []
         # Update positions and transformation
         self.root.update(frameNumber)
@@ -84,13 +117,180 @@ class BvhJointHandler:
 
         return result
 
+    @property
+    def nframes(self) -> int:
+        # Number of output key frames
+        return self.resampler.nframes
+
+    @property
+    def frameTime(self) -> float:
+        # Duration of every output key frame
+        return self.resampler.frameTime
+
     def generateKeyFrames(self):
-        keyFrames = []
-        for i in tqdm(range(0, self.mocap.nframes)):
-            keyFrames.append(self.generateKeyFrame(i))
+        # Forward kinematics and rotation extraction for all frames at once.
+        return self.generateKeyFrameMatrix().tolist()
+
+    def generateKeyFrameMatrix(self, blockSize=1024) -> np.ndarray:
+        """ All key frames as a preallocated (nframes, width) float64 array,
+        filled block by block.
+        """
+        keyFrames = np.empty((self.nframes, self.keyFrameWidth))
+        for start in range(0, self.nframes, blockSize):
+            stop = min(start + blockSize, self.nframes)
+            self.computeKeyFrames(start, stop, out=keyFrames[start:stop])
+            if self.progress is not None:
+                self.progress(stop, self.nframes)
+        return keyFrames
+
+    def computeKeyFrames(self, start: int, stop: int, out: np.ndarray = None) -> np.ndarray:
+        """ Key frames of the output frames start..stop, written into out
+        when given. Only the source frames those depend on go through forward
+        kinematics.
+        """
+        if not self.resampler.active:
+            keyFrames = self.calcKeyFrames(self.computeKinematics(slice(start, stop)), out)
+            self._countFrames(len(keyFrames))
+            return keyFrames
+        return self.computeKeyFramesAt(np.arange(start, stop), out)
+
+    def computeKeyFramesAt(self, frames: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """ Key frames of the given output frames.
+        """
+        return self.keyFramesFromKinematics(frames, self.computeKinematics, out)
+
+    def keyFramesFromKinematics(
+            self, frames: np.ndarray,
+            computeKinematics: Callable[[np.ndarray], ForwardKinematicsResult],
+            out: np.ndarray = None
+    ) -> np.ndarray:
+        """ Key frames of the given output frames, with computeKinematics
+        returning the forward kinematics of an array of source frames.
+        """
+        keyFrames = self._keyFramesFromKinematics(frames, computeKinematics, out)
+        self._countFrames(len(keyFrames))
+        return keyFrames
+
+    def _keyFramesFromKinematics(self, frames, computeKinematics, out=None) -> np.ndarray:
+        frames = np.asarray(frames, dtype=np.intp)
+        resampler = self.resampler
+        if not resampler.active:
+            return self.calcKeyFrames(computeKinematics(frames), out)
+        if resampler.method == DECIMATE:
+            return self.calcKeyFrames(computeKinematics(resampler.nearestFrames(frames)), out)
+
+        lower, upper, weights = resampler.interpolationFrames(frames)
+        sourceFrames, inverse = np.unique(np.concatenate([lower, upper]), return_inverse=True)
+        keyFrames = self.calcKeyFrames(computeKinematics(sourceFrames))
+        count = len(frames)
+        return interpolateKeyFrames(
+            keyFrames[inverse[:count]], keyFrames[inverse[count:]],
+            weights, self.plan.layout, out
+        )
 
+    def computeKinematics(self, frames) -> ForwardKinematicsResult:
+        """ Batched forward kinematics of the selected frames.
+        """
+        with measureStage(self.stats, "fk"):
+            kinematics = self.forwardKinematics.compute(self.mocap.getFrameRows(frames))
+        self._countBlock("fk", kinematics.nframes)
+        return kinematics
+
+    def calcKeyFramesOfRows(self, rows: np.ndarray) -> np.ndarray:
+        """ Key frames of (nframes, nchannels) motion rows that are not held
+        by mocap, e.g. frames appended to a file that is being recorded.
+        """
+        with measureStage(self.stats, "fk"):
+            kinematics = self.forwardKinematics.compute(rows)
+        self._countBlock("fk", kinematics.nframes)
+        keyFrames = self.calcKeyFrames(kinematics)
+        self._countFrames(len(keyFrames))
         return keyFrames
 
+    def iterKeyFrameBlocks(self, blockSize=1024) -> Iterator[np.ndarray]:
+        """ Yield the key frames as (nframes, width) arrays of at most
+        blockSize frames, so memory use does not grow with the clip length.
+        """
+        for start in range(0, self.nframes, blockSize):
+            stop = min(start + blockSize, self.nframes)
+            block = self.computeKeyFrames(start, stop)
+            if self.progress is not None:
+                self.progress(stop, self.nframes)
+            yield block
+
+    def iterFrameBlocks(self, frames: np.ndarray,
+                        blockSize=1024) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """ Yield (output frame numbers, key frames) blocks of at most
+        blockSize of the given output frames. Frames that are not listed are
+        never evaluated.
+        """
+        frames = np.asarray(frames, dtype=np.intp)
+        for start in range(0, len(frames), blockSize):
+            block = frames[start:start + blockSize]
+            keyFrames = self.computeKeyFramesAt(block)
+            if self.progress is not None:
+                self.progress(start + len(block), len(frames))
+            yield block, keyFrames
+
+    def iterKeyFrames(self, blockSize=1024) -> Iterator[List[float]]:
+        for block in self.iterKeyFrameBlocks(blockSize):
+            yield from block.tolist()
+
+    def calcKeyFrames(self, kinematics: ForwardKinematicsResult,
+                      out: np.ndarray = None) -> np.ndarray:
+        """ Batched counterpart of generateKeyFrame, returning one row per
+        frame of kinematics. When given, the rows are written into out.
+        """
+        with measureStage(self.stats, "rotations"):
+            keyFrames = self._calcKeyFrames(kinematics, out)
+        self._countBlock("rotations", kinematics.nframes)
+        return keyFrames
+
+    def _countBlock(self, stage: str, nframes: int):
+        if self.stats is not None:
+            self.stats.countBlock(stage, nframes)
+
+    def _countFrames(self, nframes: int):
+        # Output key frames, source frames are counted per stage.
+        if self.stats is not None:
+            self.stats.frames += nframes
+
+    def _calcKeyFrames(self, kinematics: ForwardKinematicsResult,
+                       out: np.ndarray = None) -> np.ndarray:
+        layout = self.plan.layout
+        if out is None:
+            out = np.empty((kinematics.nframes, layout.width))
+        rootRotations = self.getRootRotationMatrices(kinematics)
+
+        # Time
+        out[:, layout.time] = self.frameTime
+
+        # Hip root pos, the hip is the first joint of the converted skeleton.
+        if self.posLocked:
+            out[:, layout.rootPosition] = 2.0
+        else:
+            out[:, layout.rootPosition] = rotations.posBvhToDM(
+                self.scaleFactor * kinematics.positions[:, 0]
+            )
+
+        # Hip rotation
+        out[:, layout.rootRotation] = rotations.quatBvhToDM(
+            rotations.matrixToQuat(rootRotations)
+        )
+
+        # Other rotations
+        for jointNumber in range(1, len(self.jointData)):
+            out[:, layout.jointColumns[jointNumber]] = self.calcJointRotations(
+                kinematics, jointNumber, rootRotations
+            )
+
+        return out
+
+    @property
+    def keyFrameWidth(self) -> int:
+        # Number of values in every key frame
+        return self.plan.keyFrameWidth
+
     def bvhBoneName(self, deepMimicBoneName):
         return self.settings["jointAssignments"][deepMimicBoneName]
 
@@ -99,11 +299,11 @@ class BvhJointHandler:
 
     def getJointTranslation(self, jointInfo: JointInfo):
         return BvhJointHandler.posBvhToDM(
-            self.scaleFactor * self.root.getJointPosition(jointInfo.bvhName)
+            self.scaleFactor * self.registry.getJoint(jointInfo.bvhName).position
         )
 
     def getJointRotation(self, jointInfo: JointInfo) -> List[float]:
-        joint = self.root.searchJoint(jointInfo.bvhName)
+        joint = self.registry.getJoint(jointInfo.bvhName)
         if jointInfo.dimensions > 1:
             return self.calcRotation(joint, jointInfo)
         else:
@@ -116,7 +316,86 @@ class BvhJointHandler:
             angle = math.acos(np.dot(jointPos, childPos))
             return [angle]
 
+    def calcJointRotations(self, kinematics: ForwardKinematicsResult,
+                           jointNumber: int,
+                           rootRotations: np.ndarray) -> np.ndarray:
+        """ Batched counterpart of getJointRotation for self.jointData[jointNumber],
+        returns a (nframes, dimensions) array.
+        """
+        index = self.plan.jointIndices[jointNumber]
+        method = self.plan.rotationMethods[jointNumber]
+        childPos = rotations.normalize(
+            self.getRelativeChildPositions(kinematics, index)
+        )
+
+        if method == ROTATION_ANGLE:
+            # 1D DeepMimic joint
+            jointPos = self.getRelativeTranslations(kinematics, index)
+            return rotations.vectorAngles(jointPos, childPos)[:, np.newaxis]
+
+        child = self.plan.firstChildren[index]
+        if method == ROTATION_FRAME:
+            childsChildPos = self.getRelativeChildPositions(kinematics, child)
+            y = -1 * childPos
+            x = rotations.normalize(np.cross(y, childsChildPos))
+            z = rotations.normalize(np.cross(x, y))
+        elif method == ROTATION_ANKLE:
+            childsChildPos = self.getRelativeChildPositions(kinematics, child)
+            # Feet are pointed in Z direction
+            z = -childPos
+            x = rotations.normalize(np.cross(childsChildPos, z))
+            y = rotations.normalize(np.cross(z, x))
+        else:
+            # rotate zeroRotVec with root rotation
+            zeroVec = rootRotations @ self.plan.zeroRotVectors[jointNumber]
+            return rotations.quatBvhToDM(
+                rotations.quatFromVecs(zeroVec, childPos)
+            )
+
+        # Take base rotation into account
+        rot_mat = rotations.frameToMatrix(x, y, z)
+        zero_rot_mat = kinematics.total_tf_matrices[:, 0, :3, :3]
+        result = np.swapaxes(zero_rot_mat, -1, -2) @ rot_mat
+        return rotations.quatBvhToDM(rotations.matrixToQuat(result))
+
+    def getRelativeTranslations(self, kinematics: ForwardKinematicsResult,
+                                index: int) -> np.ndarray:
+        """ Joint position relative to its parent, by joint index.
+        """
+        positions = kinematics.positions
+        return positions[:, index] - positions[:, self.plan.parents[index]]
+
+    def getRelativeJointTranslations(self, kinematics: ForwardKinematicsResult,
+                                     bvhJointName: str) -> np.ndarray:
+        return self.getRelativeTranslations(kinematics, self.plan.getIndex(bvhJointName))
+
+    def getRelativeChildPositions(self, kinematics: ForwardKinematicsResult,
+                                  index: int) -> np.ndarray:
+        child = self.plan.firstChildren[index]
+        if child >= 0:
+            return self.getRelativeTranslations(kinematics, child)
+        # Relative end site position
+        if index not in self.endSiteOffsets:
+            raise LookupError('No end site found.')
+        return kinematics.total_tf_matrices[:, index, :3, :3] @ self.endSiteOffsets[index]
+
+    def getRootRotationMatrices(self, kinematics: ForwardKinematicsResult) -> np.ndarray:
+        """ Batched counterpart of getRootQuat, returning rotation matrices.
+        """
+        root_left = rotations.normalize(
+            self.getRelativeTranslations(kinematics, self.plan.rootLeftIndex)
+        )
+        y = rotations.normalize(
+            self.getRelativeTranslations(kinematics, self.plan.rootUpIndex)
+        )
+
+        # Create orthonormal frame
+        z = rotations.normalize(np.cross(root_left, y))
+        x = rotations.normalize(np.cross(y, z))
+        return rotations.frameToMatrix(x, y, z)
+
     def calcRotation(self, joint: BvhJoint, jointInfo: JointInfo):
+        from pyquaternion import Quaternion
         # Get vector from joint to child
         childPos = self.normalize(joint.getRelativeChildPosition())
 
@@ -164,10 +443,11 @@ class BvhJointHandler:
             return BvhJointHandler.quatBvhToDM(result).elements
 
     def getRelativeJointTranslation(self, bvhJointName):
-        joint = self.root.searchJoint(bvhJointName)
+        joint = self.registry.getJoint(bvhJointName)
         return joint.getRelativeJointTranslation()
 
     def getRootQuat(self):
+        from pyquaternion import Quaternion
         # get left hip position
         root_left = BvhJointHandler.normalize(
             self.getRelativeJointTranslation(
@@ -202,7 +482,8 @@ class BvhJointHandler:
 
 
     @staticmethod
-    def calcQuatFromVecs(v1, v2) -> Quaternion:
+    def calcQuatFromVecs(v1, v2) -> "Quaternion":
+        from pyquaternion import Quaternion
         v1 = BvhJointHandler.normalize(v1)
         v2 = BvhJointHandler.normalize(v2)
 
@@ -234,7 +515,8 @@ class BvhJointHandler:
         return vector
 
     @staticmethod
-    def quatBvhToDM(quaternion: Quaternion) -> Quaternion:
+    def quatBvhToDM(quaternion: "Quaternion") -> "Quaternion":
+        from pyquaternion import Quaternion
         # transform x -> z and z -> -x
         return Quaternion(
             quaternion[0],
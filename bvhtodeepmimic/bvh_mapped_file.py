@@ -0,0 +1,136 @@
+import mmap
+import numpy as np
+from .bvh_header import BvhHeader
+
+# Bytes scanned at once while indexing the frame lines.
+_INDEX_CHUNK_SIZE = 1 << 26
+# Bytes after MOTION that hold the frame count and frame time lines.
+_MOTION_HEADER_SIZE = 1 << 16
+
+
+class BvhMappedFile(BvhHeader):
+    """Random access BVH reader for files too large to hold in memory.
+
+    The file is memory mapped and only an index of the frame lines is built
+    up front, frame rows are parsed when they are requested. Offers the same
+    frame lookups as BvhExtended, so it can be converted the same way.
+    Every frame has to be on its own line, as written by all common tools.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError("Cannot map an empty file.")
+        try:
+            motionStart = self._map.find(b"MOTION")
+            if motionStart < 0:
+                raise ValueError("No MOTION section found.")
+            # latin-1 maps every byte to one character, so text positions
+            # are file positions.
+            header = self._map[:motionStart + _MOTION_HEADER_SIZE].decode("latin-1")
+            super().__init__(header)
+            self._lineStarts, self._lineEnds = self._indexLines(self._dataStart)
+        except BaseException:
+            self.close()
+            raise
+        if len(self._lineStarts) != self.nframes:
+            self.close()
+            raise ValueError(
+                "Found {} frame lines, but the header announces {} frames."
+                .format(len(self._lineStarts), self.nframes)
+            )
+        # Optional ConversionStats counting calls of hot methods.
+        self.stats = None
+        # Most recently parsed single frame, for the per-frame lookups.
+        self._cachedFrame = None
+        self._cachedRow = None
+
+    def _indexLines(self, dataStart: int):
+        """Start and end positions of the non empty lines after dataStart.
+        """
+        size = len(self._map)
+        newlines = []
+        for start in range(dataStart, size, _INDEX_CHUNK_SIZE):
+            count = min(_INDEX_CHUNK_SIZE, size - start)
+            chunk = np.frombuffer(self._map, dtype=np.uint8, count=count, offset=start)
+            newlines.append(np.flatnonzero(chunk == ord("\n")) + start)
+            del chunk
+        newlines = np.concatenate(newlines) if newlines else np.empty(0, dtype=np.intp)
+
+        starts = np.concatenate([[dataStart], newlines + 1])
+        ends = np.concatenate([newlines, [size]])
+        # Lines of a few bytes are blank or hold a single short value.
+        keep = ends - starts > 2
+        for i in np.flatnonzero(~keep):
+            keep[i] = bool(self._map[starts[i]:ends[i]].strip())
+        return starts[keep], ends[keep]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _parseLines(self, first: int, last: int) -> np.ndarray:
+        """Parse the frames first..last (inclusive) into a float array.
+        """
+        text = self._map[self._lineStarts[first]:self._lineEnds[last]].decode("latin-1")
+        values = np.fromstring(text, dtype=np.float64, sep=" ")
+        if values.size != (last - first + 1) * self.nchannels:
+            raise ValueError(
+                "Frames {} to {} do not match the {} channels of the hierarchy."
+                .format(first, last, self.nchannels)
+            )
+        return values.reshape(-1, self.nchannels)
+
+    def getFrameRows(self, frames=slice(None)):
+        """Return the channel values of the selected frames as a float array
+        of shape (nframes, nchannels), or (nchannels,) for a single frame.
+        """
+        if isinstance(frames, slice):
+            indices = np.arange(*frames.indices(self.nframes))
+        else:
+            indices = np.asarray(frames, dtype=np.intp)
+            if indices.ndim == 0:
+                return self._getFrameRow(int(indices))
+            indices = np.where(indices < 0, indices + self.nframes, indices)
+            if indices.size and (indices.min() < 0 or indices.max() >= self.nframes):
+                raise IndexError("Frame index out of range.")
+
+        result = np.empty((len(indices), self.nchannels))
+        # Runs of consecutive frames are parsed in one go.
+        breaks = np.flatnonzero(np.diff(indices) != 1) + 1
+        for run in np.split(np.arange(len(indices)), breaks):
+            if run.size:
+                result[run] = self._parseLines(indices[run[0]], indices[run[-1]])
+        return result
+
+    def _getFrameRow(self, frame: int) -> np.ndarray:
+        if frame < 0:
+            frame += self.nframes
+        if not 0 <= frame < self.nframes:
+            raise IndexError("Frame index out of range.")
+        if frame != self._cachedFrame:
+            self._cachedRow = self._parseLines(frame, frame)[0]
+            self._cachedFrame = frame
+        return self._cachedRow
+
+    def frame_joint_channel(self, frame_index, joint, channel):
+        if self.stats is not None:
+            self.stats.count("frame_joint_channel")
+        return float(self._getFrameRow(frame_index)[self.channel_column(joint, channel)])
+
+    def frame_joint_channels(self, frame_index, joint, channels):
+        return [
+            self.frame_joint_channel(frame_index, joint, channel)
+            for channel in channels
+        ]
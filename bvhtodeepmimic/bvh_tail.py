@@ -0,0 +1,78 @@
+import re
+import numpy as np
+from .bvh_header import BvhHeader
+
+_FRAME_TIME_LINE_PATTERN = re.compile(rb"Frame\s+Time:[^\n]*\n")
+
+
+class BvhTail:
+    """Follows a BVH file that is still being written, e.g. by mocap
+    software during a capture.
+
+    The hierarchy is parsed once, as soon as the header is complete. After
+    that, every call to readNewFrames returns only the frame rows appended
+    since the previous call. Incomplete last lines are left for the next
+    call. The frame count in the header is not used, it is usually not
+    final while recording.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self.header: BvhHeader = None
+        # Position of the first byte not read yet
+        self.offset = 0
+        # Number of frames read so far
+        self.nframes = 0
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def readHeader(self) -> bool:
+        """Parse the header once it is complete. Returns whether the header
+        is available.
+        """
+        if self.header is not None:
+            return True
+        self._file.seek(0)
+        data = self._file.read()
+        motionStart = data.find(b"MOTION")
+        if motionStart < 0:
+            return False
+        frameTime = _FRAME_TIME_LINE_PATTERN.search(data, motionStart)
+        if frameTime is None:
+            return False
+        # latin-1 maps every byte to one character, so text positions
+        # are file positions.
+        self.header = BvhHeader(data[:frameTime.end()].decode("latin-1"))
+        self.offset = frameTime.end()
+        return True
+
+    def readNewFrames(self) -> np.ndarray:
+        """Return the complete frame rows appended since the last call as a
+        (nframes, nchannels) array.
+        """
+        if not self.readHeader():
+            raise ValueError("The BVH header is not complete yet.")
+        nchannels = self.header.nchannels
+        self._file.seek(self.offset)
+        data = self._file.read()
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return np.empty((0, nchannels))
+
+        values = np.fromstring(data[:end].decode("latin-1"), dtype=np.float64, sep=" ")
+        if values.size % nchannels != 0:
+            raise ValueError(
+                "Appended motion data does not match the {} channels of the hierarchy."
+                .format(nchannels)
+            )
+        self.offset += end
+        frames = values.reshape(-1, nchannels)
+        self.nframes += len(frames)
+        return frames
@@ -0,0 +1,97 @@
+""" The bvhtodeepmimic console command, converting a single .bvh file.
+
+Job schedulers often start one process per clip, so the startup of this
+command is part of the cost of every file. Only the standard library is
+imported until the arguments are parsed, the converter and its
+dependencies are imported after that. --timing reports where the wall time
+of the invocation went, startup being the time from the start of the
+process until the arguments are parsed:
+
+    bvhtodeepmimic take.bvh take.txt --settings ./Settings/settings.json --timing
+"""
+import argparse
+import os
+import sys
+import time
+
+_ENTRY_TIME = time.perf_counter()
+
+
+def parseArguments(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="bvhtodeepmimic",
+        description="Convert a .bvh file to a DeepMimic motion file."
+    )
+    parser.add_argument("input", help=".bvh file to convert")
+    parser.add_argument("output", nargs="?",
+                        help="DeepMimic file to write, defaults to the input path with "
+                             "the extension of the output format")
+    parser.add_argument("--settings", default="./Settings/settings.json",
+                        help="settings file of the character")
+    parser.add_argument("--loop", action="store_true", help="write a looping motion")
+    parser.add_argument("--pos-locked", action="store_true",
+                        help="keep the root at its initial position")
+    parser.add_argument("--format", default="json", choices=["json", "compact", "npz"],
+                        help="output format")
+    parser.add_argument("--precision", type=int,
+                        help="number of decimals of the values in json output")
+    parser.add_argument("--timing", action="store_true",
+                        help="print the startup, import and conversion times to stderr")
+    return parser.parse_args(argv)
+
+
+def processAge() -> float:
+    """ Wall time in seconds since this process started, from /proc on
+    Linux or psutil when it is installed. None when neither is available.
+    """
+    try:
+        with open("/proc/self/stat") as statFile:
+            # The process name may contain spaces, fields follow its ")".
+            fields = statFile.read().rpartition(")")[2].split()
+        with open("/proc/uptime") as uptimeFile:
+            uptime = float(uptimeFile.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return time.time() - psutil.Process().create_time()
+
+
+def defaultOutputPath(inputPath: str, outputFormat: str) -> str:
+    extension = ".npz" if outputFormat == "npz" else ".txt"
+    return os.path.splitext(inputPath)[0] + extension
+
+
+def main(argv=None) -> int:
+    args = parseArguments(argv)
+    # Wall time of the process so far: interpreter startup, the console
+    # script and parsing the arguments. Without a process start time only
+    # the time since this module was loaded is known.
+    age = processAge()
+    sinceEntry = time.perf_counter() - _ENTRY_TIME
+    startup = age if age is not None else sinceEntry
+
+    importStart = time.perf_counter()
+    from bvhtomimic import BvhConverter
+    importEnd = time.perf_counter()
+
+    output = args.output or defaultOutputPath(args.input, args.format)
+    converter = BvhConverter(args.settings, posLocked=args.pos_locked)
+    converter.writeDeepMimicFile(args.input, output, loop=args.loop,
+                                 outputFormat=args.format, precision=args.precision)
+    end = time.perf_counter()
+
+    if args.timing:
+        print("startup: {:.3f}s, import: {:.3f}s, conversion: {:.3f}s, "
+              "total: {:.3f}s".format(
+                  startup, importEnd - importStart, end - importEnd,
+                  startup - sinceEntry + end - _ENTRY_TIME
+              ), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
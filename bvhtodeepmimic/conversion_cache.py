@@ -0,0 +1,194 @@
+""" Content-addressed on-disk cache of converted DeepMimic files.
+
+Entries are keyed by a hash of the BVH bytes, the effective settings, the
+conversion options and the converter version, so any change to one of
+those results in a new entry. The least recently used entries are evicted
+once the cache grows beyond its size cap.
+
+Inspect or prune a cache from the command line:
+
+    python -m bvhtodeepmimic.conversion_cache ./cache info
+    python -m bvhtodeepmimic.conversion_cache ./cache prune --max-size 1000000000
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional
+from . import __version__
+
+_ENTRY_FILE = "entry.json"
+
+
+class CacheEntry:
+    def __init__(self, key: str, path: str, size: int, lastUsed: float, files: Dict[str, str]):
+        self.key = key
+        self.path = path
+        self.size = size
+        self.lastUsed = lastUsed
+        # output format -> file name inside the entry directory
+        self.files = files
+
+
+class ConversionCache:
+    """ Stores converted outputs in directory, one sub directory per key.
+    """
+
+    def __init__(self, directory: str, maxSize: int = None):
+        self.directory = directory
+        # Size cap in bytes, None for an unbounded cache.
+        self.maxSize = maxSize
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def computeKey(bvhPath: str, settings: dict, options: dict) -> str:
+        """ Hash the BVH bytes, the settings and the conversion options.
+        """
+        digest = hashlib.sha256()
+        with open(bvhPath, "rb") as bvhFile:
+            for chunk in iter(lambda: bvhFile.read(1 << 20), b""):
+                digest.update(chunk)
+        digest.update(json.dumps(
+            {"settings": settings, "options": options, "version": __version__},
+            sort_keys=True
+        ).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _entryPath(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _readEntry(self, key: str) -> Optional[CacheEntry]:
+        path = self._entryPath(key)
+        entryFile = os.path.join(path, _ENTRY_FILE)
+        try:
+            with open(entryFile) as entryJson:
+                files = json.load(entryJson)["files"]
+            lastUsed = os.path.getmtime(entryFile)
+            size = sum(
+                os.path.getsize(os.path.join(path, name))
+                for name in os.listdir(path)
+            )
+        except (OSError, ValueError, KeyError):
+            return None
+        return CacheEntry(key, path, size, lastUsed, files)
+
+    def lookup(self, key: str, formats: List[str]) -> Optional[Dict[str, str]]:
+        """ Return output format -> cached file for all requested formats, or
+        None when any of them is not cached.
+        """
+        entry = self._readEntry(key)
+        if entry is None or any(fmt not in entry.files for fmt in formats):
+            return None
+        # Mark the entry as recently used.
+        try:
+            os.utime(os.path.join(entry.path, _ENTRY_FILE))
+        except OSError:
+            # Pruned by another process meanwhile
+            return None
+        return {fmt: os.path.join(entry.path, entry.files[fmt]) for fmt in formats}
+
+    def store(self, key: str, paths: Dict[str, str]):
+        """ Copy the converted files (output format -> path) into the cache.
+        """
+        entry = self._readEntry(key)
+        files = dict(entry.files) if entry is not None else {}
+        # Build the entry next to its final location, so concurrent workers
+        # never see a partially written entry.
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=self.directory)
+        try:
+            if entry is not None:
+                for name in files.values():
+                    shutil.copyfile(os.path.join(entry.path, name), os.path.join(staging, name))
+            for fmt, path in paths.items():
+                files[fmt] = fmt
+                shutil.copyfile(path, os.path.join(staging, fmt))
+            with open(os.path.join(staging, _ENTRY_FILE), "w") as entryJson:
+                json.dump({"files": files, "created": time.time()}, entryJson)
+
+            if entry is not None:
+                shutil.rmtree(entry.path, ignore_errors=True)
+            try:
+                os.rename(staging, self._entryPath(key))
+            except OSError:
+                # Another process stored the same entry in the meantime.
+                shutil.rmtree(staging, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if self.maxSize is not None:
+            self.prune(self.maxSize)
+
+    def entries(self) -> List[CacheEntry]:
+        """ All complete entries, least recently used first.
+        """
+        result = []
+        for key in os.listdir(self.directory):
+            if key.startswith("."):
+                continue
+            entry = self._readEntry(key)
+            if entry is not None:
+                result.append(entry)
+        return sorted(result, key=lambda entry: entry.lastUsed)
+
+    def totalSize(self) -> int:
+        return sum(entry.size for entry in self.entries())
+
+    def prune(self, maxSize: int = None) -> List[str]:
+        """ Evict least recently used entries until the cache fits maxSize
+        bytes. Returns the evicted keys.
+        """
+        if maxSize is None:
+            maxSize = self.maxSize
+        entries = self.entries()
+        total = sum(entry.size for entry in entries)
+        removed = []
+        for entry in entries:
+            if maxSize is not None and total <= maxSize:
+                break
+            shutil.rmtree(entry.path, ignore_errors=True)
+            total -= entry.size
+            removed.append(entry.key)
+        return removed
+
+    def clear(self) -> List[str]:
+        return self.prune(0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Inspect or prune a BvhToDeepMimic conversion cache."
+    )
+    parser.add_argument("directory", help="cache directory")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    subparsers.add_parser("info", help="list the cached entries")
+    prune = subparsers.add_parser("prune", help="evict least recently used entries")
+    prune.add_argument("--max-size", type=int, required=True,
+                       help="size in bytes the cache is pruned to")
+    subparsers.add_parser("clear", help="remove all entries")
+    args = parser.parse_args(argv)
+
+    cache = ConversionCache(args.directory)
+    if args.command == "info":
+        entries = cache.entries()
+        for entry in entries:
+            print("{}\t{}\t{}\t{}".format(
+                entry.key, entry.size,
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.lastUsed)),
+                ",".join(sorted(entry.files))
+            ))
+        print("{} entries, {} bytes".format(len(entries), sum(e.size for e in entries)))
+    elif args.command == "prune":
+        removed = cache.prune(args.max_size)
+        print("Removed {} entries.".format(len(removed)))
+    else:
+        removed = cache.clear()
+        print("Removed {} entries.".format(len(removed)))
+
+
+if __name__ == "__main__":
+    main()
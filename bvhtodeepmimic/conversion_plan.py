@@ -0,0 +1,226 @@
+import copy
+from typing import Dict, List
+import numpy as np
+from .bvh_header import BvhHeader
+from .forward_kinematics import ForwardKinematics
+from .joint_info import JointInfo
+from .keyframe_layout import KeyFrameLayout
+
+# Ways of extracting a DeepMimic joint rotation from the BVH skeleton.
+ROTATION_FRAME = "frame"  # bone frame from the child and the child's child
+ROTATION_ANKLE = "ankle"  # bone frame of a foot, pointing in Z direction
+ROTATION_DIRECTION = "direction"  # zero rotation vector to child direction
+ROTATION_ANGLE = "angle"  # 1D joint, angle between bone and child bone
+
+
+class ConversionPlan:
+    """ Everything needed to convert BVH files of one skeleton (rig) with one
+    settings file, compiled once and shared by every file of that rig.
+
+    A plan only holds plain python and numpy data, so it can be pickled and
+    sent to worker processes. Joint offsets and end sites are read from every
+    file itself, files only need to share joint names, hierarchy and channels.
+    """
+
+    def __init__(self, settings: dict, mocap: BvhHeader):
+        self.settings = settings
+        self.hierarchySignature = mocap.hierarchySignature()
+
+        self.scaleFactor = settings["scale"]
+        self.deepMimicHumanoidJoints = settings["joints"]
+        self.jointDimensions = settings["jointDimensions"]
+        # Column offsets of the blocks of every key frame
+        self.layout = KeyFrameLayout(self.jointDimensions)
+        self.rotVecDict = settings["zeroRotationVectors"]
+        self.rootUp = settings["rootRotJoints"]["root rot up"]
+        self.rootLeft = settings["rootRotJoints"]["root rot left"]
+        self.positionChannelNames = settings["positionChannelNames"]
+        self.rotationChannelNames = settings["rotationChannelNames"]
+        self.jointData: List[JointInfo] = ConversionPlan.compileJointData(settings)
+
+        # The converted skeleton is the subtree starting at the hip joint,
+        # which is a contiguous range of the depth-first BVH joint table.
+        hip = mocap.get_joint_index(self.jointData[0].bvhName)
+        stop = hip + 1
+        while stop < len(mocap.joint_names) and mocap.joint_parents[stop] >= hip:
+            stop += 1
+        self.bvhJointRange = (hip, stop)
+
+        self._setSkeleton(mocap, list(range(hip, stop)))
+        self.rotationMethods = [
+            ConversionPlan.rotationMethod(joint) for joint in self.jointData
+        ]
+        self.zeroRotVectors = [
+            np.array(joint.zeroRotVector, dtype=np.float64) for joint in self.jointData
+        ]
+        self._validate()
+
+        # Fingers, toes and other joints the conversion never reads are
+        # pruned, so forward kinematics only runs over the joints needed.
+        self._setSkeleton(mocap, self._requiredJoints())
+
+    def _setSkeleton(self, mocap: BvhHeader, bvhJoints: List[int]):
+        """ Use the BVH joints bvhJoints (depth-first order, every joint
+        preceded by its parent) as the converted skeleton.
+        """
+        # BVH joint index of every joint of the converted skeleton.
+        self.bvhJoints = np.array(bvhJoints, dtype=np.intp)
+        planIndex = {bvhJoint: i for i, bvhJoint in enumerate(bvhJoints)}
+
+        self.jointNames: List[str] = [mocap.joint_names[i] for i in bvhJoints]
+        self.jointIndex: Dict[str, int] = {
+            name: i for i, name in enumerate(self.jointNames)
+        }
+        self.parents = np.array(
+            [planIndex.get(mocap.joint_parents[i], -1) for i in bvhJoints],
+            dtype=np.intp
+        )
+        # -1 for joints without children in the BVH file (end sites). The
+        # first child of a joint is always kept when the conversion reads it.
+        self.firstChildren = np.array([
+            planIndex.get(mocap.joint_children[i][0], -1)
+            if mocap.joint_children[i] else -1
+            for i in bvhJoints
+        ], dtype=np.intp)
+        self._compileChannels(mocap)
+
+        self.rootLeftIndex = self.getIndex(self.rootLeft)
+        self.rootUpIndex = self.getIndex(self.rootUp)
+        # Per DeepMimic joint: index in the converted skeleton
+        self.jointIndices = np.array(
+            [self.getIndex(joint.bvhName) for joint in self.jointData], dtype=np.intp
+        )
+
+    def _requiredJoints(self) -> List[int]:
+        """ BVH indices of the joints whose transformations are read during
+        conversion, together with all of their ancestors.
+        """
+        required = {0}
+        for index in (self.rootLeftIndex, self.rootUpIndex):
+            required.update([index, self.parents[index]])
+        joints = zip(self.jointIndices[1:], self.rotationMethods[1:])
+        for index, method in joints:
+            required.update([index, self.parents[index]])
+            child = self.firstChildren[index]
+            if child >= 0:
+                required.add(child)
+                if method in (ROTATION_FRAME, ROTATION_ANKLE):
+                    childsChild = self.firstChildren[child]
+                    if childsChild >= 0:
+                        required.add(childsChild)
+
+        for index in list(required):
+            while index >= 0:
+                required.add(index)
+                index = self.parents[index]
+        return [int(self.bvhJoints[index]) for index in sorted(required)]
+
+    @staticmethod
+    def compileJointData(settings: dict) -> List[JointInfo]:
+        joints = settings["joints"]
+        jointDimensions = settings["jointDimensions"]
+        assert len(joints) == len(jointDimensions)
+
+        jointData = []
+        for i in range(2, len(joints)):
+            deepMimicBoneName = joints[i]
+            jointData.append(JointInfo(
+                deepMimicBoneName,
+                settings["jointAssignments"][deepMimicBoneName],
+                jointDimensions[i],
+                settings["zeroRotationVectors"][deepMimicBoneName],
+            ))
+        return jointData
+
+    @staticmethod
+    def rotationMethod(jointInfo: JointInfo) -> str:
+        if jointInfo.dimensions == 1:
+            return ROTATION_ANGLE
+        if jointInfo.deepMimicName in ["chest", "neck"]:
+            return ROTATION_DIRECTION
+        if jointInfo.deepMimicName in ["left ankle", "right ankle"]:
+            return ROTATION_ANKLE
+        return ROTATION_FRAME
+
+    def _compileChannels(self, mocap: BvhHeader):
+        axes = {name: "XYZ"[i] for i, name in enumerate(self.rotationChannelNames)}
+        self.rotationColumns = []
+        self.rotationOrders = []
+        self.positionColumns = []
+        for name in self.jointNames:
+            channels = mocap.joint_channels(name)
+            self.rotationColumns.append(
+                mocap.joint_channel_columns(name, self.rotationChannelNames)
+            )
+            self.rotationOrders.append("".join(
+                axes[channel] for channel in channels if channel in axes
+            ))
+            # Only joints with more than 3 channels are translated.
+            if len(channels) > 3:
+                self.positionColumns.append(
+                    mocap.joint_channel_columns(name, self.positionChannelNames)
+                )
+            else:
+                self.positionColumns.append([-1, -1, -1])
+
+    def _validate(self):
+        # The first joint is the hip, which has no rotation of its own.
+        joints = zip(self.jointData[1:], self.jointIndices[1:], self.rotationMethods[1:])
+        for joint, index, method in joints:
+            child = self.firstChildren[index]
+            if method in (ROTATION_FRAME, ROTATION_ANKLE) and child < 0:
+                raise LookupError(
+                    "Joint {} needs a child joint to compute its rotation.".format(joint.bvhName)
+                )
+        for index in list(self.jointIndices[1:]) + [self.rootLeftIndex, self.rootUpIndex]:
+            if self.parents[index] < 0:
+                raise LookupError(
+                    "Joint {} needs a parent joint.".format(self.jointNames[index])
+                )
+
+    @property
+    def njoints(self) -> int:
+        return len(self.jointNames)
+
+    @property
+    def keyFrameWidth(self) -> int:
+        # Number of values in every key frame
+        return self.layout.width
+
+    def getIndex(self, name: str) -> int:
+        try:
+            return self.jointIndex[name]
+        except KeyError:
+            raise LookupError("Joint {} not found in the converted skeleton.".format(name))
+
+    def isCompatible(self, mocap: BvhHeader) -> bool:
+        return mocap.hierarchySignature() == self.hierarchySignature
+
+    def withSkeleton(self, mocap: BvhHeader, bvhJoints: List[int]) -> "ConversionPlan":
+        """ Copy of the plan converting over the BVH joints bvhJoints, a
+        superset of the joints of this plan closed under their ancestors.
+        """
+        plan = copy.copy(self)
+        plan._setSkeleton(mocap, bvhJoints)
+        return plan
+
+    def createForwardKinematics(self, mocap: BvhHeader) -> ForwardKinematics:
+        """ Forward kinematics of the converted skeleton, using the joint
+        offsets of mocap.
+        """
+        if not self.isCompatible(mocap):
+            raise ValueError("The BVH hierarchy does not match the conversion plan.")
+        return ForwardKinematics(
+            self.jointNames, self.parents,
+            [mocap.joint_offsets[i] for i in self.bvhJoints],
+            self.rotationColumns, self.rotationOrders, self.positionColumns
+        )
+
+    def endSiteOffsets(self, mocap: BvhHeader) -> Dict[int, np.ndarray]:
+        """ End site offsets of mocap, by joint index in the plan.
+        """
+        return {
+            index: np.array(mocap.end_site_offsets[bvhJoint], dtype=np.float64)
+            for index, bvhJoint in enumerate(self.bvhJoints)
+            if bvhJoint in mocap.end_site_offsets
+        }
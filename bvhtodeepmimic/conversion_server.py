@@ -0,0 +1,297 @@
+""" Long-lived conversion server, for tools converting many short clips.
+
+Requests and responses are json lines, read from stdin and written to
+stdout, or exchanged over a local socket:
+
+    python -m bvhtodeepmimic.conversion_server --workers 4
+    python -m bvhtodeepmimic.conversion_server --socket /tmp/bvhtodeepmimic.sock
+    python -m bvhtodeepmimic.conversion_server --port 8765
+
+A request converts a .bvh file ("bvhPath") or the text of one ("bvhData").
+With an "outputPath" the DeepMimic file is written and the written paths
+are returned, otherwise the key frames are returned:
+
+    {"id": 1, "bvhPath": "walk.bvh", "settings": "settings.json", "outputPath": "walk.txt"}
+    {"id": 1, "ok": true, "paths": {"json": "walk.txt"}, "seconds": 0.004}
+
+Optional request fields are "loop", "outputFormat", "precision",
+"posLocked", "targetFrameTime" and "resampleMethod", see BvhConverter.
+Failed requests are answered with "ok": false and the "error".
+
+Every worker keeps a converter per rig, i.e. settings file, BVH skeleton
+and conversion options, holding the parsed settings and the compiled
+conversion plan of that skeleton. The least recently used rigs are evicted
+beyond maxRigs. Changed settings files are read again.
+"""
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TextIO
+from .bvh_extended import BvhExtended
+from .bvh_header import BvhHeader
+
+# BvhConverters of the current (worker) process by rig, least recently used
+# first.
+_rigs = OrderedDict()
+
+
+def _getConverter(request: dict, header: BvhHeader, maxRigs: int):
+    from bvhtomimic import BvhConverter
+    settingsPath = request.get("settings", "./Settings/settings.json")
+    options = (
+        bool(request.get("posLocked", False)),
+        request.get("targetFrameTime"),
+        request.get("resampleMethod", "decimate"),
+    )
+    # Every rig has a single skeleton, so a converter holds one plan.
+    key = (os.path.abspath(settingsPath), os.path.getmtime(settingsPath),
+           header.hierarchySignature()) + options
+    converter = _rigs.get(key)
+    if converter is None:
+        converter = BvhConverter(settingsPath, posLocked=options[0],
+                                 targetFrameTime=options[1], resampleMethod=options[2])
+        _rigs[key] = converter
+        while len(_rigs) > maxRigs:
+            _rigs.popitem(last=False)
+    else:
+        _rigs.move_to_end(key)
+    return converter
+
+
+def _convert(request: dict, maxRigs: int) -> dict:
+    # bvhData is parsed once, for the rig lookup and the conversion.
+    if "bvhData" in request:
+        source = BvhExtended(request["bvhData"])
+        header = source
+    else:
+        source = request["bvhPath"]
+        header = BvhHeader.fromFile(source)
+    converter = _getConverter(request, header, maxRigs)
+    loop = bool(request.get("loop", False))
+    outputPath = request.get("outputPath")
+    if outputPath is None:
+        if "bvhData" in request:
+            keyFrames = converter.convertBvhDataToArray(source)
+        else:
+            keyFrames = converter.convertBvhFileToArray(source)
+        return {"loop": "wrap" if loop else "none", "frames": keyFrames.tolist()}
+
+    options = {
+        "loop": loop,
+        "outputFormat": request.get("outputFormat", "json"),
+        "precision": request.get("precision"),
+    }
+    if "bvhData" in request:
+        return {"paths": converter.writeDeepMimicData(source, outputPath, **options)}
+    return {"paths": converter.writeDeepMimicFile(source, outputPath, **options)}
+
+
+def errorResponse(requestId, error: str) -> dict:
+    return {"id": requestId, "ok": False, "error": error}
+
+
+def handleRequest(request: dict, maxRigs: int = 8) -> dict:
+    """ Answer a single request, in the current process.
+    """
+    start = time.perf_counter()
+    response = {"id": request.get("id")}
+    try:
+        if request.get("command") == "ping":
+            result = {"rigs": len(_rigs)}
+        elif "bvhPath" not in request and "bvhData" not in request:
+            raise ValueError("A request needs a bvhPath or bvhData.")
+        else:
+            result = _convert(request, maxRigs)
+        response["ok"] = True
+        response.update(result)
+    except Exception:
+        response["ok"] = False
+        response["error"] = traceback.format_exc()
+    response["seconds"] = time.perf_counter() - start
+    return response
+
+
+class ConversionService:
+    """ Answers requests on a pool of workers, each keeping its own warm
+    converters. A single worker runs on a thread of this process, more
+    workers are separate processes.
+    """
+
+    def __init__(self, workers: int = 1, maxRigs: int = 8):
+        self.workers = workers
+        self.maxRigs = maxRigs
+        self._lock = threading.Lock()
+        self._executor = self._createExecutor()
+
+    def _createExecutor(self):
+        if self.workers > 1:
+            return ProcessPoolExecutor(max_workers=self.workers)
+        return ThreadPoolExecutor(max_workers=1)
+
+    def _restart(self, executor):
+        """ Replace executor after one of its worker processes died, e.g.
+        killed when out of memory.
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._executor = self._createExecutor()
+                executor.shutdown(wait=False)
+
+    def submit(self, request: dict) -> "Future[dict]":
+        """ Convert request on a worker. The returned future always holds a
+        response, also when the worker process died.
+        """
+        response = Future()
+        executor = self._executor
+        try:
+            future = executor.submit(handleRequest, request, self.maxRigs)
+        except BrokenProcessPool:
+            self._restart(executor)
+            executor = self._executor
+            future = executor.submit(handleRequest, request, self.maxRigs)
+
+        def done(future: Future):
+            error = future.exception()
+            if error is None:
+                response.set_result(future.result())
+                return
+            if isinstance(error, BrokenProcessPool):
+                self._restart(executor)
+            response.set_result(errorResponse(
+                request.get("id"), "".join(traceback.format_exception_only(type(error), error))
+            ))
+
+        future.add_done_callback(done)
+        return response
+
+    def handle(self, request: dict) -> dict:
+        return self.submit(request).result()
+
+    def handleLine(self, line: str) -> "Future[dict]":
+        """ Submit a json line, invalid lines are answered right away.
+        """
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("A request has to be a json object.")
+        except ValueError as error:
+            future = Future()
+            future.set_result(errorResponse(None, "Invalid request: {}".format(error)))
+            return future
+        return self.submit(request)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def serveLines(service: ConversionService, input: TextIO = None, output: TextIO = None):
+    """ Answer the json lines of input (stdin) on output (stdout) until
+    input ends. Requests run concurrently, responses are written as they
+    finish, so clients match them by "id".
+    """
+    input = input or sys.stdin
+    output = output or sys.stdout
+    lock = threading.Lock()
+
+    def respond(future: Future):
+        try:
+            text = json.dumps(future.result()) + "\n"
+        except Exception:
+            text = json.dumps(errorResponse(None, traceback.format_exc())) + "\n"
+        with lock:
+            output.write(text)
+            output.flush()
+
+    futures = []
+    for line in input:
+        if line.strip():
+            future = service.handleLine(line)
+            future.add_done_callback(respond)
+            futures.append(future)
+    for future in futures:
+        future.exception()
+
+
+class _ConnectionHandler(socketserver.StreamRequestHandler):
+    """ Answers the requests of one connection in order.
+    """
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = self.server.service.handleLine(line.decode("utf-8")).result()
+            except Exception:
+                response = errorResponse(None, traceback.format_exc())
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _TcpServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "UnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+def createSocketServer(service: ConversionService, socketPath: str = None,
+                       port: int = None) -> socketserver.BaseServer:
+    """ Server answering json lines on a unix socket at socketPath, or on
+    port of the loopback interface. Connections are served concurrently.
+    """
+    if socketPath is not None:
+        if os.path.exists(socketPath):
+            os.remove(socketPath)
+        server = _UnixServer(socketPath, _ConnectionHandler)
+    else:
+        server = _TcpServer(("127.0.0.1", port), _ConnectionHandler)
+    server.service = service
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve BVH to DeepMimic conversions as json lines."
+    )
+    parser.add_argument("--socket", help="listen on this unix socket instead of stdin")
+    parser.add_argument("--port", type=int, help="listen on this port of 127.0.0.1 instead of stdin")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of requests converted at the same time")
+    parser.add_argument("--max-rigs", type=int, default=8,
+                        help="number of rigs every worker keeps ready")
+    args = parser.parse_args(argv)
+
+    with ConversionService(args.workers, args.max_rigs) as service:
+        if args.socket is None and args.port is None:
+            serveLines(service)
+            return
+        server = createSocketServer(service, args.socket, args.port)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if args.socket is not None:
+                os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import json
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict
+
+# Conversion stages, in the order they run.
+STAGES = ["read", "parse", "tree", "fk", "rotations", "encode", "write"]
+
+
+class ConversionStats:
+    """ Opt-in timing and counters of a conversion.
+
+    Records the wall time spent in every stage, the number of blocks and
+    frames each batched stage processed ("fkBlocks", "fkFrames", ...), call
+    counts of the per-frame methods and the number of output key frames.
+    Components only record when a stats object is attached to them, so there
+    is no overhead otherwise.
+    """
+
+    def __init__(self, name: str = None):
+        self.name = name
+        # stage -> seconds
+        self.stages: Dict[str, float] = {}
+        # method or event -> number of calls
+        self.counters: Dict[str, int] = {}
+        self.frames = 0
+        self._start = time.perf_counter()
+        self.seconds = None
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addTime(name, time.perf_counter() - start)
+
+    def addTime(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def countBlock(self, stage: str, nframes: int):
+        """ Count a block of nframes frames processed by stage.
+        """
+        self.count(stage + "Blocks")
+        self.count(stage + "Frames", nframes)
+
+    def finish(self):
+        """ Stop the wall clock of the whole conversion.
+        """
+        self.seconds = time.perf_counter() - self._start
+
+    @property
+    def totalSeconds(self) -> float:
+        if self.seconds is not None:
+            return self.seconds
+        return time.perf_counter() - self._start
+
+    @property
+    def framesPerSecond(self) -> float:
+        seconds = self.totalSeconds
+        return self.frames / seconds if seconds > 0 else None
+
+    def toDict(self) -> dict:
+        return {
+            "name": self.name,
+            "frames": self.frames,
+            "seconds": self.totalSeconds,
+            "framesPerSecond": self.framesPerSecond,
+            "stages": dict(self.stages),
+            "counters": dict(self.counters),
+        }
+
+    def dump(self, path: str):
+        with open(path, "w") as output:
+            json.dump(self.toDict(), output, indent=4)
+
+    def __repr__(self):
+        return "ConversionStats({})".format(self.toDict())
+
+
+@contextmanager
+def _noStage():
+    yield
+
+
+def measureStage(stats: ConversionStats, name: str):
+    """ stats.stage(name), or a no-op context when stats is None.
+    """
+    return _noStage() if stats is None else stats.stage(name)
+
+
+def tqdmProgress(**kwargs) -> Callable[[int, int], None]:
+    """ Progress callback showing a tqdm progress bar. tqdm is an optional
+    dependency, only needed when this callback is used.
+    """
+    from tqdm import tqdm
+    bar = None
+
+    def progress(done: int, total: int):
+        nonlocal bar
+        if bar is None:
+            bar = tqdm(total=total, **kwargs)
+        bar.update(done - bar.n)
+        if done >= total:
+            bar.close()
+
+    return progress
@@ -0,0 +1,272 @@
+import json
+import math
+import os
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Union
+import numpy as np
+from .conversion_stats import ConversionStats, measureStage
+
+# Output formats
+JSON = "json"  # Indented DeepMimic json, as read by DeepMimic
+COMPACT_JSON = "compact"  # DeepMimic json without whitespace
+NPZ = "npz"  # numpy archive holding the frame matrix and its metadata
+OUTPUT_FORMATS = [JSON, COMPACT_JSON, NPZ]
+
+
+def loopText(loop: bool) -> str:
+    # DeepMimic loop mode, "none" or "wrap"
+    return "wrap" if loop else "none"
+
+
+def outputPaths(outputPath: str, outputFormat: Union[str, List[str]]) -> Dict[str, str]:
+    """ Map each requested output format to the file it is written to.
+
+    The first format is written to outputPath, other formats are written
+    next to it with their own extension, e.g. ["compact", "npz"] writes
+    "walk.txt" and "walk.npz". Formats that would be written to the same
+    file raise a ValueError.
+    """
+    formats = [outputFormat] if isinstance(outputFormat, str) else list(outputFormat)
+    for fmt in formats:
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError("Unknown output format: {}".format(fmt))
+    if len(set(formats)) != len(formats) or (JSON in formats and COMPACT_JSON in formats):
+        raise ValueError("Every output file type can only be written once.")
+
+    base = os.path.splitext(outputPath)[0]
+    result = {}
+    for i, fmt in enumerate(formats):
+        path = outputPath if i == 0 else base + formatExtension(fmt)
+        if path in result.values():
+            raise ValueError(
+                "The {} and {} output would both be written to {}."
+                .format(formats[0], fmt, path)
+            )
+        result[fmt] = path
+    return result
+
+
+def formatExtension(outputFormat: Union[str, List[str]]) -> str:
+    """ File extension of an output format, or of the first of a list of
+    formats.
+    """
+    fmt = outputFormat if isinstance(outputFormat, str) else outputFormat[0]
+    return ".npz" if fmt == NPZ else ".txt"
+
+
+@contextmanager
+def atomicOutput(path: str) -> Iterator[str]:
+    """ Yield a temporary path next to path, which is moved to path once
+    the block completes. When the block fails the temporary file is removed,
+    so a partially written file never appears under path.
+    """
+    partialPath = path + ".partial"
+    try:
+        yield partialPath
+    except BaseException:
+        if os.path.exists(partialPath):
+            os.remove(partialPath)
+        raise
+    os.replace(partialPath, path)
+
+
+class DeepMimicWriter:
+    """ Streams a DeepMimic motion document to a text file handle.
+
+    Frames are written as they are passed in, so the full document never
+    has to be held in memory. By default the output is identical to
+    json.dumps({"Loop": ..., "Frames": [...]}, indent=4). With compact set,
+    all whitespace is left out. When precision is given, values are rounded
+    to that many decimals.
+
+    With keepValid set, the closing brackets are written after every block
+    and overwritten by the next one, so the file is a complete document at
+    any time. This needs a seekable file handle.
+    """
+
+    def __init__(self, fileHandle, loop=False, compact=False, precision: int = None,
+                 stats: ConversionStats = None, keepValid=False):
+        self.fileHandle = fileHandle
+        # Optional ConversionStats, timing the encode and write stages.
+        self.stats = stats
+        self.loop = loop
+        self.compact = compact
+        self.precision = precision
+        self.keepValid = keepValid
+        self.nframes = 0
+        self.closed = False
+        if compact:
+            self.fileHandle.write(
+                '{"Loop":' + json.dumps(loopText(loop)) + ',"Frames":['
+            )
+        else:
+            self.fileHandle.write(
+                '{\n    "Loop": ' + json.dumps(loopText(loop)) + ',\n    "Frames": ['
+            )
+        self._writeClosing()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Leave the document unterminated when conversion failed.
+        if exc_type is None:
+            self.close()
+
+    def writeFrame(self, frame):
+        self.writeFrames([frame])
+
+    def writeFrames(self, frames):
+        """ Write a block of frames, either a (nframes, width) array or a list
+        of frame lists.
+        """
+        with measureStage(self.stats, "encode"):
+            text = self._encodeFrames(frames)
+        if self.stats is not None:
+            self.stats.countBlock("write", len(frames))
+        with measureStage(self.stats, "write"):
+            if self.keepValid:
+                # Overwrite the closing brackets of the previous block.
+                self.fileHandle.seek(self._bodyEnd)
+                self.fileHandle.truncate()
+            self.fileHandle.write(text)
+            self._writeClosing()
+
+    def _closingText(self) -> str:
+        if self.compact:
+            return "]}"
+        return "\n    ]\n}" if self.nframes > 0 else "]\n}"
+
+    def _writeClosing(self):
+        if self.keepValid:
+            self._bodyEnd = self.fileHandle.tell()
+            self.fileHandle.write(self._closingText())
+            self.fileHandle.flush()
+
+    def _encodeFrames(self, frames) -> str:
+        if self.precision is not None:
+            frames = np.round(np.asarray(frames, dtype=np.float64), self.precision)
+        if isinstance(frames, np.ndarray):
+            frames = frames.tolist()
+        if self.compact:
+            return self._encodeCompactFrames(frames)
+        parts = []
+        for frame in frames:
+            parts.append(
+                ",\n        [\n" if self.nframes > 0 else "\n        [\n"
+            )
+            parts.append(",\n".join(
+                "            " + DeepMimicWriter._formatValue(value)
+                for value in frame
+            ))
+            parts.append("\n        ]")
+            self.nframes += 1
+        return "".join(parts)
+
+    def _encodeCompactFrames(self, frames) -> str:
+        parts = []
+        for frame in frames:
+            parts.append(",[" if self.nframes > 0 else "[")
+            parts.append(",".join(
+                DeepMimicWriter._formatValue(value) for value in frame
+            ))
+            parts.append("]")
+            self.nframes += 1
+        return "".join(parts)
+
+    def close(self):
+        if self.closed:
+            return
+        if not self.keepValid:
+            self.fileHandle.write(self._closingText())
+        self.closed = True
+
+    @staticmethod
+    def _formatValue(value) -> str:
+        if isinstance(value, float) and math.isfinite(value):
+            return float.__repr__(value)
+        return json.dumps(value)
+
+
+class DeepMimicNpzWriter:
+    """ Streams a (nframes, width) key frame matrix into a .npz archive.
+
+    The archive holds a "frames" float64 array and a "metadata" string
+    containing a json header with the loop mode, frame time and joint layout.
+    The number of frames and the width have to be known up front, frames are
+    then written block by block.
+    """
+
+    def __init__(self, path: str, nframes: int, width: int, metadata: dict,
+                 stats: ConversionStats = None):
+        self.path = path
+        self.stats = stats
+        self.shape = (nframes, width)
+        self.nframes = 0
+        self.closed = False
+        import zipfile
+        self._archive = zipfile.ZipFile(path, "w", allowZip64=True)
+        metadataArray = np.array(json.dumps(metadata))
+        with self._archive.open("metadata.npy", "w") as entry:
+            np.lib.format.write_array(entry, metadataArray)
+        self._entry = self._archive.open("frames.npy", "w", force_zip64=True)
+        np.lib.format.write_array_header_1_0(self._entry, {
+            "descr": np.lib.format.dtype_to_descr(np.dtype(np.float64)),
+            "fortran_order": False,
+            "shape": self.shape,
+        })
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.closed = True
+            self._entry.close()
+            self._archive.close()
+
+    def writeFrames(self, frames):
+        frames = np.ascontiguousarray(frames, dtype=np.float64)
+        if frames.ndim != 2 or frames.shape[1] != self.shape[1]:
+            raise ValueError("Frames do not match the width of the matrix.")
+        if self.nframes + len(frames) > self.shape[0]:
+            raise ValueError("More frames written than announced.")
+        with measureStage(self.stats, "write"):
+            self._entry.write(frames.tobytes())
+        if self.stats is not None:
+            self.stats.countBlock("write", len(frames))
+        self.nframes += len(frames)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._entry.close()
+        self._archive.close()
+        if self.nframes != self.shape[0]:
+            raise ValueError(
+                "Expected {} frames, but {} were written."
+                .format(self.shape[0], self.nframes)
+            )
+
+
+def loadDeepMimicNpz(path: str):
+    """ Load a key frame matrix written by DeepMimicNpzWriter.
+
+    Returns:
+        tuple: the (nframes, width) frame matrix and the metadata dict.
+    """
+    with np.load(path) as archive:
+        return archive["frames"], json.loads(str(archive["metadata"]))
+
+
+def loadKeyFrames(path: str) -> np.ndarray:
+    """ Load the (nframes, width) key frame matrix of a DeepMimic json file
+    or of a file written by DeepMimicNpzWriter.
+    """
+    if path.lower().endswith(".npz"):
+        return loadDeepMimicNpz(path)[0]
+    with open(path) as motionFile:
+        return np.array(json.load(motionFile)["Frames"], dtype=np.float64)
@@ -0,0 +1,186 @@
+from typing import Dict, List
+import numpy as np
+
+
+class ForwardKinematicsResult:
+    """ Joint transformations of a BVH skeleton for a batch of frames.
+
+    Every array is indexed as [frame, joint, ...], joints following the order
+    of ForwardKinematics.names.
+    """
+
+    def __init__(self, names: List[str], rotation_matrices: np.ndarray,
+                 tf_matrices: np.ndarray, total_tf_matrices: np.ndarray):
+        self.names = names
+        self.jointIndex: Dict[str, int] = {
+            name: i for i, name in enumerate(names)
+        }
+        # (nframes, njoints, 3, 3) local rotation matrices.
+        self.rotation_matrices = rotation_matrices
+        # (nframes, njoints, 4, 4) local affine transformation matrices.
+        self.tf_matrices = tf_matrices
+        # (nframes, njoints, 4, 4) transformations from the root up to each joint.
+        self.total_tf_matrices = total_tf_matrices
+        # (nframes, njoints, 3) joint positions in 3D space.
+        self.positions = total_tf_matrices[..., :3, 3]
+
+    @property
+    def nframes(self) -> int:
+        return self.total_tf_matrices.shape[0]
+
+    def getIndex(self, name: str) -> int:
+        try:
+            return self.jointIndex[name]
+        except KeyError:
+            raise LookupError("Joint name not found.")
+
+    def subset(self, indices: np.ndarray) -> "ForwardKinematicsResult":
+        """ Result restricted to the joints at indices, in that order.
+        """
+        return ForwardKinematicsResult(
+            [self.names[i] for i in indices],
+            self.rotation_matrices[:, indices],
+            self.tf_matrices[:, indices],
+            self.total_tf_matrices[:, indices],
+        )
+
+    def getJointPositions(self, name: str) -> np.ndarray:
+        return self.positions[:, self.getIndex(name)]
+
+    def getTotalRotationMatrices(self, name: str) -> np.ndarray:
+        return self.total_tf_matrices[:, self.getIndex(name), :3, :3]
+
+
+class ForwardKinematics:
+    """ Computes forward kinematics for all joints and many frames at once.
+
+    The joint tree is flattened so that every parent precedes its children.
+    Instead of walking the tree once per frame, every step is evaluated as a
+    numpy operation over the whole batch of frames.
+    """
+
+    def __init__(self, names: List[str], parents: List[int],
+                 offsets: np.ndarray, rotationColumns: np.ndarray,
+                 rotationOrders: List[str], positionColumns: np.ndarray):
+        """
+        Args:
+            names: joint names, parents before children.
+            parents: index of the parent of every joint, -1 for the root.
+            offsets: (njoints, 3) joint offsets.
+            rotationColumns: (njoints, 3) motion columns of the X, Y and Z
+                rotation channels of every joint.
+            rotationOrders: per joint, the order in which the rotation
+                channels appear in the BVH file, e.g. "ZXY".
+            positionColumns: (njoints, 3) motion columns of the X, Y and Z
+                position channels, or -1 for joints without translation.
+        """
+        self.names = list(names)
+        self.parents = np.array(parents, dtype=np.intp)
+        self.offsets = np.array(offsets, dtype=np.float64).reshape(-1, 3)
+        self.rotationColumns = np.array(rotationColumns, dtype=np.intp).reshape(-1, 3)
+        self.rotationOrders = list(rotationOrders)
+        self.positionColumns = np.array(positionColumns, dtype=np.intp).reshape(-1, 3)
+
+        for i, parent in enumerate(self.parents):
+            assert parent < i, "Parents must precede their children."
+
+        # Group joints sharing the same rotation order, so each group can be
+        # composed in a single batched matrix product.
+        self._orderGroups = {}
+        for i, order in enumerate(self.rotationOrders):
+            self._orderGroups.setdefault(order, []).append(i)
+        self._orderGroups = {
+            order: np.array(indices, dtype=np.intp)
+            for order, indices in self._orderGroups.items()
+        }
+        self._translated = np.flatnonzero(self.positionColumns[:, 0] >= 0)
+
+    @classmethod
+    def fromJoint(cls, root):
+        """ Flatten the tree of BvhJoint objects starting at root.
+        """
+        registry = root.registry
+        axes = {
+            name: "XYZ"[i] for i, name in enumerate(root.rotationChannelNames)
+        }
+
+        names, parents, offsets = [], [], []
+        rotationColumns, rotationOrders, positionColumns = [], [], []
+        for index in registry.subtree(root.index):
+            joint = registry.joints[index]
+            names.append(joint.name)
+            parents.append(
+                -1 if index == root.index
+                else registry.parentIndices[index] - root.index
+            )
+            offsets.append(joint.offset)
+            rotationColumns.append(joint.rotationColumns)
+            rotationOrders.append(
+                "".join(axes[channel] for channel in joint.rotation_channels)
+            )
+            if joint.positionColumns is not None:
+                positionColumns.append(joint.positionColumns)
+            else:
+                positionColumns.append([-1, -1, -1])
+
+        return cls(names, parents, offsets, rotationColumns,
+                   rotationOrders, positionColumns)
+
+    @property
+    def njoints(self) -> int:
+        return len(self.names)
+
+    def compute(self, motion: np.ndarray,
+                parent_transform: np.ndarray = np.eye(4)) -> ForwardKinematicsResult:
+        """ Run forward kinematics on a (nframes, nchannels) motion array.
+        """
+        motion = np.asarray(motion, dtype=np.float64)
+        if motion.ndim == 1:
+            motion = motion[np.newaxis]
+        nframes = motion.shape[0]
+
+        rotation_matrices = self.computeRotationMatrices(motion)
+
+        tf_matrices = np.zeros((nframes, self.njoints, 4, 4))
+        tf_matrices[..., :3, :3] = rotation_matrices
+        tf_matrices[..., :3, 3] = self.offsets
+        for i in self._translated:
+            tf_matrices[:, i, :3, 3] += motion[:, self.positionColumns[i]]
+        tf_matrices[..., 3, 3] = 1.0
+
+        total_tf_matrices = np.empty_like(tf_matrices)
+        for i, parent in enumerate(self.parents):
+            if parent < 0:
+                total_tf_matrices[:, i] = parent_transform @ tf_matrices[:, i]
+            else:
+                total_tf_matrices[:, i] = total_tf_matrices[:, parent] @ tf_matrices[:, i]
+
+        return ForwardKinematicsResult(
+            self.names, rotation_matrices, tf_matrices, total_tf_matrices
+        )
+
+    def computeRotationMatrices(self, motion: np.ndarray) -> np.ndarray:
+        """ Build the (nframes, njoints, 3, 3) local rotation matrices.
+        """
+        angles = np.radians(motion[:, self.rotationColumns])
+        cos = np.cos(angles)
+        sin = np.sin(angles)
+
+        # See: https://en.wikipedia.org/wiki/Rotation_matrix#In_three_dimensions
+        shape = angles.shape[:2] + (3, 3)
+        axisMatrices = {}
+        for axis, (i, j) in zip("XYZ", [(1, 2), (2, 0), (0, 1)]):
+            k = 3 - i - j
+            matrix = np.zeros(shape)
+            matrix[..., k, k] = 1.0
+            matrix[..., i, i] = cos[..., k]
+            matrix[..., j, j] = cos[..., k]
+            matrix[..., i, j] = -sin[..., k]
+            matrix[..., j, i] = sin[..., k]
+            axisMatrices[axis] = matrix
+
+        result = np.empty(shape)
+        for order, indices in self._orderGroups.items():
+            first, second, third = (axisMatrices[axis][:, indices] for axis in order)
+            result[:, indices] = first @ (second @ third)
+        return result
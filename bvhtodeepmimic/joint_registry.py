@@ -0,0 +1,60 @@
+from typing import Dict, List
+import numpy as np
+
+
+class JointRegistry:
+    """ Flat, topologically ordered view of a tree of BvhJoint objects.
+
+    Joints are stored in depth-first order, so every parent precedes its
+    children and the descendants of a joint occupy the index range
+    [index, subtreeEnds[index]).
+    """
+
+    def __init__(self, root):
+        self.joints: List = []
+        self.jointIndex: Dict[str, int] = {}
+        parentIndices: List[int] = []
+
+        stack = [(root, -1)]
+        while stack:
+            joint, parentIndex = stack.pop()
+            index = len(self.joints)
+            joint.registry = self
+            joint.index = index
+            self.joints.append(joint)
+            self.jointIndex.setdefault(joint.name, index)
+            parentIndices.append(parentIndex)
+            for child in reversed(joint.children):
+                stack.append((child, index))
+
+        njoints = len(self.joints)
+        self.parentIndices = np.array(parentIndices, dtype=np.intp)
+        # Index of the first child of every joint, -1 for leaf joints.
+        self.firstChildIndices = np.full(njoints, -1, dtype=np.intp)
+        # Exclusive end of the index range spanned by every joint's subtree.
+        self.subtreeEnds = np.arange(1, njoints + 1, dtype=np.intp)
+        for index in range(njoints - 1, 0, -1):
+            parent = self.parentIndices[index]
+            self.firstChildIndices[parent] = index
+            self.subtreeEnds[parent] = max(self.subtreeEnds[parent], self.subtreeEnds[index])
+
+    def __len__(self):
+        return len(self.joints)
+
+    @property
+    def names(self) -> List[str]:
+        return [joint.name for joint in self.joints]
+
+    def getIndex(self, name: str) -> int:
+        try:
+            return self.jointIndex[name]
+        except KeyError:
+            raise LookupError("Joint name not found.")
+
+    def getJoint(self, name: str):
+        return self.joints[self.getIndex(name)]
+
+    def subtree(self, index: int) -> range:
+        """ Indices of the joint at index and all of its descendants.
+        """
+        return range(index, self.subtreeEnds[index])
@@ -0,0 +1,40 @@
+from typing import List
+
+
+class KeyFrameLayout:
+    """ Column layout of a DeepMimic key frame, computed once from the
+    jointDimensions of a settings file.
+
+    A key frame holds the frame duration, the root position, the root
+    rotation quaternion and then a 4D quaternion or 1D angle per joint.
+    """
+
+    def __init__(self, jointDimensions: List[int]):
+        if list(jointDimensions[:3]) != [1, 3, 4]:
+            raise ValueError(
+                "A key frame has to start with the frame duration (1), "
+                "root position (3) and root rotation (4)."
+            )
+        self.jointDimensions = list(jointDimensions)
+        # One column slice per entry of jointDimensions
+        self.blocks: List[slice] = []
+        offset = 0
+        for dimensions in self.jointDimensions:
+            self.blocks.append(slice(offset, offset + dimensions))
+            offset += dimensions
+        self.width = offset
+
+        self.time = self.blocks[0]
+        self.rootPosition = self.blocks[1]
+        self.rootRotation = self.blocks[2]
+        # Columns of jointData[i], jointData[0] being the root rotation.
+        self.jointColumns: List[slice] = self.blocks[2:]
+        # Blocks after the time column, by the way they are interpolated.
+        self.quaternionBlocks: List[slice] = [
+            block for block, dimensions in zip(self.blocks[1:], self.jointDimensions[1:])
+            if dimensions == 4
+        ]
+        self.linearBlocks: List[slice] = [
+            block for block, dimensions in zip(self.blocks[1:], self.jointDimensions[1:])
+            if dimensions != 4
+        ]
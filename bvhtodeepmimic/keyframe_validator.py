@@ -0,0 +1,206 @@
+""" Validation of converted key frames against the BVH motion they were
+converted from.
+
+The rotations of every key frame are applied to the bones of the BVH
+skeleton, scaled and in DeepMimic axes, to reconstruct the joint positions
+of all frames at once. Chains of converted joints, e.g. hip, knee and
+ankle, are reconstructed from the rotations alone, so errors add up along
+a chain like they would in the simulator. The reconstructed positions are
+compared against the positions of the BVH joints.
+
+Rotations follow the conventions of BvhJointHandler: hip, shoulder and
+ankle rotations are relative to the rotation of the BVH root joint, which
+is taken from the BVH file, chest and neck rotations turn the zero rotation
+vector rotated by the root rotation of the key frame onto the bone.
+"""
+from typing import Dict, List
+import numpy as np
+from .bvh_joint_handler import BvhJointHandler
+from .conversion_plan import ROTATION_ANGLE, ROTATION_ANKLE, ROTATION_DIRECTION, ROTATION_FRAME
+from .forward_kinematics import ForwardKinematicsResult
+from .resampling import DECIMATE
+from . import rotations
+
+# Name of the root position in a ValidationReport.
+ROOT = "root"
+
+# Unit axes of the BVH x, y and z axes in DeepMimic axes.
+_X_AXIS, _Y_AXIS, _Z_AXIS = rotations.posBvhToDM(np.eye(3))
+
+
+class ValidationReport:
+    """ Position errors, in DeepMimic units, of every validated joint and
+    frame. The error of a joint is the distance between the reconstructed
+    and the actual end of its bone, i.e. the position of its first child.
+    """
+
+    def __init__(self, joints: List[str], errors: np.ndarray):
+        self.joints = joints
+        # (nframes, njoints) distances, NaN where a rotation was not finite.
+        self.errors = errors
+
+    @property
+    def nframes(self) -> int:
+        return self.errors.shape[0]
+
+    @property
+    def maxError(self) -> float:
+        return float(np.nanmax(self.errors)) if self.errors.size else 0.0
+
+    @property
+    def invalidFrames(self) -> int:
+        # Frames with a NaN or infinite value in one of their joints
+        return int(np.count_nonzero(~np.isfinite(self.errors).all(axis=1)))
+
+    def jointErrors(self) -> Dict[str, dict]:
+        """ Per joint: mean, root mean square and maximum error, and the frame
+        with the largest error.
+        """
+        result = {}
+        for i, joint in enumerate(self.joints):
+            errors = self.errors[:, i]
+            finite = np.where(np.isfinite(errors), errors, -np.inf)
+            result[joint] = {
+                "mean": float(np.nanmean(errors)),
+                "rms": float(np.sqrt(np.nanmean(errors ** 2))),
+                "max": float(np.nanmax(errors)),
+                "worstFrame": int(np.argmax(finite)),
+            }
+        return result
+
+    def passed(self, tolerance: float) -> bool:
+        """ Whether every joint of every frame is within tolerance.
+        """
+        return self.invalidFrames == 0 and self.maxError <= tolerance
+
+    def toDict(self) -> dict:
+        return {
+            "frames": self.nframes,
+            "maxError": self.maxError,
+            "invalidFrames": self.invalidFrames,
+            "joints": self.jointErrors(),
+        }
+
+
+class KeyFrameValidator:
+    """ Validates key frames converted by jointHandler, using its settings
+    layout and the BVH file it reads.
+    """
+
+    def __init__(self, jointHandler: BvhJointHandler):
+        self.jointHandler = jointHandler
+        self.plan = jointHandler.plan
+        # Validated DeepMimic joints, ordered so DeepMimic parents precede
+        # their children.
+        self._joints = sorted(range(1, len(self.plan.jointData)),
+                              key=lambda jointNumber: self.plan.jointIndices[jointNumber])
+
+    @property
+    def jointNames(self) -> List[str]:
+        names = [self.plan.jointData[jointNumber].deepMimicName for jointNumber in self._joints]
+        if not self.jointHandler.posLocked:
+            names.insert(0, ROOT)
+        return names
+
+    def sourceFrames(self, nframes: int) -> np.ndarray:
+        """ BVH frame of each of the nframes key frames.
+        """
+        resampler = self.jointHandler.resampler
+        if nframes != resampler.nframes:
+            raise ValueError("Expected {} key frames, got {}.".format(resampler.nframes, nframes))
+        frames = np.arange(nframes)
+        if not resampler.active:
+            return frames
+        if resampler.method != DECIMATE:
+            raise ValueError("Interpolated key frames can not be validated.")
+        return resampler.nearestFrames(frames)
+
+    def validate(self, keyFrames: np.ndarray, blockSize=1024) -> ValidationReport:
+        """ Validate a (nframes, width) key frame matrix holding all frames
+        of the clip.
+        """
+        keyFrames = np.asarray(keyFrames, dtype=np.float64)
+        if keyFrames.ndim != 2 or keyFrames.shape[1] != self.plan.keyFrameWidth:
+            raise ValueError("Key frames do not match the layout of the settings.")
+        frames = self.sourceFrames(len(keyFrames))
+        errors = np.empty((len(keyFrames), len(self.jointNames)))
+        for start in range(0, len(keyFrames), blockSize):
+            stop = min(start + blockSize, len(keyFrames))
+            kinematics = self.jointHandler.computeKinematics(frames[start:stop])
+            errors[start:stop] = self.calcErrors(keyFrames[start:stop], kinematics)
+        return ValidationReport(self.jointNames, errors)
+
+    def calcErrors(self, keyFrames: np.ndarray,
+                   kinematics: ForwardKinematicsResult) -> np.ndarray:
+        """ (nframes, njoints) errors of key frames, the BVH motion of those
+        frames being kinematics.
+        """
+        handler = self.jointHandler
+        plan = self.plan
+        layout = plan.layout
+
+        def actual(vectors):
+            # BVH vectors and positions, scaled and in DeepMimic axes
+            return rotations.posBvhToDM(plan.scaleFactor * vectors)
+
+        positions = actual(kinematics.positions)
+        reference = kinematics.total_tf_matrices[:, 0, :3, :3]
+        rootQuats = keyFrames[:, layout.rootRotation]
+
+        errors = []
+        if not handler.posLocked:
+            errors.append(np.linalg.norm(keyFrames[:, layout.rootPosition] - positions[:, 0], axis=-1))
+
+        # Per joint index: reconstructed position of the first child, bone
+        # direction and bend axis of the bone for 1D child joints.
+        ends, directions, bendAxes = {}, {}, {}
+        for jointNumber in self._joints:
+            index = plan.jointIndices[jointNumber]
+            parent = plan.parents[index]
+            method = plan.rotationMethods[jointNumber]
+            values = keyFrames[:, layout.jointColumns[jointNumber]]
+            childVectors = actual(handler.getRelativeChildPositions(kinematics, index))
+
+            if method == ROTATION_FRAME:
+                direction = -self._referenceRotate(reference, values, _Y_AXIS)
+                bendAxes[index] = -self._referenceRotate(reference, values, _X_AXIS)
+            elif method == ROTATION_ANKLE:
+                direction = -self._referenceRotate(reference, values, _Z_AXIS)
+            elif method == ROTATION_DIRECTION:
+                zeroVector = rotations.quatRotate(
+                    rootQuats, rotations.posBvhToDM(plan.zeroRotVectors[jointNumber])
+                )
+                direction = rotations.quatRotate(values, zeroVector)
+            else:
+                assert method == ROTATION_ANGLE
+                if parent in bendAxes and plan.firstChildren[parent] == index:
+                    bone, axis = directions[parent], bendAxes[parent]
+                else:
+                    # Parent rotation not validated, only check the angle.
+                    bone = rotations.normalize(actual(handler.getRelativeTranslations(kinematics, index)))
+                    axis = rotations.normalize(np.cross(bone, childVectors))
+                direction = rotations.quatRotate(
+                    rotations.quatFromAxisAngle(axis, values[:, 0]), bone
+                )
+
+            # Chains of converted joints start at the reconstructed end of
+            # the parent bone.
+            if parent in ends and plan.firstChildren[parent] == index:
+                start = ends[parent]
+            else:
+                start = positions[:, index]
+            length = np.linalg.norm(childVectors, axis=-1, keepdims=True)
+            ends[index] = start + length * direction
+            directions[index] = direction
+            errors.append(np.linalg.norm(ends[index] - (positions[:, index] + childVectors), axis=-1))
+
+        return np.stack(errors, axis=-1)
+
+    @staticmethod
+    def _referenceRotate(reference: np.ndarray, quats: np.ndarray,
+                         axis: np.ndarray) -> np.ndarray:
+        """ Rotate axis by quats relative to the BVH reference rotation
+        matrices, in DeepMimic axes.
+        """
+        rotated = rotations.posDMToBvh(rotations.quatRotate(quats, axis))
+        return rotations.posBvhToDM((reference @ rotated[..., np.newaxis])[..., 0])
@@ -0,0 +1,239 @@
+""" Dataset manifest of a BVH library, built from the file headers only.
+
+For every .bvh file the manifest records its size, skeleton signature,
+joint and channel counts, frame count and frame time, without parsing the
+MOTION data. Skeletons are checked once per signature against a settings
+file. Every file gets an estimated conversion cost, so batch jobs can be
+split into shards of equal work.
+
+Build a manifest from the command line:
+
+    python -m bvhtodeepmimic.manifest ./inputBvh --settings ./Settings/settings.json --output manifest.json
+"""
+import argparse
+import heapq
+import json
+import os
+from typing import Dict, List
+from . import __version__
+from .bvh_header import BvhHeader
+from .conversion_plan import ConversionPlan
+
+
+class ManifestEntry:
+    def __init__(self, path: str, size: int, signature: str = None,
+                 njoints: int = 0, nchannels: int = 0, nframes: int = 0,
+                 frameTime: float = None, cost: int = 0, error: str = None):
+        # Path relative to the root directory of the manifest
+        self.path = path
+        self.size = size
+        self.signature = signature
+        self.njoints = njoints
+        self.nchannels = nchannels
+        self.nframes = nframes
+        self.frameTime = frameTime
+        # Estimated conversion work, frames times converted joints.
+        self.cost = cost
+        # Reason the header could not be read.
+        self.error = error
+
+    def toDict(self) -> dict:
+        return dict(vars(self))
+
+    @classmethod
+    def fromDict(cls, data: dict) -> "ManifestEntry":
+        return cls(**data)
+
+
+class SkeletonInfo:
+    """ Layout of one rig and whether the settings file fits it.
+    """
+    def __init__(self, joints: List[str], parents: List[int],
+                 channels: List[List[str]], missingJoints: List[str] = None,
+                 error: str = None, convertedJoints: int = None):
+        self.joints = joints
+        self.parents = parents
+        self.channels = channels
+        # Joints forward kinematics runs over when converting this rig.
+        self.convertedJoints = len(joints) if convertedJoints is None else convertedJoints
+        # Joints named in the settings that the rig does not have.
+        self.missingJoints = missingJoints or []
+        # Why the settings cannot convert this rig, None when they can.
+        self.error = error
+
+    @property
+    def compatible(self) -> bool:
+        return self.error is None
+
+    def toDict(self) -> dict:
+        return dict(vars(self))
+
+    @classmethod
+    def fromDict(cls, data: dict) -> "SkeletonInfo":
+        return cls(**data)
+
+
+class Manifest:
+    def __init__(self, root: str, entries: List[ManifestEntry] = None,
+                 skeletons: Dict[str, SkeletonInfo] = None, settingsPath: str = None):
+        self.root = root
+        self.entries = entries or []
+        # Skeleton signature -> SkeletonInfo
+        self.skeletons = skeletons or {}
+        self.settingsPath = settingsPath
+
+    def compatibleEntries(self) -> List[ManifestEntry]:
+        """ Entries that were read and fit the settings file.
+        """
+        return [
+            entry for entry in self.entries
+            if entry.error is None and self.skeletons[entry.signature].compatible
+        ]
+
+    def inputPath(self, entry: ManifestEntry) -> str:
+        return os.path.join(self.root, entry.path)
+
+    def shard(self, count: int) -> List[List[ManifestEntry]]:
+        """ Split the compatible entries into count shards of about equal
+        estimated cost, the most expensive files are assigned first.
+        """
+        if count < 1:
+            raise ValueError("The number of shards has to be at least 1.")
+        shards = [[] for _ in range(count)]
+        heap = [(0, i) for i in range(count)]
+        for entry in sorted(self.compatibleEntries(), key=lambda entry: -entry.cost):
+            cost, i = heapq.heappop(heap)
+            shards[i].append(entry)
+            heapq.heappush(heap, (cost + entry.cost, i))
+        return shards
+
+    def toDict(self) -> dict:
+        return {
+            "version": __version__,
+            "root": self.root,
+            "settings": self.settingsPath,
+            "skeletons": {
+                signature: skeleton.toDict()
+                for signature, skeleton in self.skeletons.items()
+            },
+            "files": [entry.toDict() for entry in self.entries],
+        }
+
+    def save(self, path: str):
+        with open(path, "w") as output:
+            json.dump(self.toDict(), output, indent=4)
+
+    @staticmethod
+    def load(path: str) -> "Manifest":
+        with open(path) as manifestFile:
+            data = json.load(manifestFile)
+        return Manifest(
+            data["root"],
+            [ManifestEntry.fromDict(entry) for entry in data["files"]],
+            {
+                signature: SkeletonInfo.fromDict(skeleton)
+                for signature, skeleton in data["skeletons"].items()
+            },
+            data["settings"],
+        )
+
+
+def findBvhFiles(directory: str, recursive=True) -> List[str]:
+    """ The .bvh files in directory, and its subdirectories when recursive,
+    in sorted order.
+    """
+    result = []
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        result.extend(
+            os.path.join(dirpath, name) for name in sorted(filenames)
+            if name.lower().endswith(".bvh")
+        )
+        if not recursive:
+            break
+    return result
+
+
+def checkSkeleton(header: BvhHeader, settings: dict = None) -> SkeletonInfo:
+    """ Describe the rig of header and check it against settings.
+    """
+    skeleton = SkeletonInfo(
+        list(header.joint_names), list(header.joint_parents),
+        [list(channels) for channels in header.joint_channel_names]
+    )
+    if settings is None:
+        return skeleton
+
+    required = list(settings["jointAssignments"].values())
+    required.extend(settings["rootRotJoints"].values())
+    names = set(header.joint_names)
+    skeleton.missingJoints = sorted({name for name in required if name not in names})
+    if skeleton.missingJoints:
+        skeleton.error = "Missing joints: " + ", ".join(skeleton.missingJoints)
+        return skeleton
+    try:
+        skeleton.convertedJoints = ConversionPlan(settings, header).njoints
+    except (LookupError, ValueError, KeyError) as error:
+        skeleton.error = str(error)
+    return skeleton
+
+
+def buildManifest(directory: str, settingsPath: str = None, recursive=True) -> Manifest:
+    """ Scan the headers of all .bvh files below directory.
+    """
+    settings = None
+    if settingsPath is not None:
+        with open(settingsPath) as json_data:
+            settings = json.load(json_data)
+
+    manifest = Manifest(directory, settingsPath=settingsPath)
+    for path in findBvhFiles(directory, recursive):
+        entry = ManifestEntry(os.path.relpath(path, directory), os.path.getsize(path))
+        manifest.entries.append(entry)
+        try:
+            header = BvhHeader.fromFile(path)
+        except (OSError, UnicodeDecodeError, LookupError, ValueError, IndexError) as error:
+            entry.error = "{}: {}".format(type(error).__name__, error)
+            continue
+
+        entry.signature = header.hierarchySignature()
+        entry.njoints = len(header.joint_names)
+        entry.nchannels = header.nchannels
+        entry.nframes = header.nframes
+        entry.frameTime = header.frame_time
+        if entry.signature not in manifest.skeletons:
+            manifest.skeletons[entry.signature] = checkSkeleton(header, settings)
+        entry.cost = entry.nframes * manifest.skeletons[entry.signature].convertedJoints
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build a manifest of the .bvh files of a directory."
+    )
+    parser.add_argument("directory", help="directory containing .bvh files")
+    parser.add_argument("--settings", help="settings file to check the skeletons against")
+    parser.add_argument("--output", default="manifest.json", help="manifest file to write")
+    parser.add_argument("--no-recursive", action="store_true",
+                        help="do not scan sub directories")
+    parser.add_argument("--shards", type=int,
+                        help="also write the files of every shard to <output>.<n>.txt")
+    args = parser.parse_args(argv)
+
+    manifest = buildManifest(args.directory, args.settings, not args.no_recursive)
+    manifest.save(args.output)
+
+    compatible = manifest.compatibleEntries()
+    print("{} files, {} skeletons, {} convertible, {} frames.".format(
+        len(manifest.entries), len(manifest.skeletons), len(compatible),
+        sum(entry.nframes for entry in compatible)
+    ))
+    if args.shards:
+        base = os.path.splitext(args.output)[0]
+        for i, shard in enumerate(manifest.shard(args.shards)):
+            with open("{}.{}.txt".format(base, i), "w") as shardFile:
+                shardFile.writelines(manifest.inputPath(entry) + "\n" for entry in shard)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+""" Conversion of one BVH file for several targets (settings files) at once.
+
+Targets converting the same part of the skeleton share one forward
+kinematics pass over the union of their joints. Only the rotation
+extraction runs once per target.
+"""
+from typing import Dict, Iterator, List
+import numpy as np
+from .bvh_joint_handler import BvhJointHandler
+from .forward_kinematics import ForwardKinematicsResult
+from .conversion_stats import measureStage
+
+
+class _SharedPass:
+    """ Forward kinematics over the joints of several plans, remembering the
+    result of the most recent frames.
+    """
+    def __init__(self, handlers: List[BvhJointHandler]):
+        mocap = handlers[0].mocap
+        bvhJoints = sorted(set().union(*(handler.plan.bvhJoints.tolist() for handler in handlers)))
+        plan = handlers[0].plan.withSkeleton(mocap, bvhJoints)
+        self.mocap = mocap
+        self.stats = handlers[0].stats
+        self.bvhJoints = plan.bvhJoints
+        self.forwardKinematics = plan.createForwardKinematics(mocap)
+        self._frames = None
+        self._result = None
+
+    def jointIndices(self, handler: BvhJointHandler) -> np.ndarray:
+        return np.searchsorted(self.bvhJoints, handler.plan.bvhJoints)
+
+    def compute(self, frames: np.ndarray) -> ForwardKinematicsResult:
+        if self._frames is None or not np.array_equal(frames, self._frames):
+            with measureStage(self.stats, "fk"):
+                self._result = self.forwardKinematics.compute(self.mocap.getFrameRows(frames))
+            if self.stats is not None:
+                self.stats.countBlock("fk", self._result.nframes)
+            self._frames = np.array(frames, copy=True)
+        return self._result
+
+
+class MultiTargetKinematics:
+    """ Computes the key frames of several joint handlers of the same mocap
+    with shared forward kinematics.
+
+    Handlers are grouped by their hip joint and channel names, every group
+    shares one forward kinematics pass. All handlers must resample the same
+    way.
+    """
+
+    def __init__(self, handlers: List[BvhJointHandler]):
+        self.handlers = handlers
+        for handler in handlers[1:]:
+            if handler.mocap is not handlers[0].mocap:
+                raise ValueError("All targets have to convert the same mocap.")
+            if handler.nframes != handlers[0].nframes or \
+                    vars(handler.resampler) != vars(handlers[0].resampler):
+                raise ValueError("All targets have to use the same resampling.")
+
+        groups: Dict[tuple, List[BvhJointHandler]] = {}
+        for handler in handlers:
+            plan = handler.plan
+            key = (plan.bvhJointRange[0], tuple(plan.rotationChannelNames),
+                   tuple(plan.positionChannelNames))
+            groups.setdefault(key, []).append(handler)
+        # Per handler: shared pass and the indices of its joints in that pass
+        self._passes = []
+        for group in groups.values():
+            sharedPass = _SharedPass(group)
+            for handler in group:
+                self._passes.append((handler, sharedPass, sharedPass.jointIndices(handler)))
+        self._passes.sort(key=lambda item: handlers.index(item[0]))
+
+    @property
+    def nframes(self) -> int:
+        return self.handlers[0].nframes if self.handlers else 0
+
+    def computeKeyFrames(self, frames: np.ndarray) -> List[np.ndarray]:
+        """ Key frames of the given output frames, one array per handler.
+        """
+        result = []
+        for handler, sharedPass, indices in self._passes:
+            result.append(handler.keyFramesFromKinematics(
+                frames, lambda sourceFrames: sharedPass.compute(sourceFrames).subset(indices)
+            ))
+        return result
+
+    def iterKeyFrameBlocks(self, blockSize=1024) -> Iterator[List[np.ndarray]]:
+        """ Yield blocks of at most blockSize key frames, one array per
+        handler.
+        """
+        for start in range(0, self.nframes, blockSize):
+            stop = min(start + blockSize, self.nframes)
+            blocks = self.computeKeyFrames(np.arange(start, stop))
+            progress = self.handlers[0].progress
+            if progress is not None:
+                progress(stop, self.nframes)
+            yield blocks
@@ -0,0 +1,141 @@
+""" Conversion of a single long clip on several processes.
+
+The motion array is copied once into shared memory, unless the clip is
+memory mapped: then every worker maps the file itself, so the motion is
+never held in memory as a whole. Worker processes convert blocks of output
+frames into a shared key frame array, and the blocks are handed out in
+order as soon as they are done. Blocks have the
+same boundaries as in serial conversion, so the output is identical.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Iterator
+import numpy as np
+from .bvh_header import BvhHeader
+from .bvh_joint_handler import BvhJointHandler
+from .bvh_mapped_file import BvhMappedFile
+from .conversion_plan import ConversionPlan
+from .conversion_stats import measureStage
+
+
+class SharedFramesBvh(BvhHeader):
+    """ BVH header with a motion array that is owned by someone else, e.g.
+    a view of shared memory.
+    """
+    def __init__(self, data: str, frames: np.ndarray):
+        super().__init__(data)
+        self.frames = frames
+        self.stats = None
+
+    def getFrameRows(self, frames=slice(None)):
+        return self.frames[frames]
+
+
+# State of a worker process, set up once by _initWorker.
+_worker = {}
+
+
+def _attach(name: str, shape: tuple):
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype=np.float64, buffer=memory.buf)
+
+
+def _initWorker(bvhPath: str, motion: tuple, output: tuple,
+                plan: ConversionPlan, handlerOptions: dict):
+    # motion is None when the workers map bvhPath themselves.
+    if motion is None:
+        mocap = BvhMappedFile(bvhPath)
+        memory = []
+    else:
+        motionMemory, frames = _attach(*motion)
+        mocap = SharedFramesBvh(BvhHeader.readHeaderText(bvhPath), frames)
+        memory = [motionMemory]
+    outputMemory, keyFrames = _attach(*output)
+    _worker["memory"] = memory + [outputMemory]
+    _worker["keyFrames"] = keyFrames
+    _worker["handler"] = BvhJointHandler(mocap, plan=plan, **handlerOptions)
+
+
+def _convertBlock(start: int, stop: int) -> int:
+    _worker["handler"].computeKeyFrames(start, stop, out=_worker["keyFrames"][start:stop])
+    return stop - start
+
+
+class ParallelKeyFrames:
+    """ Computes the key frames of jointHandler on a pool of workers
+    processes, reading bvhPath only for its header.
+    """
+
+    def __init__(self, jointHandler: BvhJointHandler, bvhPath: str,
+                 workers: int, blockSize=1024):
+        self.jointHandler = jointHandler
+        self.bvhPath = bvhPath
+        self.workers = workers
+        self.blockSize = blockSize
+
+    def iterKeyFrameBlocks(self) -> Iterator[np.ndarray]:
+        """ Yield the key frames in blocks of blockSize frames, in order.
+        """
+        handler = self.jointHandler
+        mocap = handler.mocap
+        nframes = handler.nframes
+        if self.workers <= 1 or nframes <= self.blockSize:
+            yield from handler.iterKeyFrameBlocks(self.blockSize)
+            return
+
+        mapped = isinstance(mocap, BvhMappedFile)
+        motionShape = (mocap.nframes, mocap.nchannels)
+        outputShape = (nframes, handler.keyFrameWidth)
+        memories = []
+        if not mapped:
+            motionMemory = shared_memory.SharedMemory(
+                create=True, size=max(1, 8 * motionShape[0] * motionShape[1])
+            )
+            memories.append(motionMemory)
+        outputMemory = shared_memory.SharedMemory(
+            create=True, size=max(1, 8 * outputShape[0] * outputShape[1])
+        )
+        memories.append(outputMemory)
+        frames = keyFrames = None
+        try:
+            if mapped:
+                motion = None
+            else:
+                motion = (motionMemory.name, motionShape)
+                frames = np.ndarray(motionShape, dtype=np.float64, buffer=motionMemory.buf)
+                for start in range(0, motionShape[0], self.blockSize):
+                    stop = min(start + self.blockSize, motionShape[0])
+                    frames[start:stop] = mocap.getFrameRows(slice(start, stop))
+            keyFrames = np.ndarray(outputShape, dtype=np.float64, buffer=outputMemory.buf)
+
+            handlerOptions = {
+                "posLocked": handler.posLocked,
+                "targetFrameTime": handler.resampler.targetFrameTime,
+                "resampleMethod": handler.resampler.method,
+            }
+            with ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_initWorker,
+                initargs=(self.bvhPath, motion,
+                          (outputMemory.name, outputShape), handler.plan,
+                          handlerOptions)
+            ) as executor:
+                blocks = [
+                    (start, min(start + self.blockSize, nframes))
+                    for start in range(0, nframes, self.blockSize)
+                ]
+                futures = [executor.submit(_convertBlock, *block) for block in blocks]
+                for (start, stop), future in zip(blocks, futures):
+                    with measureStage(handler.stats, "workers"):
+                        future.result()
+                    if handler.stats is not None:
+                        handler.stats.countBlock("workers", stop - start)
+                        handler.stats.frames += stop - start
+                    if handler.progress is not None:
+                        handler.progress(stop, nframes)
+                    yield keyFrames[start:stop].copy()
+        finally:
+            # Views have to be released before the memory can be closed.
+            frames = keyFrames = None
+            for memory in memories:
+                memory.close()
+                memory.unlink()
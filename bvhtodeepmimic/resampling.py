@@ -0,0 +1,99 @@
+""" Resampling of a clip to a target frame time.
+
+Decimation picks the nearest source frame for every output frame, so the
+dropped frames never go through forward kinematics. Interpolation converts
+the two source frames around every output frame and blends the key frames,
+slerp for quaternions and lerp for positions and 1D joint angles.
+"""
+import numpy as np
+from . import rotations
+from .keyframe_layout import KeyFrameLayout
+
+# Resampling methods
+DECIMATE = "decimate"
+INTERPOLATE = "interpolate"
+RESAMPLE_METHODS = [DECIMATE, INTERPOLATE]
+
+
+class Resampler:
+    """ Maps the output frames of a clip to its source frames.
+
+    Without a targetFrameTime every source frame is an output frame.
+    Output frames are spaced targetFrameTime apart and cover the duration of
+    the clip, the first output frame is the first source frame.
+    """
+
+    def __init__(self, nframes: int, frameTime: float,
+                 targetFrameTime: float = None, method=DECIMATE):
+        if method not in RESAMPLE_METHODS:
+            raise ValueError("Unknown resampling method: {}".format(method))
+        if targetFrameTime is not None and targetFrameTime <= 0:
+            raise ValueError("The target frame time has to be positive.")
+        if targetFrameTime is not None and frameTime <= 0:
+            raise ValueError("Cannot resample a clip without a frame time.")
+        self.sourceFrameCount = nframes
+        self.sourceFrameTime = frameTime
+        self.targetFrameTime = targetFrameTime
+        self.method = method
+
+        if targetFrameTime is None or nframes == 0:
+            self.nframes = nframes
+            self.frameTime = frameTime if targetFrameTime is None else targetFrameTime
+        else:
+            duration = (nframes - 1) * frameTime
+            # Tolerance, so a duration that is a multiple of the target frame
+            # time keeps its last frame despite rounding.
+            self.nframes = int(np.floor(duration / targetFrameTime + 1e-9)) + 1
+            self.frameTime = targetFrameTime
+
+    @property
+    def active(self) -> bool:
+        return self.targetFrameTime is not None
+
+    def sourcePositions(self, frames: np.ndarray) -> np.ndarray:
+        """ Fractional source frame of the given output frames.
+        """
+        times = np.asarray(frames, dtype=np.float64) * self.targetFrameTime
+        return times / self.sourceFrameTime
+
+    def nearestFrames(self, frames: np.ndarray) -> np.ndarray:
+        """ Source frame closest to each of the given output frames.
+        """
+        sourceFrames = np.rint(self.sourcePositions(frames)).astype(np.intp)
+        return np.clip(sourceFrames, 0, self.sourceFrameCount - 1)
+
+    def interpolationFrames(self, frames: np.ndarray):
+        """ Source frames before and after each of the given output frames,
+        and the weight of the frame after.
+        """
+        positions = self.sourcePositions(frames)
+        lower = np.clip(
+            np.floor(positions).astype(np.intp), 0, max(self.sourceFrameCount - 2, 0)
+        )
+        upper = np.minimum(lower + 1, self.sourceFrameCount - 1)
+        weights = np.clip(positions - lower, 0.0, 1.0)
+        return lower, upper, weights
+
+
+def interpolateKeyFrames(keyFrames0: np.ndarray, keyFrames1: np.ndarray,
+                         weights: np.ndarray, layout: KeyFrameLayout,
+                         out: np.ndarray = None) -> np.ndarray:
+    """ Blend two (nframes, width) DeepMimic key frame arrays, into out when
+    given.
+
+    Quaternion blocks of the layout are slerped, everything else is
+    interpolated linearly. The frame duration is taken from keyFrames0.
+    """
+    result = np.empty_like(keyFrames0) if out is None else out
+    linearWeights = weights[:, np.newaxis]
+    result[:, layout.time] = keyFrames0[:, layout.time]
+    for columns in layout.quaternionBlocks:
+        result[:, columns] = rotations.slerp(
+            keyFrames0[:, columns], keyFrames1[:, columns], weights
+        )
+    for columns in layout.linearBlocks:
+        result[:, columns] = (
+            (1 - linearWeights) * keyFrames0[:, columns]
+            + linearWeights * keyFrames1[:, columns]
+        )
+    return result
@@ -0,0 +1,155 @@
+""" Vectorized rotation helpers.
+
+All functions operate on stacks of vectors, matrices or quaternions, so a
+whole clip can be processed at once. Quaternions are stored as (w, x, y, z)
+along the last axis.
+"""
+import numpy as np
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """ Normalize vectors along the last axis, zero vectors are left as is.
+    """
+    vectors = np.asarray(vectors, dtype=np.float64)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def frameToMatrix(x: np.ndarray, y: np.ndarray, z: np.ndarray) -> np.ndarray:
+    """ Stack the axes of (..., 3) frames as the columns of rotation matrices.
+    """
+    return np.stack([x, y, z], axis=-1)
+
+
+def matrixToQuat(matrices: np.ndarray) -> np.ndarray:
+    """ Convert (..., 3, 3) rotation matrices to (..., 4) quaternions.
+
+    Follows the branch selection of pyquaternion's trace method, so results
+    carry the same sign as Quaternion(matrix=...).
+    """
+    m = np.swapaxes(np.asarray(matrices, dtype=np.float64), -1, -2)
+    m00, m01, m02 = m[..., 0, 0], m[..., 0, 1], m[..., 0, 2]
+    m10, m11, m12 = m[..., 1, 0], m[..., 1, 1], m[..., 1, 2]
+    m20, m21, m22 = m[..., 2, 0], m[..., 2, 1], m[..., 2, 2]
+
+    branches = [
+        (1 + m00 - m11 - m22, [m12 - m21, None, m01 + m10, m20 + m02], 1),
+        (1 - m00 + m11 - m22, [m20 - m02, m01 + m10, None, m12 + m21], 2),
+        (1 - m00 - m11 + m22, [m01 - m10, m20 + m02, m12 + m21, None], 3),
+        (1 + m00 + m11 + m22, [None, m12 - m21, m20 - m02, m01 - m10], 0),
+    ]
+    select = np.where(
+        m22 < 0,
+        np.where(m00 > m11, 0, 1),
+        np.where(m00 < -m11, 2, 3),
+    )
+
+    result = np.zeros(m.shape[:-2] + (4,))
+    for branch, (t, q, tIndex) in enumerate(branches):
+        mask = select == branch
+        if not np.any(mask):
+            continue
+        q[tIndex] = t
+        quat = np.stack(q, axis=-1)
+        scale = 0.5 / np.sqrt(np.where(mask, t, 1.0))
+        result[mask] = (quat * scale[..., np.newaxis])[mask]
+    return result
+
+
+def quatFromAxisAngle(axes: np.ndarray, angles: np.ndarray) -> np.ndarray:
+    """ Quaternions rotating by angles (radians) around the given unit axes.
+    """
+    half = 0.5 * np.asarray(angles, dtype=np.float64)
+    return np.concatenate(
+        [np.cos(half)[..., np.newaxis], np.sin(half)[..., np.newaxis] * axes],
+        axis=-1
+    )
+
+
+def quatFromVecs(v1: np.ndarray, v2: np.ndarray) -> np.ndarray:
+    """ Shortest arc quaternions rotating the vectors v1 onto v2.
+    """
+    v1 = normalize(v1)
+    v2 = normalize(v2)
+    v1, v2 = np.broadcast_arrays(v1, v2)
+
+    # Calculate perpendicular vector
+    perpvec = np.cross(v1, v2)
+    perpnorm = np.linalg.norm(perpvec, axis=-1)
+    parallel = perpnorm <= 0
+    axes = perpvec / np.where(parallel, 1.0, perpnorm)[..., np.newaxis]
+    axes[parallel] = [1, 0, 0]
+
+    # Check for float slightly larger than 1
+    dot = np.minimum(np.sum(v1 * v2, axis=-1), 1.0)
+    angles = np.where(parallel, 0.0, np.arccos(np.clip(dot, -1.0, 1.0)))
+
+    return quatFromAxisAngle(axes, angles)
+
+
+def vectorAngles(v1: np.ndarray, v2: np.ndarray) -> np.ndarray:
+    """ Angles (radians) between the vectors v1 and v2.
+    """
+    dot = np.sum(normalize(v1) * normalize(v2), axis=-1)
+    return np.arccos(np.clip(dot, -1.0, 1.0))
+
+
+def quatRotate(quats: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """ Rotate (..., 3) vectors by (..., 4) unit quaternions.
+    """
+    w = quats[..., :1]
+    xyz = quats[..., 1:]
+    t = 2 * np.cross(xyz, vectors)
+    return vectors + w * t + np.cross(xyz, t)
+
+
+def slerp(q0: np.ndarray, q1: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """ Spherical linear interpolation between (..., 4) unit quaternions, along
+    the shorter arc. weights broadcast against the leading axes of q0 and q1.
+    """
+    q0 = np.asarray(q0, dtype=np.float64)
+    q1 = np.asarray(q1, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)[..., np.newaxis]
+    dot = np.sum(q0 * q1, axis=-1, keepdims=True)
+    # q and -q are the same rotation, take the shorter way around.
+    q1 = np.where(dot < 0, -q1, q1)
+    dot = np.abs(dot)
+
+    angle = np.arccos(np.clip(dot, -1.0, 1.0))
+    sinAngle = np.sin(angle)
+    # Nearly identical quaternions: fall back to linear interpolation.
+    close = sinAngle < 1e-6
+    safeSin = np.where(close, 1.0, sinAngle)
+    w0 = np.where(close, 1 - weights, np.sin((1 - weights) * angle) / safeSin)
+    w1 = np.where(close, weights, np.sin(weights * angle) / safeSin)
+    return normalize(w0 * q0 + w1 * q1)
+
+
+def quatBvhToDM(quats: np.ndarray) -> np.ndarray:
+    """ Transform quaternions from BVH to DeepMimic axes: x -> z and z -> -x.
+    """
+    quats = np.asarray(quats)
+    return np.stack(
+        [quats[..., 0], quats[..., 3], quats[..., 2], -quats[..., 1]],
+        axis=-1
+    )
+
+
+def posBvhToDM(translations: np.ndarray) -> np.ndarray:
+    """ Transform (..., 3) positions from BVH to DeepMimic axes: x -> z and z -> -x.
+    """
+    translations = np.asarray(translations)
+    return np.stack(
+        [translations[..., 2], translations[..., 1], -translations[..., 0]],
+        axis=-1
+    )
+
+
+def posDMToBvh(translations: np.ndarray) -> np.ndarray:
+    """ Inverse of posBvhToDM.
+    """
+    translations = np.asarray(translations)
+    return np.stack(
+        [-translations[..., 2], translations[..., 1], translations[..., 0]],
+        axis=-1
+    )
@@ -0,0 +1,59 @@
+import unittest
+import os
+import shutil
+import tempfile
+from bvhtodeepmimic.batch_journal import DONE, FAILED, BatchJournal, JournalEntry, hashFile
+
+class TestBatchJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.bvhPath = "./bvhtodeepmimic/tests/0005_Walking001.bvh"
+        self.directory = tempfile.mkdtemp()
+        self.journalPath = os.path.join(self.directory, "journal.jsonl")
+        self.outputPath = os.path.join(self.directory, "walk.txt")
+        with open(self.outputPath, "w") as output:
+            output.write("{}")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_isDone(self):
+        journal = BatchJournal(self.journalPath)
+        self.assertFalse(journal.isDone(self.bvhPath, self.outputPath, [self.outputPath]))
+        journal.record(JournalEntry(self.bvhPath, self.outputPath, hashFile(self.bvhPath),
+                                    1.0, FAILED, "error"))
+        self.assertFalse(journal.isDone(self.bvhPath, self.outputPath, [self.outputPath]))
+        journal.record(JournalEntry(self.bvhPath, self.outputPath, hashFile(self.bvhPath),
+                                    1.0, DONE))
+        self.assertTrue(journal.isDone(self.bvhPath, self.outputPath, [self.outputPath]))
+        self.assertFalse(journal.isDone(self.bvhPath, self.outputPath,
+                                        [self.outputPath, self.outputPath + ".npz"]))
+
+    def test_missingInput(self):
+        inputPath = os.path.join(self.directory, "walk.bvh")
+        shutil.copy(self.bvhPath, inputPath)
+        journal = BatchJournal(self.journalPath)
+        journal.record(JournalEntry(inputPath, self.outputPath, hashFile(inputPath), 1.0, DONE))
+        os.remove(inputPath)
+        self.assertFalse(journal.isDone(inputPath, self.outputPath, [self.outputPath]))
+
+    def test_reload(self):
+        journal = BatchJournal(self.journalPath)
+        journal.record(JournalEntry(self.bvhPath, self.outputPath, hashFile(self.bvhPath),
+                                    1.0, DONE))
+        # A line cut off by a crash is ignored.
+        with open(self.journalPath, "a") as journalFile:
+            journalFile.write('{"inputPath": "other.bvh", "outp')
+
+        journal = BatchJournal(self.journalPath)
+        self.assertEqual(len(journal.entries), 1)
+        self.assertEqual(journal.lookup(self.bvhPath, self.outputPath).status, DONE)
+        self.assertTrue(journal.isDone(self.bvhPath, self.outputPath, [self.outputPath]))
+
+        # Entries after the cut off line are read back.
+        journal.record(JournalEntry("other.bvh", "other.txt", None, 0.5, FAILED, "error"))
+        journal = BatchJournal(self.journalPath)
+        self.assertEqual(journal.lookup("other.bvh", "other.txt").status, FAILED)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from bvhtodeepmimic.bvh_extended import BvhExtended
+from bvhtodeepmimic.bvh_header import BvhHeader
+
+class TestBvhExtended(unittest.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestBvhExtended, self).__init__(*args, **kwargs)
+
+        self.mocap = self.createMocap("./bvhtodeepmimic/tests/0005_Walking001.bvh")
+
+    def createMocap(self, bvhPath):
+        with open(bvhPath, "r") as myFile:
+            mocap = BvhExtended(myFile.read())
+
+        return mocap
+
+    def test_motion(self):
+        self.assertEqual(self.mocap.nframes, 270)
+        self.assertEqual(self.mocap.frame_time, 0.008333)
+        self.assertEqual(self.mocap.frames.shape, (270, self.mocap.nchannels))
+        self.assertEqual(self.mocap.frame_joint_channel(0, "Hips", "Xposition"), 5.1427)
+        self.assertEqual(self.mocap.frame_joint_channel(0, "Hips", "Zrotation"), 177.0380)
+
+    def test_headerOnly(self):
+        header = BvhHeader.fromFile("./bvhtodeepmimic/tests/0005_Walking001.bvh")
+        self.assertEqual(header.nframes, 270)
+        self.assertEqual(header.frame_time, 0.008333)
+        self.assertEqual(header.joint_names, self.mocap.joint_names)
+        self.assertEqual(header.hierarchySignature(), self.mocap.hierarchySignature())
+        self.assertFalse(hasattr(header, "frames"))
+
+    def test_hierarchy(self):
+        self.assertEqual(self.mocap.get_joints_names()[0], "Hips")
+        self.assertEqual(self.mocap.joint_offset("LeftLeg"), (0.0, -15.70580, 0.0))
+        self.assertEqual(self.mocap.joint_channels("LeftUpLeg"),
+                         ["Xrotation", "Yrotation", "Zrotation"])
+        self.assertEqual(self.mocap.get_joint_channels_index("LeftUpLeg"), 6)
+        self.assertEqual(self.mocap.getDirectChildrenNames("Hips"),
+                         ["LeftUpLeg", "RightUpLeg", "Spine"])
+        self.assertRaises(LookupError, self.mocap.joint_offset, "NonExistantName")
+
+    def test_channelColumns(self):
+        self.assertEqual(self.mocap.channel_column("Hips", "Xposition"), 0)
+        self.assertEqual(self.mocap.channel_column("LeftUpLeg", "Zrotation"), 8)
+        columns = self.mocap.joint_channel_columns(
+            "LeftUpLeg", ["Xrotation", "Yrotation", "Zrotation"])
+        self.assertEqual(list(columns), [6, 7, 8])
+        self.assertRaises(LookupError, self.mocap.channel_column, "LeftUpLeg", "Xposition")
+
+    def test_endSite(self):
+        self.assertTrue(self.mocap.joint_name_has_end_site("LeftToeBase"))
+        self.assertFalse(self.mocap.joint_name_has_end_site("LeftFoot"))
+        self.assertEqual(self.mocap.joint_get_end_site_offset("LeftToeBase"),
+                         [0.0, 0.0, 2.95275])
+        self.assertRaises(LookupError, self.mocap.joint_get_end_site_offset, "LeftFoot")
+
+    def test_invalidMotion(self):
+        with open("./bvhtodeepmimic/tests/0005_Walking001.bvh", "r") as myFile:
+            data = myFile.read()
+        self.assertRaises(ValueError, BvhExtended, data + " 1.0")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -39,5 +39,19 @@ class TestBvhJointHandler(unittest.TestCase):
         frames = self.jointHandler.generateKeyFrames()
         self.assertEqual(len(frames), 270)
 
+    def test_generateKeyFramesMatchesGenerateKeyFrame(self):
+        frames = self.jointHandler.generateKeyFrames()
+        for i in [0, 135, 269]:
+            np.testing.assert_allclose(
+                frames[i], self.jointHandler.generateKeyFrame(i), atol=1e-9
+            )
+
+    def test_iterKeyFrameBlocks(self):
+        blocks = list(self.jointHandler.iterKeyFrameBlocks(blockSize=100))
+        self.assertEqual([len(block) for block in blocks], [100, 100, 70])
+        np.testing.assert_array_equal(
+            np.concatenate(blocks), self.jointHandler.generateKeyFrames()
+        )
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,58 @@
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+from bvhtomimic import BvhConverter
+from bvhtodeepmimic.bvh_extended import BvhExtended
+from bvhtodeepmimic.bvh_joint_handler import BvhJointHandler
+from bvhtodeepmimic.bvh_mapped_file import BvhMappedFile
+
+class TestBvhMappedFile(unittest.TestCase):
+
+    def setUp(self):
+        self.settingsPath = "./bvhtodeepmimic/tests/0005_Walking001.json"
+        self.bvhPath = "./bvhtodeepmimic/tests/0005_Walking001.bvh"
+        with open(self.bvhPath) as f:
+            self.data = f.read()
+        self.mocap = BvhExtended(self.data)
+        self.mapped = BvhMappedFile(self.bvhPath)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.mapped.close()
+        shutil.rmtree(self.directory)
+
+    def test_frameRows(self):
+        mapped = self.mapped
+        self.assertEqual(mapped.nframes, self.mocap.nframes)
+        np.testing.assert_array_equal(mapped.getFrameRows(), self.mocap.frames)
+        np.testing.assert_array_equal(mapped.getFrameRows(slice(5, 90, 4)), self.mocap.frames[5:90:4])
+        frames = np.array([3, 4, 5, 10, 2, -1])
+        np.testing.assert_array_equal(mapped.getFrameRows(frames), self.mocap.frames[frames])
+        np.testing.assert_array_equal(mapped.getFrameRows(7), self.mocap.frames[7])
+        self.assertEqual(mapped.frame_joint_channel(0, "Hips", "Zrotation"), 177.0380)
+        self.assertRaises(IndexError, mapped.getFrameRows, [0, mapped.nframes])
+
+    def test_blankLinesAndFrameCount(self):
+        path = os.path.join(self.directory, "walk.bvh")
+        with open(path, "w") as f:
+            f.write(self.data.replace("\n", "\r\n").rstrip() + "\r\n\r\n")
+        with BvhMappedFile(path) as mapped:
+            np.testing.assert_array_equal(mapped.getFrameRows(), self.mocap.frames)
+
+        with open(path, "w") as f:
+            f.write(self.data.replace("Frames: 270", "Frames: 271"))
+        self.assertRaises(ValueError, BvhMappedFile, path)
+
+    def test_convert(self):
+        expected = BvhJointHandler(self.mocap, settingsPath=self.settingsPath).generateKeyFrames()
+        frames = BvhJointHandler(self.mapped, settingsPath=self.settingsPath).generateKeyFrames()
+        np.testing.assert_array_equal(frames, expected)
+
+        converter = BvhConverter(self.settingsPath)
+        mappedConverter = BvhConverter(self.settingsPath, memoryMap=True)
+        self.assertEqual(
+            mappedConverter.convertBvhFile(self.bvhPath),
+            converter.convertBvhFile(self.bvhPath)
+        )
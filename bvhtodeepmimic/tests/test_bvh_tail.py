@@ -0,0 +1,69 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from bvhtomimic import BvhConverter
+from bvhtodeepmimic.bvh_extended import BvhExtended
+from bvhtodeepmimic.bvh_tail import BvhTail
+
+class TestBvhTail(unittest.TestCase):
+
+    def setUp(self):
+        self.settingsPath = "./bvhtodeepmimic/tests/0005_Walking001.json"
+        self.bvhPath = "./bvhtodeepmimic/tests/0005_Walking001.bvh"
+        with open(self.bvhPath) as f:
+            self.data = f.read()
+        self.mocap = BvhExtended(self.data)
+        lines = self.data.splitlines(keepends=True)
+        frameTimeLine = next(i for i, line in enumerate(lines) if line.startswith("Frame Time"))
+        self.header = "".join(lines[:frameTimeLine + 1])
+        self.rows = lines[frameTimeLine + 1:]
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "live.bvh")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def append(self, text):
+        with open(self.path, "a") as f:
+            f.write(text)
+
+    def test_readNewFrames(self):
+        self.append(self.header[:100])
+        with BvhTail(self.path) as tail:
+            self.assertFalse(tail.readHeader())
+            self.append(self.header[100:])
+            self.assertTrue(tail.readHeader())
+            self.assertEqual(len(tail.readNewFrames()), 0)
+
+            # The incomplete last line is kept for the next call.
+            self.append("".join(self.rows[:10]) + self.rows[10][:20])
+            np.testing.assert_array_equal(tail.readNewFrames(), self.mocap.frames[:10])
+            self.append(self.rows[10][20:] + "".join(self.rows[11:15]))
+            np.testing.assert_array_equal(tail.readNewFrames(), self.mocap.frames[10:15])
+            self.assertEqual(tail.nframes, 15)
+
+    def test_followBvhFile(self):
+        self.append(self.header + "".join(self.rows[:100]))
+        outputPath = os.path.join(self.directory, "live.txt")
+        chunks = [self.rows[100:180], self.rows[180:]]
+        outputs = []
+
+        def stop():
+            # The output is a complete document after every poll.
+            with open(outputPath) as output:
+                outputs.append(len(json.load(output)["Frames"]))
+            if chunks:
+                self.append("".join(chunks.pop(0)))
+                return False
+            return True
+
+        converter = BvhConverter(self.settingsPath)
+        nframes = converter.followBvhFile(self.path, outputPath, loop=True,
+                                          pollInterval=0.01, stop=stop)
+        self.assertEqual(nframes, self.mocap.nframes)
+        self.assertEqual(outputs, [100, 180, 270])
+        with open(outputPath) as output:
+            self.assertEqual(output.read(), converter.convertBvhFile(self.bvhPath, loop=True))
@@ -67,6 +67,16 @@ class TestBvhJoint(unittest.TestCase):
         test = self.root._search("NonExistantName")
         self.assertRaises(LookupError)
 
+    def test_registry(self):
+        registry = self.root.registry
+        self.assertIs(registry.joints[0], self.root)
+        leftLeg = registry.getJoint("LeftLeg")
+        self.assertEqual(registry.joints[registry.parentIndices[leftLeg.index]].name, "LeftUpLeg")
+        self.assertIs(registry.joints[registry.firstChildIndices[0]], self.root.children[0])
+        self.assertEqual(len(registry.subtree(self.root.index)), len(registry))
+        self.assertIsNone(leftLeg._search("Hips"))
+        self.assertRaises(LookupError, registry.getJoint, "NonExistantName")
+
     def test_hasEndSite(self):
         test = self.root.searchJoint("LeftToeBase")
         self.assertTrue(test.hasEndSite())
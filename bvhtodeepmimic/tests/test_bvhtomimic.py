@@ -0,0 +1,210 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from bvhtomimic import BvhConverter, BvhBatchConverter, ClipRange, ConversionTarget
+from bvhtodeepmimic.conversion_stats import ConversionStats
+from bvhtodeepmimic.deepmimic_writer import loadDeepMimicNpz
+
+class TestBvhConverter(unittest.TestCase):
+
+    def setUp(self):
+        self.settingsPath = "./bvhtodeepmimic/tests/0005_Walking001.json"
+        self.bvhPath = "./bvhtodeepmimic/tests/0005_Walking001.bvh"
+        self.converter = BvhConverter(self.settingsPath)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_writeDeepMimicFileFormats(self):
+        outputPath = os.path.join(self.directory, "walk.txt")
+        paths = self.converter.writeDeepMimicFile(
+            self.bvhPath, outputPath, loop=True, outputFormat=["compact", "npz"]
+        )
+        expected = json.loads(self.converter.convertBvhFile(self.bvhPath, loop=True))
+        # npz and json output can not share the same file name.
+        with self.assertRaises(ValueError):
+            self.converter.writeDeepMimicFile(self.bvhPath, outputPath, outputFormat=["npz", "json"])
+
+        with open(paths["compact"]) as output:
+            self.assertEqual(json.load(output), expected)
+        frames, metadata = loadDeepMimicNpz(paths["npz"])
+        np.testing.assert_array_equal(frames, expected["Frames"])
+        self.assertEqual(metadata["Loop"], "wrap")
+        self.assertEqual(metadata["FrameTime"], 0.008333)
+        self.assertEqual(sum(metadata["JointDimensions"]), frames.shape[1])
+
+    def test_writeDeepMimicData(self):
+        filePath = os.path.join(self.directory, "file.txt")
+        dataPath = os.path.join(self.directory, "data.txt")
+        self.converter.writeDeepMimicFile(self.bvhPath, filePath, loop=True)
+        with open(self.bvhPath) as bvhFile:
+            paths = self.converter.writeDeepMimicData(bvhFile.read(), dataPath, loop=True)
+        self.assertEqual(paths, {"json": dataPath})
+        with open(filePath) as fileOutput, open(dataPath) as dataOutput:
+            self.assertEqual(dataOutput.read(), fileOutput.read())
+        self.assertEqual(sorted(os.listdir(self.directory)), ["data.txt", "file.txt"])
+
+    def test_convertBvhFileToArray(self):
+        keyFrames = self.converter.convertBvhFileToArray(self.bvhPath)
+        expected = json.loads(self.converter.convertBvhFile(self.bvhPath))["Frames"]
+        self.assertEqual(keyFrames.dtype, np.float64)
+        self.assertTrue(keyFrames.flags["C_CONTIGUOUS"])
+        np.testing.assert_array_equal(keyFrames, expected)
+
+    def test_writeDeepMimicClips(self):
+        expected = json.loads(self.converter.convertBvhFile(self.bvhPath))["Frames"]
+        clips = [
+            ClipRange(0, 100, os.path.join(self.directory, "a.txt"), loop=True),
+            ClipRange(50, 120, os.path.join(self.directory, "b.txt")),
+            ClipRange(200, 270, os.path.join(self.directory, "c.txt")),
+        ]
+        stats = ConversionStats()
+        clipPaths = self.converter.writeDeepMimicClips(
+            self.bvhPath, clips, outputFormat=["json", "npz"], stats=stats
+        )
+        # Frames shared by clips and frames outside all clips are not converted twice.
+        self.assertEqual(stats.frames, 190)
+
+        for clip, paths in zip(clips, clipPaths):
+            with open(paths["json"]) as output:
+                document = json.load(output)
+            self.assertEqual(document["Loop"], "wrap" if clip.loop else "none")
+            np.testing.assert_array_equal(document["Frames"], expected[clip.start:clip.stop])
+            frames, _ = loadDeepMimicNpz(paths["npz"])
+            self.assertEqual(len(frames), clip.stop - clip.start)
+
+        with self.assertRaises(ValueError):
+            self.converter.writeDeepMimicClips(
+                self.bvhPath, [ClipRange(260, 280, os.path.join(self.directory, "d.txt"))]
+            )
+
+    def test_writeDeepMimicTargets(self):
+        # A second character with a different scale and arm mapping
+        with open(self.settingsPath) as json_data:
+            settings = json.load(json_data)
+        settings["scale"] = 0.05
+        settings["jointAssignments"]["left shoulder"] = "LeftForeArm"
+        settings["jointAssignments"]["left elbow"] = "LeftHand"
+        otherSettingsPath = os.path.join(self.directory, "other.json")
+        with open(otherSettingsPath, "w") as output:
+            json.dump(settings, output)
+
+        targets = [
+            ConversionTarget(self.settingsPath, os.path.join(self.directory, "a.txt")),
+            ConversionTarget(otherSettingsPath, os.path.join(self.directory, "b.txt")),
+        ]
+        targetPaths = self.converter.writeDeepMimicTargets(self.bvhPath, targets, loop=True)
+
+        for target, paths in zip(targets, targetPaths):
+            expected = BvhConverter(target.settingsPath).convertBvhFile(self.bvhPath, loop=True)
+            with open(paths["json"]) as output:
+                self.assertEqual(output.read(), expected)
+
+class TestBvhBatchConverter(unittest.TestCase):
+
+    def setUp(self):
+        self.settingsPath = "./bvhtodeepmimic/tests/0005_Walking001.json"
+        self.bvhPath = "./bvhtodeepmimic/tests/0005_Walking001.bvh"
+        self.directory = tempfile.mkdtemp()
+        self.inputDir = os.path.join(self.directory, "input")
+        self.outputDir = os.path.join(self.directory, "output")
+        os.makedirs(os.path.join(self.inputDir, "sub"))
+        shutil.copy(self.bvhPath, os.path.join(self.inputDir, "walk.bvh"))
+        shutil.copy(self.bvhPath, os.path.join(self.inputDir, "sub", "walk2.bvh"))
+        with open(os.path.join(self.inputDir, "broken.bvh"), "w") as broken:
+            broken.write("HIERARCHY\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_findBvhFiles(self):
+        converter = BvhBatchConverter(self.settingsPath, recursive=False)
+        self.assertEqual(len(converter.findBvhFiles(self.inputDir)), 2)
+        converter.recursive = True
+        self.assertEqual(len(converter.findBvhFiles(self.inputDir)), 3)
+
+    def test_convertDirectory(self):
+        converter = BvhBatchConverter(self.settingsPath, workers=2)
+        results = converter.convertDirectory(self.inputDir, self.outputDir)
+        self.assertEqual(len(results), 3)
+
+        failed = [result for result in results if not result.succeeded]
+        self.assertEqual(len(failed), 1)
+        self.assertTrue(failed[0].inputPath.endswith("broken.bvh"))
+
+        outputPath = os.path.join(self.outputDir, "sub", "walk2.txt")
+        self.assertTrue(os.path.isfile(outputPath))
+        with open(outputPath) as output:
+            expected = BvhConverter(self.settingsPath).convertBvhFile(self.bvhPath)
+            self.assertEqual(json.load(output), json.loads(expected))
+
+    def test_missingInput(self):
+        # A missing input is reported as failed, the other files convert.
+        converter = BvhBatchConverter(self.settingsPath, workers=2)
+        names = ["walk", "missing", "sub/walk2"]
+        results = converter.convertFiles([
+            (os.path.join(self.inputDir, name + ".bvh"), os.path.join(self.outputDir, name + ".txt"))
+            for name in names
+        ])
+        self.assertEqual([result.succeeded for result in results], [True, False, True])
+        self.assertIn("missing.bvh", results[1].error)
+
+    def test_npzFirst(self):
+        converter = BvhBatchConverter(self.settingsPath, workers=1, outputFormat=["npz", "compact"])
+        results = converter.convertDirectory(self.inputDir, self.outputDir)
+        self.assertEqual(sum(result.succeeded for result in results), 2)
+        self.assertTrue(os.path.isfile(os.path.join(self.outputDir, "walk.npz")))
+        self.assertTrue(os.path.isfile(os.path.join(self.outputDir, "walk.txt")))
+
+    def test_validate(self):
+        converter = BvhBatchConverter(self.settingsPath, workers=1, validate=True)
+        results = converter.convertDirectory(self.inputDir, self.outputDir)
+        validated = [result for result in results if result.succeeded]
+        self.assertEqual(len(validated), 2)
+        for result in validated:
+            self.assertLess(result.validation["maxError"], 1e-9)
+            self.assertEqual(result.validation["invalidFrames"], 0)
+
+    def test_resumeWithJournal(self):
+        journalPath = os.path.join(self.outputDir, "journal.jsonl")
+        converter = BvhBatchConverter(self.settingsPath, workers=2, journalPath=journalPath)
+        results = converter.convertDirectory(self.inputDir, self.outputDir)
+        self.assertFalse(any(result.skipped for result in results))
+        # Failed files leave no (partial) output behind.
+        self.assertFalse(os.path.exists(os.path.join(self.outputDir, "broken.txt")))
+        self.assertFalse(os.path.exists(os.path.join(self.outputDir, "broken.txt.partial")))
+
+        # Only the failed file and the file whose output is missing are converted again.
+        os.remove(os.path.join(self.outputDir, "walk.txt"))
+        results = converter.convertDirectory(self.inputDir, self.outputDir)
+        skipped = {os.path.basename(result.inputPath): result.skipped for result in results}
+        self.assertEqual(skipped, {"broken.bvh": False, "walk2.bvh": True, "walk.bvh": False})
+        self.assertTrue(os.path.isfile(os.path.join(self.outputDir, "walk.txt")))
+
+        # Changed inputs are converted again.
+        with open(os.path.join(self.inputDir, "sub", "walk2.bvh"), "a") as changed:
+            changed.write("\n")
+        results = converter.convertDirectory(self.inputDir, self.outputDir)
+        skipped = {os.path.basename(result.inputPath): result.skipped for result in results}
+        self.assertEqual(skipped, {"broken.bvh": False, "walk2.bvh": False, "walk.bvh": True})
+
+    def test_journalDeletedInput(self):
+        # An input deleted after it was journaled fails, the batch goes on.
+        journalPath = os.path.join(self.outputDir, "journal.jsonl")
+        converter = BvhBatchConverter(self.settingsPath, workers=1, journalPath=journalPath)
+        jobs = [
+            (os.path.join(self.inputDir, name), os.path.join(self.outputDir, name + ".txt"))
+            for name in ["walk.bvh", os.path.join("sub", "walk2.bvh")]
+        ]
+        converter.convertFiles(jobs[:1])
+        os.remove(jobs[0][0])
+        results = converter.convertFiles(jobs)
+        self.assertEqual([result.succeeded for result in results], [False, True])
+        self.assertFalse(results[0].skipped)
+
+if __name__ == '__main__':
+    unittest.main()
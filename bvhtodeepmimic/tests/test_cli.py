@@ -0,0 +1,52 @@
+import unittest
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from bvhtomimic import BvhConverter
+from bvhtodeepmimic.cli import defaultOutputPath, main, processAge
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.settingsPath = "./bvhtodeepmimic/tests/0005_Walking001.json"
+        self.bvhPath = "./bvhtodeepmimic/tests/0005_Walking001.bvh"
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_main(self):
+        outputPath = os.path.join(self.directory, "walk.txt")
+        self.assertEqual(
+            main([self.bvhPath, outputPath, "--settings", self.settingsPath, "--loop"]), 0
+        )
+        expected = BvhConverter(self.settingsPath).convertBvhFile(self.bvhPath, loop=True)
+        with open(outputPath) as output:
+            self.assertEqual(json.load(output), json.loads(expected))
+
+    def test_defaultOutputPath(self):
+        self.assertEqual(defaultOutputPath("./in/walk.bvh", "json"), "./in/walk.txt")
+        self.assertEqual(defaultOutputPath("./in/walk.bvh", "npz"), "./in/walk.npz")
+
+    def test_processAge(self):
+        # Wall time, so it includes time the process spent waiting.
+        age = processAge()
+        if age is None:
+            self.skipTest("process start time not available")
+        time.sleep(0.1)
+        self.assertGreaterEqual(processAge() - age, 0.05)
+
+    def test_lazyImports(self):
+        # Modules only needed by some conversions are not loaded on import.
+        code = (
+            "import sys, bvhtomimic; "
+            "print(','.join(m for m in ['pyquaternion', 'concurrent.futures.process', "
+            "'zipfile', 'bvhtodeepmimic.conversion_cache'] if m in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE,
+                                universal_newlines=True, check=True)
+        self.assertEqual(result.stdout.strip(), "")
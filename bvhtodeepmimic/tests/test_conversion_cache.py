@@ -0,0 +1,101 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from bvhtodeepmimic.conversion_cache import ConversionCache
+from bvhtomimic import BvhConverter
+
+class TestConversionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.settingsPath = "./bvhtodeepmimic/tests/0005_Walking001.json"
+        self.bvhPath = "./bvhtodeepmimic/tests/0005_Walking001.bvh"
+        self.directory = tempfile.mkdtemp()
+        self.cache = ConversionCache(os.path.join(self.directory, "cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def writeFile(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as output:
+            output.write(content)
+        return path
+
+    def test_computeKey(self):
+        key = ConversionCache.computeKey(self.bvhPath, {"scale": 1}, {"loop": False})
+        self.assertEqual(key, ConversionCache.computeKey(self.bvhPath, {"scale": 1}, {"loop": False}))
+        self.assertNotEqual(key, ConversionCache.computeKey(self.bvhPath, {"scale": 2}, {"loop": False}))
+        self.assertNotEqual(key, ConversionCache.computeKey(self.bvhPath, {"scale": 1}, {"loop": True}))
+
+    def test_storeAndLookup(self):
+        self.assertIsNone(self.cache.lookup("a", ["json"]))
+        self.cache.store("a", {"json": self.writeFile("a.txt", "frames")})
+        self.assertIsNone(self.cache.lookup("a", ["json", "npz"]))
+        cached = self.cache.lookup("a", ["json"])
+        with open(cached["json"]) as cachedFile:
+            self.assertEqual(cachedFile.read(), "frames")
+
+        self.cache.store("a", {"npz": self.writeFile("a.npz", "matrix")})
+        self.assertIsNotNone(self.cache.lookup("a", ["json", "npz"]))
+
+    def test_prune(self):
+        for key in ["a", "b", "c"]:
+            self.cache.store(key, {"json": self.writeFile(key, "x" * 1000)})
+        # Make "b" the least recently used entry.
+        entryFile = os.path.join(self.cache.directory, "b", "entry.json")
+        os.utime(entryFile, (time.time() - 100, time.time() - 100))
+
+        entries = self.cache.entries()
+        self.assertEqual(entries[0].key, "b")
+        removed = self.cache.prune(self.cache.totalSize() - entries[0].size)
+        self.assertEqual(removed, ["b"])
+        self.assertEqual(len(self.cache.entries()), 2)
+        self.cache.clear()
+        self.assertEqual(self.cache.totalSize(), 0)
+
+    def test_converterUsesCache(self):
+        converter = BvhConverter(self.settingsPath, cache=self.cache)
+        outputPath = os.path.join(self.directory, "walk.txt")
+        converter.writeDeepMimicFile(self.bvhPath, outputPath)
+        with open(outputPath) as output:
+            expected = output.read()
+        os.remove(outputPath)
+
+        def fail(*args):
+            raise AssertionError("Cached file was converted again.")
+        converter._convertToFiles = fail
+        converter.writeDeepMimicFile(self.bvhPath, outputPath)
+        with open(outputPath) as output:
+            self.assertEqual(output.read(), expected)
+
+        self.assertRaises(
+            AssertionError, converter.writeDeepMimicFile, self.bvhPath, outputPath, loop=True
+        )
+
+    def test_prunedWhileCopying(self):
+        # Entries pruned by another process between lookup and copy are
+        # converted again.
+        converter = BvhConverter(self.settingsPath, cache=self.cache)
+        outputPath = os.path.join(self.directory, "walk.txt")
+        converter.writeDeepMimicFile(self.bvhPath, outputPath)
+        with open(outputPath) as output:
+            expected = output.read()
+        os.remove(outputPath)
+
+        lookup = self.cache.lookup
+
+        def lookupAndPrune(*args):
+            cached = lookup(*args)
+            self.cache.clear()
+            return cached
+        self.cache.lookup = lookupAndPrune
+        converter.writeDeepMimicFile(self.bvhPath, outputPath)
+        with open(outputPath) as output:
+            self.assertEqual(output.read(), expected)
+        self.assertEqual(sorted(os.listdir(self.directory)), ["cache", "walk.txt"])
+        self.assertIsNotNone(lookup(converter.cacheKey(self.bvhPath), ["json"]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import json
+import pickle
+import numpy as np
+from bvhtodeepmimic.bvh_extended import BvhExtended
+from bvhtodeepmimic.bvh_joint_handler import BvhJointHandler
+from bvhtodeepmimic.conversion_plan import ConversionPlan, ROTATION_ANGLE, ROTATION_DIRECTION
+
+class TestConversionPlan(unittest.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestConversionPlan, self).__init__(*args, **kwargs)
+
+        with open("./bvhtodeepmimic/tests/0005_Walking001.bvh", "r") as myFile:
+            self.data = myFile.read()
+        with open("./bvhtodeepmimic/tests/0005_Walking001.json") as json_data:
+            self.settings = json.load(json_data)
+        self.mocap = BvhExtended(self.data)
+        self.plan = ConversionPlan(self.settings, self.mocap)
+
+    def test_compile(self):
+        self.assertEqual(self.plan.jointNames[0], "Hips")
+        self.assertEqual(self.plan.parents[0], -1)
+        self.assertEqual(self.plan.keyFrameWidth, 44)
+        knee = [joint.deepMimicName for joint in self.plan.jointData].index("right knee")
+        self.assertEqual(self.plan.rotationMethods[knee], ROTATION_ANGLE)
+        self.assertEqual(self.plan.rotationMethods[1], ROTATION_DIRECTION)
+
+    def test_layout(self):
+        layout = self.plan.layout
+        self.assertEqual(layout.width, 44)
+        self.assertEqual(layout.rootPosition, slice(1, 4))
+        self.assertEqual(layout.rootRotation, slice(4, 8))
+        self.assertEqual(len(layout.jointColumns), len(self.plan.jointData))
+        self.assertEqual(layout.jointColumns[-1], slice(43, 44))
+        settings = dict(self.settings, jointDimensions=[3] + self.settings["jointDimensions"][1:])
+        self.assertRaises(ValueError, ConversionPlan, settings, self.mocap)
+
+    def test_pruning(self):
+        # Joints the conversion never reads are left out of forward kinematics.
+        self.assertNotIn("LeftHandThumb", self.plan.jointNames)
+        self.assertNotIn("R_Wrist_End", self.plan.jointNames)
+        self.assertIn("Head", self.plan.jointNames)
+        self.assertLess(self.plan.njoints, self.plan.bvhJointRange[1])
+        for index, parent in enumerate(self.plan.parents):
+            self.assertLess(parent, index)
+            if parent >= 0:
+                self.assertEqual(
+                    self.mocap.joint_parents[self.plan.bvhJoints[index]],
+                    self.plan.bvhJoints[parent]
+                )
+
+    def test_reusePlan(self):
+        expected = BvhJointHandler(self.mocap, plan=self.plan).generateKeyFrames()
+
+        plan = pickle.loads(pickle.dumps(self.plan))
+        otherMocap = BvhExtended(self.data)
+        frames = BvhJointHandler(otherMocap, plan=plan).generateKeyFrames()
+        np.testing.assert_array_equal(frames, expected)
+
+    def test_incompatibleHierarchy(self):
+        mocap = BvhExtended(self.data.replace("JOINT Head", "JOINT Skull"))
+        self.assertFalse(self.plan.isCompatible(mocap))
+        self.assertRaises(ValueError, BvhJointHandler, mocap, plan=self.plan)
+
+    def test_missingJoint(self):
+        settings = dict(self.settings)
+        settings["rootRotJoints"] = {"root rot up": "Spine1", "root rot left": "Tail"}
+        self.assertRaises(LookupError, ConversionPlan, settings, self.mocap)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import unittest
+import io
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import numpy as np
+from bvhtomimic import BvhConverter
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from bvhtodeepmimic import conversion_server
+from bvhtodeepmimic.conversion_server import (
+    ConversionService, createSocketServer, handleRequest, serveLines
+)
+
+class TestConversionServer(unittest.TestCase):
+
+    def setUp(self):
+        self.settingsPath = "./bvhtodeepmimic/tests/0005_Walking001.json"
+        self.bvhPath = "./bvhtodeepmimic/tests/0005_Walking001.bvh"
+        self.directory = tempfile.mkdtemp()
+        self.expected = BvhConverter(self.settingsPath).convertBvhFileToArray(self.bvhPath)
+        conversion_server._rigs.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_frames(self):
+        response = handleRequest({"id": 3, "bvhPath": self.bvhPath, "settings": self.settingsPath})
+        self.assertTrue(response["ok"], response.get("error"))
+        self.assertEqual(response["id"], 3)
+        np.testing.assert_array_equal(response["frames"], self.expected)
+
+        with open(self.bvhPath) as bvhFile:
+            data = bvhFile.read()
+        response = handleRequest({"bvhData": data, "settings": self.settingsPath, "loop": True})
+        self.assertEqual(response["loop"], "wrap")
+        np.testing.assert_array_equal(response["frames"], self.expected)
+
+    def test_outputPath(self):
+        outputPath = os.path.join(self.directory, "walk.txt")
+        with open(self.bvhPath) as bvhFile:
+            data = bvhFile.read()
+        for request in [{"bvhPath": self.bvhPath}, {"bvhData": data}]:
+            request.update({"settings": self.settingsPath, "outputPath": outputPath,
+                            "outputFormat": "npz"})
+            response = handleRequest(request)
+            self.assertTrue(response["ok"], response.get("error"))
+            self.assertEqual(response["paths"], {"npz": outputPath})
+        self.assertEqual(os.listdir(self.directory), ["walk.txt"])
+
+    def test_errors(self):
+        response = handleRequest({"id": 1, "settings": self.settingsPath})
+        self.assertFalse(response["ok"])
+        response = handleRequest({"id": 2, "bvhPath": "missing.bvh", "settings": self.settingsPath})
+        self.assertFalse(response["ok"])
+        self.assertIn("missing.bvh", response["error"])
+
+    def test_rigCache(self):
+        handleRequest({"bvhPath": self.bvhPath, "settings": self.settingsPath}, 2)
+        converter = next(iter(conversion_server._rigs.values()))
+        handleRequest({"bvhPath": self.bvhPath, "settings": self.settingsPath}, 2)
+        self.assertIs(next(iter(conversion_server._rigs.values())), converter)
+        self.assertEqual(len(converter.plans), 1)
+
+        # Least recently used rigs are evicted, per request options do not
+        # make a new rig.
+        handleRequest({"bvhPath": self.bvhPath, "settings": self.settingsPath, "posLocked": True}, 2)
+        posLocked = next(reversed(conversion_server._rigs.values()))
+        handleRequest({"bvhPath": self.bvhPath, "settings": self.settingsPath, "loop": True}, 2)
+        handleRequest({"bvhPath": self.bvhPath, "settings": self.settingsPath,
+                       "targetFrameTime": 0.1}, 2)
+        self.assertEqual(len(conversion_server._rigs), 2)
+        self.assertIn(converter, conversion_server._rigs.values())
+        self.assertNotIn(posLocked, conversion_server._rigs.values())
+
+    def test_rigCacheSkeletons(self):
+        # Every skeleton is a rig of its own, so the plans of a worker are
+        # bounded by maxRigs as well.
+        with open(self.bvhPath) as bvhFile:
+            data = bvhFile.read()
+        for i in range(3):
+            request = {"bvhData": data.replace("LeftHandThumb", "LeftHandThumb{}".format(i)),
+                       "settings": self.settingsPath}
+            response = handleRequest(request, 2)
+            self.assertTrue(response["ok"], response.get("error"))
+            np.testing.assert_array_equal(response["frames"], self.expected)
+        self.assertEqual(len(conversion_server._rigs), 2)
+        for converter in conversion_server._rigs.values():
+            self.assertEqual(len(converter.plans), 1)
+
+    def test_brokenPool(self):
+        # A dead worker process is answered and the pool is replaced.
+        class BrokenExecutor:
+            def submit(self, *args):
+                future = Future()
+                future.set_exception(BrokenProcessPool("worker died"))
+                return future
+
+            def shutdown(self, wait=True):
+                pass
+
+        with ConversionService() as service:
+            service._executor.shutdown()
+            service._executor = BrokenExecutor()
+            output = io.StringIO()
+            line = json.dumps({"id": 1, "bvhPath": self.bvhPath, "settings": self.settingsPath})
+            serveLines(service, io.StringIO(line + "\n" + line + "\n"), output)
+            responses = [json.loads(line) for line in output.getvalue().splitlines()]
+            self.assertFalse(responses[0]["ok"])
+            self.assertIn("worker died", responses[0]["error"])
+            self.assertIsInstance(service._executor, ThreadPoolExecutor)
+            response = service.handle({"id": 2, "bvhPath": self.bvhPath, "settings": self.settingsPath})
+            self.assertTrue(response["ok"], response.get("error"))
+
+    def test_serveLines(self):
+        lines = [
+            json.dumps({"id": 1, "bvhPath": self.bvhPath, "settings": self.settingsPath}),
+            "not json",
+            json.dumps({"id": 2, "command": "ping"}),
+        ]
+        output = io.StringIO()
+        with ConversionService() as service:
+            serveLines(service, io.StringIO("\n".join(lines) + "\n"), output)
+        responses = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(len(responses), 3)
+        byId = {response["id"]: response for response in responses}
+        np.testing.assert_array_equal(byId[1]["frames"], self.expected)
+        self.assertFalse(byId[None]["ok"])
+        self.assertTrue(byId[2]["ok"])
+
+    def test_socket(self):
+        with ConversionService() as service:
+            server = createSocketServer(service, port=0)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                with socket.create_connection(server.server_address) as connection:
+                    stream = connection.makefile("rw")
+                    for i in range(2):
+                        stream.write(json.dumps({"id": i, "bvhPath": self.bvhPath,
+                                                 "settings": self.settingsPath}) + "\n")
+                        stream.flush()
+                        response = json.loads(stream.readline())
+                        self.assertEqual(response["id"], i)
+                        np.testing.assert_array_equal(response["frames"], self.expected)
+            finally:
+                server.shutdown()
+                server.server_close()
+                thread.join()
+
+if __name__ == '__main__':
+    unittest.main()
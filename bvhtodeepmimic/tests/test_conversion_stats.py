@@ -0,0 +1,106 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from bvhtomimic import BvhConverter, BvhBatchConverter
+from bvhtodeepmimic.bvh_extended import BvhExtended
+from bvhtodeepmimic.bvh_joint_handler import BvhJointHandler
+from bvhtodeepmimic.conversion_stats import ConversionStats, STAGES
+
+class TestConversionStats(unittest.TestCase):
+
+    def setUp(self):
+        self.settingsPath = "./bvhtodeepmimic/tests/0005_Walking001.json"
+        self.bvhPath = "./bvhtodeepmimic/tests/0005_Walking001.bvh"
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_stages(self):
+        stats = ConversionStats("walk")
+        progress = []
+        converter = BvhConverter(self.settingsPath,
+                                 progress=lambda done, total: progress.append((done, total)))
+        converter.convertBvhFile(self.bvhPath, stats=stats)
+
+        self.assertEqual(set(stats.stages), set(STAGES))
+        self.assertEqual(stats.frames, progress[-1][0])
+        self.assertEqual(progress[-1][0], progress[-1][1])
+        self.assertGreaterEqual(stats.totalSeconds, sum(stats.stages.values()))
+
+        path = os.path.join(self.directory, "stats.json")
+        stats.dump(path)
+        with open(path) as statsFile:
+            self.assertEqual(json.load(statsFile)["frames"], stats.frames)
+
+    def test_lastStats(self):
+        converter = BvhConverter(self.settingsPath)
+        converter.convertBvhFileToArray(self.bvhPath)
+        self.assertIsNone(converter.lastStats)
+
+        converter = BvhConverter(self.settingsPath, collectStats=True)
+        keyFrames = converter.convertBvhFileToArray(self.bvhPath)
+        stats = converter.lastStats
+        self.assertEqual(stats.name, self.bvhPath)
+        self.assertEqual(stats.frames, len(keyFrames))
+        self.assertIsNotNone(stats.seconds)
+        converter.convertBvhFile(self.bvhPath)
+        self.assertIsNot(converter.lastStats, stats)
+        self.assertEqual(converter.lastStats.counters["writeFrames"], len(keyFrames))
+
+    def test_counters(self):
+        with open(self.bvhPath) as f:
+            mocap = BvhExtended(f.read())
+        stats = ConversionStats()
+        jointHandler = BvhJointHandler(mocap, settingsPath=self.settingsPath, stats=stats)
+        jointHandler.generateKeyFrame(0)
+        jointHandler.root.searchJoint("Head")
+        mocap.frame_joint_channels(0, "Hips", ["Xrotation", "Yrotation"])
+
+        self.assertEqual(stats.counters["generateKeyFrame"], 1)
+        self.assertEqual(stats.counters["update"], 1)
+        self.assertEqual(stats.counters["searchJoint"], 1)
+        self.assertEqual(stats.counters["frame_joint_channel"], 2)
+        self.assertEqual(stats.frames, 1)
+
+    def test_blockCounters(self):
+        stats = ConversionStats()
+        outputPath = os.path.join(self.directory, "walk.txt")
+        BvhConverter(self.settingsPath, blockSize=100).writeDeepMimicFile(
+            self.bvhPath, outputPath, stats=stats
+        )
+        self.assertEqual(stats.frames, 270)
+        self.assertEqual(stats.counters["fkBlocks"], 3)
+        self.assertEqual(stats.counters["fkFrames"], 270)
+        self.assertEqual(stats.counters["rotationsFrames"], 270)
+        self.assertEqual(stats.counters["writeFrames"], 270)
+
+    def test_interpolatedFrames(self):
+        # Output frames are counted, not the source frames they are
+        # interpolated from.
+        stats = ConversionStats()
+        converter = BvhConverter(self.settingsPath, targetFrameTime=0.04,
+                                 resampleMethod="interpolate")
+        keyFrames = converter.convertBvhFileToArray(self.bvhPath, stats=stats)
+        self.assertEqual(stats.frames, len(keyFrames))
+        self.assertNotEqual(stats.counters["fkFrames"], len(keyFrames))
+
+    def test_batchReport(self):
+        outputDir = os.path.join(self.directory, "output")
+        batchConverter = BvhBatchConverter(self.settingsPath, workers=1, collectStats=True)
+        results = batchConverter.convertFiles([
+            (self.bvhPath, os.path.join(outputDir, "walk.txt")),
+            ("missing.bvh", os.path.join(outputDir, "missing.txt")),
+        ])
+        self.assertTrue(results[0].succeeded)
+        self.assertIn("fk", results[0].stats["stages"])
+
+        path = os.path.join(self.directory, "report.json")
+        BvhBatchConverter.writeReport(results, path)
+        with open(path) as reportFile:
+            report = json.load(reportFile)
+        self.assertEqual(report["failed"], 1)
+        self.assertEqual(len(report["files"]), 2)
+        self.assertIn("rotations", report["stages"])
@@ -0,0 +1,83 @@
+import unittest
+import io
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from bvhtodeepmimic.deepmimic_writer import (
+    DeepMimicWriter, DeepMimicNpzWriter, loadDeepMimicNpz, outputPaths
+)
+
+class TestDeepMimicWriter(unittest.TestCase):
+
+    def writeDocument(self, blocks, loop=False, compact=False, precision=None):
+        output = io.StringIO()
+        with DeepMimicWriter(output, loop=loop, compact=compact,
+                             precision=precision) as writer:
+            for block in blocks:
+                writer.writeFrames(block)
+        return output.getvalue()
+
+    def test_matchesJsonDump(self):
+        frames = np.random.RandomState(0).normal(size=(10, 5))
+        text = self.writeDocument([frames[:3], frames[3:]], loop=True)
+        expected = json.dumps({"Loop": "wrap", "Frames": frames.tolist()}, indent=4)
+        self.assertEqual(text, expected)
+
+    def test_emptyDocument(self):
+        text = self.writeDocument([])
+        self.assertEqual(text, json.dumps({"Loop": "none", "Frames": []}, indent=4))
+
+    def test_listFrames(self):
+        text = self.writeDocument([[[0.5, 1, float("nan")]]])
+        self.assertEqual(
+            text,
+            json.dumps({"Loop": "none", "Frames": [[0.5, 1, float("nan")]]}, indent=4)
+        )
+
+    def test_compact(self):
+        frames = np.random.RandomState(0).normal(size=(4, 3))
+        text = self.writeDocument([frames[:1], frames[1:]], compact=True, precision=3)
+        self.assertEqual(text, json.dumps(
+            {"Loop": "none", "Frames": np.round(frames, 3).tolist()},
+            separators=(",", ":")
+        ))
+        self.assertEqual(self.writeDocument([], compact=True), '{"Loop":"none","Frames":[]}')
+
+    def test_npz(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "frames.npz")
+            frames = np.random.RandomState(0).normal(size=(10, 5))
+            with DeepMimicNpzWriter(path, 10, 5, {"Loop": "wrap"}) as writer:
+                writer.writeFrames(frames[:4])
+                writer.writeFrames(frames[4:])
+            loaded, metadata = loadDeepMimicNpz(path)
+            np.testing.assert_array_equal(loaded, frames)
+            self.assertEqual(metadata, {"Loop": "wrap"})
+
+            writer = DeepMimicNpzWriter(path, 10, 5, {})
+            writer.writeFrames(frames[:4])
+            self.assertRaises(ValueError, writer.close)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_outputPaths(self):
+        self.assertEqual(outputPaths("out/walk.txt", "json"), {"json": "out/walk.txt"})
+        self.assertEqual(
+            outputPaths("out/walk.txt", ["compact", "npz"]),
+            {"compact": "out/walk.txt", "npz": "out/walk.npz"}
+        )
+        self.assertRaises(ValueError, outputPaths, "walk.txt", "yaml")
+        self.assertRaises(ValueError, outputPaths, "walk.txt", ["json", "compact"])
+        # Both files would be walk.txt
+        self.assertRaises(ValueError, outputPaths, "walk.txt", ["npz", "compact"])
+        self.assertRaises(ValueError, outputPaths, "walk.txt", ["npz", "json"])
+        self.assertEqual(
+            outputPaths("out/walk.npz", ["npz", "json"]),
+            {"npz": "out/walk.npz", "json": "out/walk.txt"}
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import json
+import numpy as np
+from bvhtodeepmimic.bvh_extended import BvhExtended
+from bvhtodeepmimic.bvh_joint import BvhJoint
+from bvhtodeepmimic.forward_kinematics import ForwardKinematics
+
+class TestForwardKinematics(unittest.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestForwardKinematics, self).__init__(*args, **kwargs)
+
+        self.mocap = self.createMocap("./bvhtodeepmimic/tests/0005_Walking001.bvh")
+        self.settings = self.readSettings("./bvhtodeepmimic/tests/0005_Walking001.json")
+        self.root = self.createRoot()
+
+    def createMocap(self, bvhPath):
+        with open(bvhPath, "r") as myFile:
+            mocap = BvhExtended(myFile.read())
+
+        return mocap
+
+    def readSettings(self, settingsPath):
+        with open(settingsPath) as json_data:
+            settings = json.load(json_data)
+        return settings
+
+    def createRoot(self):
+        root = BvhJoint(self.mocap,
+                        "Hips",
+                        self.settings["positionChannelNames"],
+                        self.settings["rotationChannelNames"]
+        )
+        return root
+
+    def test_fromJoint(self):
+        kinematics = ForwardKinematics.fromJoint(self.root)
+        self.assertEqual(kinematics.names[0], "Hips")
+        self.assertEqual(kinematics.names[1], "LeftUpLeg")
+        self.assertEqual(kinematics.parents[0], -1)
+        for i, parent in enumerate(kinematics.parents[1:], 1):
+            self.assertLess(parent, i)
+
+    def test_updateFrames(self):
+        result = self.root.updateFrames()
+        self.assertEqual(result.positions.shape, (270, len(result.names), 3))
+        self.assertEqual(result.total_tf_matrices.shape, (270, len(result.names), 4, 4))
+
+        child = result.getIndex("LeftUpLeg")
+        self.assertAlmostEqual(result.positions[0, child, 0], 4.803989001169213)
+        self.assertAlmostEqual(result.positions[0, child, 1], 32.631972506422834)
+        self.assertAlmostEqual(result.positions[0, child, 2], -20.776430497304112)
+        self.assertAlmostEqual(result.rotation_matrices[0, child, 0, 0], 0.9996688)
+        self.assertAlmostEqual(result.tf_matrices[0, child, 0, 0], 9.99668797e-01)
+
+    def test_matchesUpdate(self):
+        frames = [0, 100, 269]
+        result = self.root.updateFrames(frames)
+        for i, frame in enumerate(frames):
+            self.root.update(frame)
+            for name in ["Hips", "LeftFoot", "RightHand", "Head"]:
+                joint = self.root.searchJoint(name)
+                index = result.getIndex(name)
+                np.testing.assert_allclose(
+                    result.total_tf_matrices[i, index], joint.total_tf_matrix,
+                    atol=1e-9
+                )
+                np.testing.assert_allclose(
+                    result.positions[i, index], joint.position, atol=1e-9
+                )
+
+if __name__ == '__main__':
+    unittest.main()
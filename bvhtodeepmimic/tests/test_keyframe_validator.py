@@ -0,0 +1,76 @@
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+from bvhtomimic import BvhConverter
+from bvhtodeepmimic.bvh_extended import BvhExtended
+from bvhtodeepmimic.bvh_joint_handler import BvhJointHandler
+from bvhtodeepmimic.keyframe_validator import ROOT, KeyFrameValidator
+
+class TestKeyFrameValidator(unittest.TestCase):
+
+    def setUp(self):
+        self.settingsPath = "./bvhtodeepmimic/tests/0005_Walking001.json"
+        self.bvhPath = "./bvhtodeepmimic/tests/0005_Walking001.bvh"
+        with open(self.bvhPath) as f:
+            self.mocap = BvhExtended(f.read())
+        self.handler = BvhJointHandler(self.mocap, settingsPath=self.settingsPath)
+        self.validator = KeyFrameValidator(self.handler)
+        self.keyFrames = self.handler.generateKeyFrameMatrix()
+
+    def jointColumns(self, name):
+        names = [joint.deepMimicName for joint in self.handler.jointData]
+        return self.handler.plan.layout.jointColumns[names.index(name)]
+
+    def test_validConversion(self):
+        report = self.validator.validate(self.keyFrames)
+        self.assertEqual(report.nframes, self.mocap.nframes)
+        self.assertEqual(report.joints[0], ROOT)
+        self.assertIn("right knee", report.joints)
+        self.assertTrue(report.passed(1e-9))
+
+    def test_badRotation(self):
+        # A wrong hip rotation moves the end of the thigh and everything
+        # below it, the other leg is not affected.
+        self.keyFrames[40, self.jointColumns("right hip")] = [1, 0, 0, 0]
+        report = self.validator.validate(self.keyFrames)
+        errors = report.jointErrors()
+        self.assertFalse(report.passed(1e-3))
+        for joint in ["right hip", "right knee", "right ankle"]:
+            self.assertGreater(errors[joint]["max"], 1e-3)
+            self.assertEqual(errors[joint]["worstFrame"], 40)
+        self.assertLess(errors["left knee"]["max"], 1e-9)
+
+        self.keyFrames[41, self.jointColumns("left knee")] = np.nan
+        report = self.validator.validate(self.keyFrames)
+        self.assertEqual(report.invalidFrames, 1)
+        self.assertFalse(report.passed(1.0))
+
+    def test_resampled(self):
+        handler = BvhJointHandler(self.mocap, settingsPath=self.settingsPath,
+                                  targetFrameTime=3 * self.mocap.frame_time)
+        report = KeyFrameValidator(handler).validate(handler.generateKeyFrameMatrix())
+        self.assertTrue(report.passed(1e-9))
+
+        handler = BvhJointHandler(self.mocap, settingsPath=self.settingsPath,
+                                  targetFrameTime=3 * self.mocap.frame_time,
+                                  resampleMethod="interpolate")
+        with self.assertRaises(ValueError):
+            KeyFrameValidator(handler).validate(handler.generateKeyFrameMatrix())
+
+    def test_validateDeepMimicFile(self):
+        directory = tempfile.mkdtemp()
+        try:
+            converter = BvhConverter(self.settingsPath, posLocked=True)
+            outputPath = os.path.join(directory, "walk.txt")
+            converter.writeDeepMimicFile(self.bvhPath, outputPath, precision=6)
+            report = converter.validateDeepMimicFile(self.bvhPath, outputPath)
+            self.assertNotIn(ROOT, report.joints)
+            # Rounded to 6 decimals
+            self.assertTrue(report.passed(1e-4))
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
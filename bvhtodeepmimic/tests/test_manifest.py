@@ -0,0 +1,65 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from bvhtodeepmimic.manifest import Manifest, buildManifest
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.settingsPath = "./bvhtodeepmimic/tests/0005_Walking001.json"
+        self.bvhPath = "./bvhtodeepmimic/tests/0005_Walking001.bvh"
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, "sub"))
+        shutil.copyfile(self.bvhPath, os.path.join(self.directory, "walk.bvh"))
+        with open(self.bvhPath) as f:
+            data = f.read()
+        # Shorter clip of the same rig
+        lines = data.splitlines()
+        frameLine = next(i for i, line in enumerate(lines) if line.startswith("Frames:"))
+        lines[frameLine] = "Frames: 10"
+        with open(os.path.join(self.directory, "sub", "short.bvh"), "w") as f:
+            f.write("\n".join(lines[:frameLine + 12]) + "\n")
+        # Rig missing a joint of the settings
+        with open(os.path.join(self.directory, "sub", "other.bvh"), "w") as f:
+            f.write(data.replace("LeftUpLeg", "LeftThigh"))
+        with open(os.path.join(self.directory, "broken.bvh"), "w") as f:
+            f.write("HIERARCHY\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_buildManifest(self):
+        manifest = buildManifest(self.directory, self.settingsPath)
+        entries = {entry.path: entry for entry in manifest.entries}
+        self.assertEqual(len(entries), 4)
+
+        walk = entries["walk.bvh"]
+        self.assertEqual(walk.nframes, 270)
+        self.assertEqual(walk.frameTime, 0.008333)
+        self.assertEqual(walk.size, os.path.getsize(self.bvhPath))
+        self.assertEqual(entries[os.path.join("sub", "short.bvh")].signature, walk.signature)
+        self.assertIsNotNone(entries["broken.bvh"].error)
+
+        other = manifest.skeletons[entries[os.path.join("sub", "other.bvh")].signature]
+        self.assertFalse(other.compatible)
+        self.assertEqual(other.missingJoints, ["LeftUpLeg"])
+        self.assertEqual(
+            sorted(entry.path for entry in manifest.compatibleEntries()),
+            [os.path.join("sub", "short.bvh"), "walk.bvh"]
+        )
+
+    def test_shardAndReload(self):
+        manifest = buildManifest(self.directory, self.settingsPath)
+        path = os.path.join(self.directory, "manifest.json")
+        manifest.save(path)
+        with open(path) as f:
+            self.assertIn("skeletons", json.load(f))
+
+        loaded = Manifest.load(path)
+        self.assertEqual(len(loaded.entries), len(manifest.entries))
+        shards = loaded.shard(2)
+        self.assertEqual([len(shard) for shard in shards], [1, 1])
+        self.assertEqual(shards[0][0].path, "walk.bvh")
+        self.assertGreater(shards[0][0].cost, shards[1][0].cost)
@@ -0,0 +1,56 @@
+import unittest
+import sys
+import numpy as np
+from bvhtomimic import BvhConverter
+from bvhtodeepmimic.bvh_extended import BvhExtended
+from bvhtodeepmimic.bvh_joint_handler import BvhJointHandler
+from bvhtodeepmimic.conversion_stats import ConversionStats
+from bvhtodeepmimic.resampling import INTERPOLATE
+
+# multiprocessing.shared_memory is new in python 3.8
+if sys.version_info >= (3, 8):
+    from bvhtodeepmimic.parallel_conversion import ParallelKeyFrames
+
+@unittest.skipIf(sys.version_info < (3, 8), "shared memory needs python 3.8")
+class TestParallelConversion(unittest.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestParallelConversion, self).__init__(*args, **kwargs)
+
+        self.settingsPath = "./bvhtodeepmimic/tests/0005_Walking001.json"
+        self.bvhPath = "./bvhtodeepmimic/tests/0005_Walking001.bvh"
+        with open(self.bvhPath) as f:
+            self.mocap = BvhExtended(f.read())
+
+    def test_identicalToSerial(self):
+        for options in [{}, {"targetFrameTime": 0.005, "resampleMethod": INTERPOLATE}]:
+            jointHandler = BvhJointHandler(self.mocap, settingsPath=self.settingsPath, **options)
+            expected = np.concatenate(list(jointHandler.iterKeyFrameBlocks(blockSize=50)))
+            blocks = list(ParallelKeyFrames(
+                jointHandler, self.bvhPath, workers=2, blockSize=50
+            ).iterKeyFrameBlocks())
+            self.assertEqual(len(blocks[0]), 50)
+            np.testing.assert_array_equal(np.concatenate(blocks), expected)
+
+    def test_converter(self):
+        serial = BvhConverter(self.settingsPath).convertBvhFile(self.bvhPath)
+        # Blocks smaller than the clip, so the worker pool is used.
+        stats = ConversionStats()
+        parallel = BvhConverter(self.settingsPath, frameWorkers=2, blockSize=64).convertBvhFile(
+            self.bvhPath, stats=stats
+        )
+        self.assertIn("workers", stats.stages)
+        self.assertEqual(parallel, serial)
+
+    def test_memoryMap(self):
+        # Workers map the file themselves, the motion is not copied.
+        expected = BvhConverter(self.settingsPath).convertBvhFileToArray(self.bvhPath)
+        converter = BvhConverter(self.settingsPath, memoryMap=True, frameWorkers=2, blockSize=64)
+        with converter._openJointHandler(self.bvhPath) as jointHandler:
+            def fail(*args):
+                raise AssertionError("Motion was read by the parent process.")
+            jointHandler.mocap.getFrameRows = fail
+            parallel = ParallelKeyFrames(jointHandler, self.bvhPath, workers=2, blockSize=64)
+            blocks = list(parallel.iterKeyFrameBlocks())
+        np.testing.assert_array_equal(np.concatenate(blocks), expected)
+        np.testing.assert_array_equal(converter.convertBvhFileToArray(self.bvhPath), expected)
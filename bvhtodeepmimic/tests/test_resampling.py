@@ -0,0 +1,57 @@
+import unittest
+import numpy as np
+from bvhtodeepmimic.bvh_extended import BvhExtended
+from bvhtodeepmimic.bvh_joint_handler import BvhJointHandler
+from bvhtodeepmimic.resampling import DECIMATE, INTERPOLATE, Resampler
+
+class TestResampling(unittest.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestResampling, self).__init__(*args, **kwargs)
+
+        self.settingsPath = "./bvhtodeepmimic/tests/0005_Walking001.json"
+        with open("./bvhtodeepmimic/tests/0005_Walking001.bvh") as f:
+            self.mocap = BvhExtended(f.read())
+        self.keyFrames = np.array(
+            BvhJointHandler(self.mocap, settingsPath=self.settingsPath).generateKeyFrames()
+        )
+
+    def createHandler(self, targetFrameTime, method):
+        return BvhJointHandler(self.mocap, settingsPath=self.settingsPath,
+                               targetFrameTime=targetFrameTime, resampleMethod=method)
+
+    def test_frameCount(self):
+        self.assertEqual(Resampler(9, 0.25, 1.0).nframes, 3)
+        self.assertEqual(Resampler(10, 0.25, 1.0).nframes, 3)
+        self.assertEqual(Resampler(10, 0.25).nframes, 10)
+        self.assertEqual(Resampler(1, 0.25, 1.0).nframes, 1)
+        with self.assertRaises(ValueError):
+            Resampler(10, 0.25, 1.0, "cubic")
+
+    def test_decimate(self):
+        frameTime = self.mocap.frame_time
+        jointHandler = self.createHandler(4 * frameTime, DECIMATE)
+        keyFrames = np.concatenate(list(jointHandler.iterKeyFrameBlocks(blockSize=7)))
+
+        expected = self.keyFrames[::4]
+        self.assertEqual(len(keyFrames), len(expected))
+        np.testing.assert_array_equal(keyFrames[:, 1:], expected[:, 1:])
+        np.testing.assert_array_equal(keyFrames[:, 0], 4 * frameTime)
+
+    def test_interpolate(self):
+        frameTime = self.mocap.frame_time
+        jointHandler = self.createHandler(frameTime / 2, INTERPOLATE)
+        keyFrames = np.array(jointHandler.generateKeyFrames())
+
+        self.assertEqual(len(keyFrames), 2 * self.mocap.nframes - 1)
+        np.testing.assert_allclose(keyFrames[::2, 1:], self.keyFrames[:, 1:], atol=1e-12)
+        np.testing.assert_array_equal(keyFrames[:, 0], frameTime / 2)
+        # Root position is halfway between its neighbours.
+        np.testing.assert_allclose(
+            keyFrames[1::2, 1:4],
+            (self.keyFrames[:-1, 1:4] + self.keyFrames[1:, 1:4]) / 2, atol=1e-12
+        )
+        # Quaternions stay unit length.
+        np.testing.assert_allclose(
+            np.linalg.norm(keyFrames[:, 4:8], axis=1), 1.0, atol=1e-12
+        )
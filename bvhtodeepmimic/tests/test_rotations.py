@@ -0,0 +1,63 @@
+import unittest
+import numpy as np
+from pyquaternion import Quaternion
+from bvhtodeepmimic import rotations
+from bvhtodeepmimic.bvh_joint_handler import BvhJointHandler
+
+class TestRotations(unittest.TestCase):
+
+    def __init__(self, *args, **kwargs):
+        super(TestRotations, self).__init__(*args, **kwargs)
+
+        self.random = np.random.RandomState(0)
+
+    def test_matrixToQuat(self):
+        quats = [Quaternion.random() for _ in range(200)]
+        matrices = np.array([quat.rotation_matrix for quat in quats])
+        expected = np.array([Quaternion(matrix=m).elements for m in matrices])
+        np.testing.assert_allclose(rotations.matrixToQuat(matrices), expected, atol=1e-12)
+
+    def test_quatFromVecs(self):
+        v1 = self.random.normal(size=(50, 3))
+        v2 = self.random.normal(size=(50, 3))
+        quats = rotations.quatFromVecs(v1, v2)
+        expected = np.array([
+            BvhJointHandler.calcQuatFromVecs(a, b).elements for a, b in zip(v1, v2)
+        ])
+        np.testing.assert_allclose(quats, expected, atol=1e-12)
+        np.testing.assert_allclose(
+            rotations.quatRotate(quats, rotations.normalize(v1)),
+            rotations.normalize(v2), atol=1e-12
+        )
+
+    def test_quatFromParallelVecs(self):
+        quat = rotations.quatFromVecs(np.array([1, 2, 3]), np.array([2, 4, 6]))
+        np.testing.assert_allclose(quat, [1, 0, 0, 0])
+
+    def test_vectorAngles(self):
+        angles = rotations.vectorAngles(np.array([[1, 0, 0], [1, 0, 0]]),
+                                        np.array([[0, 2, 0], [-1, 0, 0]]))
+        np.testing.assert_allclose(angles, [np.pi / 2, np.pi])
+
+    def test_quatBvhToDM(self):
+        quat = np.array([1, 2, 3, 4])
+        expected = BvhJointHandler.quatBvhToDM(Quaternion(quat)).elements
+        np.testing.assert_allclose(rotations.quatBvhToDM(quat), expected)
+
+if __name__ == '__main__':
+    unittest.main()
+
+    def test_slerp(self):
+        q0 = [Quaternion.random() for _ in range(50)]
+        q1 = [Quaternion.random() for _ in range(50)]
+        weights = self.random.uniform(size=50)
+        expected = np.array([
+            Quaternion.slerp(a, b, w).elements for a, b, w in zip(q0, q1, weights)
+        ])
+        result = rotations.slerp(
+            [q.elements for q in q0], [q.elements for q in q1], weights
+        )
+        # Both results describe the same rotation, up to the sign.
+        signs = np.sign(np.sum(result * expected, axis=-1, keepdims=True))
+        np.testing.assert_allclose(result * signs, expected, atol=1e-9)
+        np.testing.assert_allclose(rotations.slerp(result, result, weights), result, atol=1e-12)
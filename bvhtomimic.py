@@ -1,30 +1,728 @@
+import io
 import json
+import os
+import shutil
+import time
+import traceback
+from contextlib import ExitStack, contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Union
+import numpy as np
+from bvhtodeepmimic.batch_journal import DONE, FAILED, BatchJournal, JournalEntry, hashFile
 from bvhtodeepmimic.bvh_extended import BvhExtended
 from bvhtodeepmimic.bvh_joint_handler import BvhJointHandler
+from bvhtodeepmimic.conversion_plan import ConversionPlan
+from bvhtodeepmimic.conversion_stats import ConversionStats, measureStage
+from bvhtodeepmimic.manifest import findBvhFiles
+from bvhtodeepmimic.resampling import DECIMATE
+from bvhtodeepmimic.deepmimic_writer import (
+    JSON, COMPACT_JSON, NPZ, DeepMimicWriter, DeepMimicNpzWriter, atomicOutput, formatExtension,
+    loadKeyFrames, loopText, outputPaths
+)
+# Modules only needed by some conversions are imported where they are used,
+# which keeps the startup of short-lived conversion processes fast.
+if TYPE_CHECKING:
+    from bvhtodeepmimic.conversion_cache import ConversionCache
+    from bvhtodeepmimic.keyframe_validator import ValidationReport
+
+class ClipRange:
+    """ A clip cut out of a longer take: frames start..stop (stop exclusive)
+    written to outputPath. Frame numbers count the output frames of the take,
+    which are the BVH frames unless the converter resamples.
+    """
+    def __init__(self, start: int, stop: int, outputPath: str, loop=False):
+        self.start = start
+        self.stop = stop
+        self.outputPath = outputPath
+        self.loop = loop
+
+    def __repr__(self):
+        return "ClipRange({}, {}, {!r}, loop={})".format(
+            self.start, self.stop, self.outputPath, self.loop
+        )
+
+
+class ConversionTarget:
+    """ One output of a multi-target conversion: the settings file of a
+    character and the path its DeepMimic file is written to.
+    """
+    def __init__(self, settingsPath: str, outputPath: str):
+        self.settingsPath = settingsPath
+        self.outputPath = outputPath
+
+    def __repr__(self):
+        return "ConversionTarget({!r}, {!r})".format(self.settingsPath, self.outputPath)
+
 
 class BvhConverter:
-    def __init__(self, setting_path: str):
+    def __init__(self, setting_path: str, posLocked=False,
+                 cache: "ConversionCache" = None,
+                 progress: Callable[[int, int], None] = None,
+                 targetFrameTime: float = None, resampleMethod=DECIMATE,
+                 memoryMap=False, frameWorkers: int = 1, blockSize=1024,
+                 collectStats=False):
         self.setting_path = setting_path
+        self.posLocked = posLocked
+        # Processes converting the frames of a single file, for long takes.
+        # The output is identical to converting on one process.
+        self.frameWorkers = frameWorkers
+        # Frames converted and written at once, also the unit of work of the
+        # frame workers. Clips of at most one block are converted serially.
+        self.blockSize = blockSize
+        # Memory map .bvh files and parse frames on demand, instead of
+        # reading the whole file, for captures too large for memory.
+        self.memoryMap = memoryMap
+        # Optional output frame time, reached by decimating or interpolating
+        # the frames of the clip (see resampling.py).
+        self.targetFrameTime = targetFrameTime
+        self.resampleMethod = resampleMethod
+        # Optional cache serving previously converted outputs.
+        self.cache = cache
+        # Optional callback(convertedFrames, totalFrames), e.g. tqdmProgress().
+        self.progress = progress
+        # Record ConversionStats of every conversion that is not passed a
+        # stats object. The stats of the last conversion are kept in lastStats.
+        self.collectStats = collectStats
+        self.lastStats: ConversionStats = None
+
+        # Settings by path, including those of additional targets
+        self.targetSettings: Dict[str, dict] = {}
+        self.settings = self.getSettings(setting_path)
+        # Compiled conversion plans by settings path and BVH hierarchy
+        # signature, so files of the same rig are set up only once.
+        self.plans: Dict[tuple, ConversionPlan] = {}
+
+    def getSettings(self, settingsPath: str) -> dict:
+        if settingsPath not in self.targetSettings:
+            with open(settingsPath) as json_data:
+                self.targetSettings[settingsPath] = json.load(json_data)
+        return self.targetSettings[settingsPath]
+
+    def getPlan(self, mocap: BvhExtended, settingsPath: str = None) -> ConversionPlan:
+        settingsPath = settingsPath or self.setting_path
+        key = (settingsPath, mocap.hierarchySignature())
+        if key not in self.plans:
+            self.plans[key] = ConversionPlan(self.getSettings(settingsPath), mocap)
+        return self.plans[key]
+
+    def _startStats(self, stats: ConversionStats, name: str = None) -> ConversionStats:
+        if stats is None and self.collectStats:
+            stats = ConversionStats(name)
+        if stats is not None:
+            self.lastStats = stats
+        return stats
 
-    def convertBvhFile(self, filePath: str, loop=False):
-        with open(filePath) as bvhFile:
-            mocap = BvhExtended(bvhFile.read())
-        
-        jointHandler = BvhJointHandler(mocap, settingsPath=self.setting_path)
-        frames = jointHandler.generateKeyFrames()
-
-        loopText = "none"
-        if loop:
-            loopText = "wrap"
-
-        # Output in dictionary format for easy json dump
-        outputDict = {
-            "Loop": loopText,  # "none" or "wrap"
-            "Frames": frames
+    @contextmanager
+    def _openMocap(self, filePath: str, stats: ConversionStats = None):
+        if self.memoryMap:
+            # Frames are parsed during forward kinematics.
+            with measureStage(stats, "read"):
+                from bvhtodeepmimic.bvh_mapped_file import BvhMappedFile
+                mocap = BvhMappedFile(filePath)
+        else:
+            with measureStage(stats, "read"):
+                with open(filePath) as bvhFile:
+                    data = bvhFile.read()
+            with measureStage(stats, "parse"):
+                mocap = BvhExtended(data)
+
+        try:
+            yield mocap
+        finally:
+            if self.memoryMap:
+                mocap.close()
+
+    def _createJointHandler(self, mocap: BvhExtended, settingsPath: str = None,
+                            stats: ConversionStats = None) -> BvhJointHandler:
+        with measureStage(stats, "tree"):
+            return BvhJointHandler(
+                mocap, posLocked=self.posLocked,
+                plan=self.getPlan(mocap, settingsPath), stats=stats,
+                progress=self.progress, targetFrameTime=self.targetFrameTime,
+                resampleMethod=self.resampleMethod
+            )
+
+    @contextmanager
+    def _openJointHandler(self, filePath: str,
+                          stats: ConversionStats = None) -> Iterator[BvhJointHandler]:
+        with self._openMocap(filePath, stats) as mocap:
+            yield self._createJointHandler(mocap, stats=stats)
+
+    def cacheKey(self, bvhPath: str, loop=False, precision: int = None) -> str:
+        settings = self.settings
+        options = {
+            "posLocked": self.posLocked,
+            "targetFrameTime": self.targetFrameTime,
+            "resampleMethod": self.resampleMethod,
+            "loop": loop,
+            "precision": precision,
         }
+        from bvhtodeepmimic.conversion_cache import ConversionCache
+        return ConversionCache.computeKey(bvhPath, settings, options)
+
+    def convertBvhFile(self, filePath: str, loop=False,
+                       stats: ConversionStats = None):
+        stats = self._startStats(stats, filePath)
+        output = io.StringIO()
+        self.writeDeepMimicStream(filePath, output, loop=loop, stats=stats)
+        return output.getvalue()
+
+    def convertBvhFileToArray(self, filePath: str,
+                              stats: ConversionStats = None) -> np.ndarray:
+        """ Convert a .bvh file into a (nframes, width) float64 matrix of key
+        frames, for binary writers or training code.
+        """
+        stats = self._startStats(stats, filePath)
+        with self._openJointHandler(filePath, stats) as jointHandler:
+            if self.frameWorkers > 1:
+                keyFrames = np.empty((jointHandler.nframes, jointHandler.keyFrameWidth))
+                start = 0
+                for block in self._iterKeyFrameBlocks(jointHandler, filePath):
+                    keyFrames[start:start + len(block)] = block
+                    start += len(block)
+            else:
+                keyFrames = jointHandler.generateKeyFrameMatrix()
+        if stats is not None:
+            stats.finish()
+        return keyFrames
+
+    def convertBvhDataToArray(self, data: Union[str, BvhExtended],
+                              stats: ConversionStats = None) -> np.ndarray:
+        """ Like convertBvhFileToArray, for the text of a .bvh file that is
+        not stored in a file, e.g. received over a socket, or the BvhExtended
+        parsed from it.
+        """
+        stats = self._startStats(stats)
+        mocap = self._parseMocap(data, stats)
+        keyFrames = self._createJointHandler(mocap, stats=stats).generateKeyFrameMatrix()
+        if stats is not None:
+            stats.finish()
+        return keyFrames
+
+    @staticmethod
+    def _parseMocap(data: Union[str, BvhExtended], stats: ConversionStats = None) -> BvhExtended:
+        if isinstance(data, BvhExtended):
+            return data
+        with measureStage(stats, "parse"):
+            return BvhExtended(data)
+
+    def validateKeyFrames(self, bvhPath: str, keyFrames: np.ndarray) -> "ValidationReport":
+        """ Compare the joint positions reconstructed from the key frames of
+        bvhPath against the BVH joint positions, see keyframe_validator.py.
+        """
+        from bvhtodeepmimic.keyframe_validator import KeyFrameValidator
+        with self._openJointHandler(bvhPath) as jointHandler:
+            return KeyFrameValidator(jointHandler).validate(keyFrames)
+
+    def validateDeepMimicFile(self, bvhPath: str, deepMimicPath: str) -> "ValidationReport":
+        """ Validate a json or npz file converted from bvhPath.
+        """
+        return self.validateKeyFrames(bvhPath, loadKeyFrames(deepMimicPath))
+
+    def writeDeepMimicStream(self, bvhPath, fileHandle, loop=False,
+                             compact=False, precision: int = None,
+                             stats: ConversionStats = None):
+        """ Convert a .bvh file and stream the DeepMimic document to an open
+        text file handle, one block of frames at a time.
+
+        When stats is given, or collectStats is set, the time spent in every
+        conversion stage and the counters are recorded into it.
+        """
+        stats = self._startStats(stats, bvhPath)
+        with self._openJointHandler(bvhPath, stats) as jointHandler, \
+                DeepMimicWriter(fileHandle, loop=loop, compact=compact,
+                                precision=precision, stats=stats) as writer:
+            for block in self._iterKeyFrameBlocks(jointHandler, bvhPath):
+                writer.writeFrames(block)
+        if stats is not None:
+            stats.finish()
+
+    def _iterKeyFrameBlocks(self, jointHandler: BvhJointHandler,
+                            bvhPath: str) -> Iterator[np.ndarray]:
+        if self.frameWorkers > 1:
+            # Imported here, shared memory needs python 3.8 or newer.
+            from bvhtodeepmimic.parallel_conversion import ParallelKeyFrames
+            return ParallelKeyFrames(
+                jointHandler, bvhPath, self.frameWorkers, self.blockSize
+            ).iterKeyFrameBlocks()
+        return jointHandler.iterKeyFrameBlocks(self.blockSize)
+
+    def writeDeepMimicFile(self, bvhPath, outputPath, loop=False,
+                           outputFormat=JSON, precision: int = None,
+                           stats: ConversionStats = None):
+        """ Convert a .bvh file and write it in one or more output formats.
+
+        Args:
+            outputFormat: "json", "compact", "npz" or a list of those to
+                write several formats in one pass. The first format is
+                written to outputPath, the others next to it.
+            precision: number of decimals of the values in json output.
+            stats: optional ConversionStats recording stage timings.
+
+        Returns:
+            dict: output format -> path of the written file.
+        """
+        stats = self._startStats(stats, bvhPath)
+        paths = outputPaths(outputPath, outputFormat)
+
+        if self.cache is not None:
+            key = self.cacheKey(bvhPath, loop=loop, precision=precision)
+            cached = self.cache.lookup(key, list(paths))
+            if cached is not None:
+                with measureStage(stats, "write"):
+                    copied = self._copyCached(cached, paths)
+                if copied:
+                    if stats is not None:
+                        stats.count("cacheHit")
+                        stats.finish()
+                    return paths
+
+        self._convertToFiles(bvhPath, paths, loop, precision, stats)
+
+        if self.cache is not None:
+            self.cache.store(key, paths)
+        if stats is not None:
+            stats.finish()
+        return paths
+
+    def writeDeepMimicClips(self, bvhPath, clips: List[ClipRange],
+                            outputFormat=JSON, precision: int = None,
+                            stats: ConversionStats = None) -> List[Dict[str, str]]:
+        """ Convert several clips of one .bvh file in a single pass.
+
+        The file is parsed once and only frames inside at least one clip go
+        through forward kinematics, frames shared by overlapping clips are
+        converted once. Clips are not cached.
+
+        Returns:
+            list: per clip, output format -> path of the written file.
+        """
+        stats = self._startStats(stats, bvhPath)
+        clipPaths = [outputPaths(clip.outputPath, outputFormat) for clip in clips]
+        with ExitStack() as stack:
+            jointHandler = stack.enter_context(self._openJointHandler(bvhPath, stats))
+            for clip in clips:
+                if not 0 <= clip.start < clip.stop <= jointHandler.nframes:
+                    raise ValueError("{} is not within the {} frames of {}.".format(
+                        clip, jointHandler.nframes, bvhPath
+                    ))
+
+            clipWriters = []
+            for clip, paths in zip(clips, clipPaths):
+                clipWriters.append(self._openWriters(
+                    stack, jointHandler, paths, clip.loop, precision, stats,
+                    nframes=clip.stop - clip.start
+                ))
+
+            frames = np.unique(np.concatenate([
+                np.arange(clip.start, clip.stop) for clip in clips
+            ])) if clips else np.empty(0, dtype=np.intp)
+            for blockFrames, block in jointHandler.iterFrameBlocks(frames):
+                for clip, writers in zip(clips, clipWriters):
+                    inClip = (blockFrames >= clip.start) & (blockFrames < clip.stop)
+                    if inClip.any():
+                        for writer in writers:
+                            writer.writeFrames(block[inClip])
+        if stats is not None:
+            stats.finish()
+        return clipPaths
+
+    def followBvhFile(self, bvhPath, outputPath, loop=False, compact=False,
+                      precision: int = None, pollInterval=0.5,
+                      idleTimeout: float = None, stop: Callable[[], bool] = None,
+                      stats: ConversionStats = None) -> int:
+        """ Convert a .bvh file while it is being recorded.
+
+        The hierarchy is parsed once, then the file is polled every
+        pollInterval seconds and only newly appended frames are converted
+        and appended to outputPath. The output is a complete DeepMimic file
+        after every poll. Stops once stop() returns True, or when no frames
+        were added for idleTimeout seconds. Resampling is not supported.
+
+        Returns:
+            int: the number of converted frames.
+        """
+        stats = self._startStats(stats, bvhPath)
+        if self.targetFrameTime is not None:
+            raise ValueError("Resampling is not supported while following a file.")
+        from bvhtodeepmimic.bvh_tail import BvhTail
+        jointHandler = None
+        idle = 0.0
+        with BvhTail(bvhPath) as tail, open(outputPath, "w") as output:
+            writer = DeepMimicWriter(output, loop=loop, compact=compact,
+                                     precision=precision, stats=stats, keepValid=True)
+            while True:
+                frames = None
+                if jointHandler is None and tail.readHeader():
+                    jointHandler = self._createJointHandler(tail.header, stats=stats)
+                if jointHandler is not None:
+                    frames = tail.readNewFrames()
+                    if len(frames):
+                        writer.writeFrames(jointHandler.calcKeyFramesOfRows(frames))
+                        if self.progress is not None:
+                            self.progress(tail.nframes, tail.nframes)
+
+                if stop is not None and stop():
+                    break
+                if frames is not None and len(frames):
+                    idle = 0.0
+                    continue
+                if idleTimeout is not None and idle >= idleTimeout:
+                    break
+                time.sleep(pollInterval)
+                idle += pollInterval
+            writer.close()
+        if stats is not None:
+            stats.finish()
+        return tail.nframes
 
-        return json.dumps(outputDict, indent=4)
+    def writeDeepMimicTargets(self, bvhPath, targets: List[ConversionTarget],
+                              loop=False, outputFormat=JSON, precision: int = None,
+                              stats: ConversionStats = None) -> List[Dict[str, str]]:
+        """ Convert a .bvh file for several settings files in one pass.
 
-    def writeDeepMimicFile(self, bvhPath, outputPath):
-        with open(outputPath, "w") as output:
-            output.write(self.convertBvhFile(bvhPath))
\ No newline at end of file
+        The file is parsed once and forward kinematics is shared by all
+        targets, only the rotation extraction runs per target. Targets are
+        not cached.
+
+        Returns:
+            list: per target, output format -> path of the written file.
+        """
+        stats = self._startStats(stats, bvhPath)
+        from bvhtodeepmimic.multi_target import MultiTargetKinematics
+        targetPaths = [outputPaths(target.outputPath, outputFormat) for target in targets]
+        with ExitStack() as stack:
+            mocap = stack.enter_context(self._openMocap(bvhPath, stats))
+            handlers = [
+                self._createJointHandler(mocap, target.settingsPath, stats)
+                for target in targets
+            ]
+            targetWriters = [
+                self._openWriters(stack, jointHandler, paths, loop, precision, stats)
+                for jointHandler, paths in zip(handlers, targetPaths)
+            ]
+            for blocks in MultiTargetKinematics(handlers).iterKeyFrameBlocks():
+                for block, writers in zip(blocks, targetWriters):
+                    for writer in writers:
+                        writer.writeFrames(block)
+        if stats is not None:
+            stats.finish()
+        return targetPaths
+
+    def _openWriters(self, stack: ExitStack, jointHandler: BvhJointHandler,
+                     paths: Dict[str, str], loop: bool, precision: int,
+                     stats: ConversionStats = None, nframes: int = None) -> list:
+        """ Open a writer per output format, closed by stack. Files are only
+        moved to their path once the stack closes without an error.
+        """
+        writers = []
+        for fmt, path in paths.items():
+            path = stack.enter_context(atomicOutput(path))
+            if fmt == NPZ:
+                writer = DeepMimicNpzWriter(
+                    path, jointHandler.nframes if nframes is None else nframes,
+                    jointHandler.keyFrameWidth,
+                    self._npzMetadata(jointHandler, loop), stats=stats
+                )
+            else:
+                writer = DeepMimicWriter(
+                    stack.enter_context(open(path, "w")), loop=loop,
+                    compact=fmt == COMPACT_JSON, precision=precision,
+                    stats=stats
+                )
+            writers.append(stack.enter_context(writer))
+        return writers
+
+    def writeDeepMimicData(self, data: Union[str, BvhExtended], outputPath, loop=False,
+                           outputFormat=JSON, precision: int = None,
+                           stats: ConversionStats = None) -> Dict[str, str]:
+        """ Like writeDeepMimicFile, for the text of a .bvh file or the
+        BvhExtended parsed from it. Neither the cache nor frameWorkers are
+        used, both need a file.
+        """
+        stats = self._startStats(stats)
+        paths = outputPaths(outputPath, outputFormat)
+        mocap = self._parseMocap(data, stats)
+        with ExitStack() as stack:
+            jointHandler = self._createJointHandler(mocap, stats=stats)
+            writers = self._openWriters(stack, jointHandler, paths, loop, precision, stats)
+            for block in jointHandler.iterKeyFrameBlocks(self.blockSize):
+                for writer in writers:
+                    writer.writeFrames(block)
+        if stats is not None:
+            stats.finish()
+        return paths
+
+    @staticmethod
+    def _copyCached(cached: Dict[str, str], paths: Dict[str, str]) -> bool:
+        """ Copy cached files to paths. False when a cached file went missing,
+        e.g. pruned by another process, the conversion has to run then.
+        """
+        try:
+            for fmt, path in paths.items():
+                with atomicOutput(path) as partialPath:
+                    shutil.copyfile(cached[fmt], partialPath)
+        except OSError:
+            return False
+        return True
+
+    def _convertToFiles(self, bvhPath, paths, loop, precision, stats=None):
+        with ExitStack() as stack:
+            jointHandler = stack.enter_context(self._openJointHandler(bvhPath, stats))
+            writers = self._openWriters(stack, jointHandler, paths, loop, precision, stats)
+
+            for block in self._iterKeyFrameBlocks(jointHandler, bvhPath):
+                for writer in writers:
+                    writer.writeFrames(block)
+
+    @staticmethod
+    def _npzMetadata(jointHandler: BvhJointHandler, loop: bool) -> dict:
+        return {
+            "Loop": loopText(loop),
+            "FrameTime": jointHandler.frameTime,
+            "Joints": jointHandler.deepMimicHumanoidJoints,
+            "JointDimensions": jointHandler.jointDimensions,
+        }
+
+
+class BatchResult:
+    """ Outcome of converting a single file in a batch.
+    """
+    def __init__(self, inputPath: str, outputPath: str, error: str = None,
+                 stats: dict = None, duration: float = None, inputHash: str = None,
+                 skipped=False, validation: dict = None):
+        self.inputPath = inputPath
+        self.outputPath = outputPath
+        # Formatted traceback when the conversion failed.
+        self.error = error
+        # ConversionStats.toDict() of the file, when stats were collected.
+        self.stats = stats
+        # Seconds spent converting the file.
+        self.duration = duration
+        # Hash of the input, when the batch keeps a journal.
+        self.inputHash = inputHash
+        # The file was converted by an earlier run, according to the journal.
+        self.skipped = skipped
+        # ValidationReport.toDict() of the output, when outputs are validated.
+        self.validation = validation
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+    def toDict(self) -> dict:
+        return {
+            "inputPath": self.inputPath,
+            "outputPath": self.outputPath,
+            "error": self.error,
+            "stats": self.stats,
+            "duration": self.duration,
+            "skipped": self.skipped,
+            "validation": self.validation,
+        }
+
+
+# Converters of the current (worker) process, reused across files so their
+# compiled conversion plans are shared by all files of a rig.
+_batchConverters: Dict[tuple, BvhConverter] = {}
+
+
+def _getBatchConverter(setting_path: str, converterOptions: dict) -> BvhConverter:
+    key = (setting_path, tuple(sorted(converterOptions.items())))
+    if key not in _batchConverters:
+        _batchConverters[key] = BvhConverter(
+            setting_path, posLocked=converterOptions["posLocked"],
+            targetFrameTime=converterOptions["targetFrameTime"],
+            resampleMethod=converterOptions["resampleMethod"],
+            memoryMap=converterOptions["memoryMap"],
+            cache=BvhBatchConverter.createCache(converterOptions)
+        )
+    return _batchConverters[key]
+
+
+def _convertBatchItem(setting_path: str, inputPath: str, outputPath: str,
+                      options: dict, converterOptions: dict,
+                      hashInput=False) -> BatchResult:
+    # Module level, so it can be sent to worker processes.
+    stats = ConversionStats(inputPath) if converterOptions["collectStats"] else None
+    start = time.perf_counter()
+    inputHash = error = validation = None
+    try:
+        if hashInput:
+            inputHash = hashFile(inputPath)
+        os.makedirs(os.path.dirname(outputPath) or ".", exist_ok=True)
+        converter = _getBatchConverter(setting_path, converterOptions)
+        converter.writeDeepMimicFile(inputPath, outputPath, stats=stats, **options)
+        if converterOptions["validate"]:
+            validation = converter.validateDeepMimicFile(inputPath, outputPath).toDict()
+    except Exception:
+        error = traceback.format_exc()
+    return BatchResult(inputPath, outputPath, error,
+                       stats.toDict() if stats is not None else None,
+                       duration=time.perf_counter() - start, inputHash=inputHash,
+                       validation=validation)
+
+
+class BvhBatchConverter:
+    """ Converts all .bvh files of a directory tree using a pool of worker
+    processes. The directory layout of the input is mirrored in the output.
+    """
+    def __init__(self, setting_path: str, workers: int = None,
+                 recursive=True, extension: str = None, loop=False,
+                 outputFormat=JSON, precision: int = None, posLocked=False,
+                 cacheDir: str = None, cacheMaxSize: int = None,
+                 collectStats=False, targetFrameTime: float = None,
+                 resampleMethod=DECIMATE, memoryMap=False, journalPath: str = None,
+                 validate=False):
+        self.setting_path = setting_path
+        # Number of worker processes, defaults to the number of CPUs.
+        self.workers = workers or os.cpu_count() or 1
+        self.recursive = recursive
+        self.loop = loop
+        # See BvhConverter.writeDeepMimicFile
+        self.outputFormat = outputFormat
+        # Extension of the output files, by default the one of the first
+        # output format, so other formats do not overwrite it.
+        self.extension = extension if extension is not None else formatExtension(outputFormat)
+        self.precision = precision
+        self.posLocked = posLocked
+        # Optional ConversionCache directory shared by all workers.
+        self.cacheDir = cacheDir
+        self.cacheMaxSize = cacheMaxSize
+        # Record ConversionStats of every file into its BatchResult.
+        self.collectStats = collectStats
+        # See BvhConverter
+        self.targetFrameTime = targetFrameTime
+        self.resampleMethod = resampleMethod
+        self.memoryMap = memoryMap
+        # Optional BatchJournal file. Files it records as converted are
+        # skipped, so an interrupted batch can be run again to resume it.
+        self.journalPath = journalPath
+        # Validate every output against its .bvh file, reports are stored in
+        # BatchResult.validation.
+        self.validate = validate
+
+    @property
+    def conversionOptions(self) -> dict:
+        return {
+            "loop": self.loop,
+            "outputFormat": self.outputFormat,
+            "precision": self.precision,
+        }
+
+    @property
+    def converterOptions(self) -> dict:
+        return {
+            "posLocked": self.posLocked,
+            "cacheDir": self.cacheDir,
+            "cacheMaxSize": self.cacheMaxSize,
+            "collectStats": self.collectStats,
+            "targetFrameTime": self.targetFrameTime,
+            "resampleMethod": self.resampleMethod,
+            "memoryMap": self.memoryMap,
+            "validate": self.validate,
+        }
+
+    @staticmethod
+    def createCache(converterOptions: dict):
+        if converterOptions["cacheDir"] is None:
+            return None
+        from bvhtodeepmimic.conversion_cache import ConversionCache
+        return ConversionCache(
+            converterOptions["cacheDir"], converterOptions["cacheMaxSize"]
+        )
+
+    def findBvhFiles(self, inputDir: str) -> List[str]:
+        return findBvhFiles(inputDir, self.recursive)
+
+    def outputPathFor(self, inputPath: str, inputDir: str, outputDir: str) -> str:
+        relativePath = os.path.relpath(inputPath, inputDir)
+        return os.path.join(outputDir, os.path.splitext(relativePath)[0] + self.extension)
+
+    def convertDirectory(self, inputDir: str, outputDir: str) -> List[BatchResult]:
+        """ Convert every .bvh file below inputDir. Failing files do not abort
+        the batch, they are reported in the returned results instead.
+        """
+        inputPaths = self.findBvhFiles(inputDir)
+        jobs = [
+            (inputPath, self.outputPathFor(inputPath, inputDir, outputDir))
+            for inputPath in inputPaths
+        ]
+        return self.convertFiles(jobs)
+
+    def convertFiles(self, jobs) -> List[BatchResult]:
+        """ Convert a list of (inputPath, outputPath) pairs, results are
+        returned in the same order.
+        """
+        journal = BatchJournal(self.journalPath) if self.journalPath is not None else None
+        results = [None] * len(jobs)
+        pending = []
+        for i, (inputPath, outputPath) in enumerate(jobs):
+            outputFiles = list(outputPaths(outputPath, self.outputFormat).values())
+            if journal is not None and journal.isDone(inputPath, outputPath, outputFiles):
+                entry = journal.lookup(inputPath, outputPath)
+                results[i] = BatchResult(inputPath, outputPath, inputHash=entry.inputHash,
+                                         skipped=True)
+            else:
+                pending.append(i)
+
+        def finish(i: int, result: BatchResult):
+            results[i] = result
+            if journal is not None:
+                journal.record(JournalEntry(
+                    result.inputPath, result.outputPath, result.inputHash,
+                    result.duration, DONE if result.succeeded else FAILED, result.error
+                ))
+
+        if self.workers == 1 or len(pending) <= 1:
+            for i in pending:
+                finish(i, _convertBatchItem(
+                    self.setting_path, jobs[i][0], jobs[i][1], self.conversionOptions,
+                    self.converterOptions, journal is not None
+                ))
+            return results
+
+        def size(i: int) -> int:
+            # Unreadable inputs are reported by their worker.
+            try:
+                return os.path.getsize(jobs[i][0])
+            except OSError:
+                return 0
+
+        # Submit the largest files first for better load balancing.
+        pending.sort(key=lambda i: -size(i))
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(
+                    _convertBatchItem, self.setting_path,
+                    jobs[i][0], jobs[i][1], self.conversionOptions,
+                    self.converterOptions, journal is not None
+                ): i
+                for i in pending
+            }
+            # Journal files as soon as they are done, not in submission order.
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    result = future.result()
+                except Exception:
+                    # The worker process itself died, e.g. killed when out of memory.
+                    result = BatchResult(jobs[i][0], jobs[i][1], traceback.format_exc())
+                finish(i, result)
+        return results
+
+    @staticmethod
+    def writeReport(results: List[BatchResult], path: str):
+        """ Write the results of a batch, including collected stats, as json.
+        """
+        stages: Dict[str, float] = {}
+        for result in results:
+            for stage, seconds in ((result.stats or {}).get("stages") or {}).items():
+                stages[stage] = stages.get(stage, 0.0) + seconds
+        report = {
+            "files": [result.toDict() for result in results],
+            "failed": sum(not result.succeeded for result in results),
+            "stages": stages,
+        }
+        with open(path, "w") as output:
+            json.dump(report, output, indent=4)
@@ -1,54 +1,48 @@
 # Imports
 # ===========================================================================
 
-import json
 import os
-from os import listdir
-from os.path import isfile, join
-from bvhtomimic import BvhConverter
-
-# Function declarations
-# ===========================================================================
-
-def removeAllFilesInDirectory(directory):
-    onlyfiles = [f for f in listdir(directory) if isfile(join(directory, f))]
-    for i in range(0, len(onlyfiles)):
-        os.remove(f"{directory}{onlyfiles[i]}")
-
-
-# Initialization
-# ===========================================================================
-mypath = "./inputBvh/"
-dirnames = ["./OutputMimic/", mypath]
-for dirname in dirnames:
-    if not os.path.exists(dirname):
-        os.makedirs(dirname)
-
-removeAllFilesInDirectory(dirnames[0])
-
-# Locks root position and rotation for dev testing
-posLocked = False
-
-# sets onlyfiles to a list of files founds in the "mypath" directory
-onlyfiles = [f for f in listdir(mypath) if isfile(join(mypath, f))]
-
-
-# Start of main program
-# ===========================================================================
-
-# for all files to convert
-for j in range(0, len(onlyfiles)):
-
-    outputPath = f"./OutputMimic/{onlyfiles[j]}.txt"
-
-    # list containing all the frames
-    frames = []
-
-    # open file to convert
-    inputPath = "./inputBvh/" + onlyfiles[j]
-
-    # Convert file
-    converter = BvhConverter("./Settings/settings.json")
-
-    print("Converting:\t\"" + onlyfiles[j] + "\"")
-    converter.writeDeepMimicFile(inputPath, outputPath)
+from bvhtomimic import BvhBatchConverter
+
+
+# Worker processes re-import this script on some platforms, so only run it
+# when executed directly.
+if __name__ == "__main__":
+    # Initialization
+    # ===========================================================================
+    mypath = "./inputBvh/"
+    dirnames = ["./OutputMimic/", mypath]
+    for dirname in dirnames:
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+
+    # Converted files are recorded in this journal. Running the script again
+    # only converts new, changed and failed files, and those whose output is
+    # missing. Delete the journal to convert everything again.
+    journalPath = dirnames[0] + "journal.jsonl"
+
+    # Number of worker processes, None uses all CPUs
+    workers = None
+
+    # Locks root position and rotation for dev testing
+    posLocked = False
+
+
+    # Start of main program
+    # ===========================================================================
+
+    # Convert all .bvh files, including those in subdirectories of "mypath".
+    # Outputs keep the input file name, "walk.bvh" is written to
+    # "walk.bvh.txt".
+    converter = BvhBatchConverter("./Settings/settings.json", workers=workers,
+                                  extension=".bvh.txt", posLocked=posLocked,
+                                  journalPath=journalPath)
+    results = converter.convertDirectory(mypath, dirnames[0])
+
+    for result in results:
+        if result.skipped:
+            print("Up to date:\t\"" + result.inputPath + "\"")
+        elif result.succeeded:
+            print("Converted:\t\"" + result.inputPath + "\"")
+        else:
+            print("Failed:\t\"" + result.inputPath + "\"\n" + result.error)
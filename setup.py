@@ -1,11 +1,15 @@
+import re
 import setuptools
 
 with open("README.md", "r") as fh:
     long_description = fh.read()
 
+with open("bvhtodeepmimic/__init__.py", "r") as fh:
+    version = re.search(r'__version__ = "(.*)"', fh.read()).group(1)
+
 setuptools.setup(
     name="bvhtodeepmimic",
-    version="0.0.5",
+    version=version,
     author="Bart Moyaers",
     author_email="bart.moyaers@gmail.com",
     description="Convert .bvh files (Biovision Hierarchy) to DeepMimic format.",
@@ -14,6 +18,12 @@ setuptools.setup(
     url="https://github.com/BartMoyaers/BvhToDeepMimic",
     packages=["bvhtodeepmimic"],
     py_modules=["bvhtomimic"],
+    entry_points={
+        "console_scripts": [
+            "bvhtodeepmimic=bvhtodeepmimic.cli:main",
+            "bvhtodeepmimic-server=bvhtodeepmimic.conversion_server:main",
+        ],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "Programming Language :: Python :: 3.6",
@@ -21,6 +31,6 @@ setuptools.setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    install_requires=["pyquaternion", "numpy", "bvh", "tqdm"],
+    install_requires=["pyquaternion", "numpy"],
     python_requires='>=3.6.*'
 )
\ No newline at end of file